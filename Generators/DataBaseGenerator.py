@@ -3,13 +3,113 @@ Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
 Licensed under the MIT License.
 """
 import os
+import json
+import random
 import shutil
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.util import Finalize
 import pandas as pd
 import numpy as np
 
 from tqdm import tqdm
+from Generators.GenerationPlan import GenerationPlan, DEFAULT_CHORD_SIZE_WEIGHTS, chord_size_probabilities
 from Generators.SampleGenerator import SampleGenerator
-from Util.Helpers import Scale, SynthModuleOne, SynthModuleTwo
+from Util.Helpers import Scale, PitchTable, SynthModuleOne, SynthModuleTwo, open_render_session
+from Util.GenerationMetrics import GenerationMetrics, time_stage
+from Util.ShardStore import ShardWriter, ShardReader
+from Util.Labels import labels_to_bytes
+from Util.NumpySynth import write_pcm
+from Util.AudioFile import AUDIO_FORMATS, check_audio_options
+from Util.DedupIndex import DEDUP_MODES, new_dedup_index, load_dedup_index
+from Util.DataSetSplit import SPLIT_FOLDERS, SPLIT_CSV_NAMES, part_range, part_csv_name, settings_path, merge_parts, \
+    merge_parts_with_split, plan_split, check_holdout
+from Util.FeatureStore import check_feature_options, feature_bins, mel_filterbank, spectrogram, is_valid_features, \
+    FeatureWriter
+
+# DataBaseGenerator of the current worker process, set by _init_worker
+_worker_generator = None
+# Number of finished Samples which are appended to the CSV-File at once
+MANIFEST_FLUSH_SIZE = 100
+# Columns of the CSV-File
+MANIFEST_COLUMNS = ['WAV-File', 'MIDI-File', "BPM", "Scale", "RootNote", "SynthModules"]
+# Columns of the CSV-File if the Samples are packed into shards
+SHARD_MANIFEST_COLUMNS = ['Shard', 'Offset', 'ID', "BPM", "Scale", "RootNote", "SynthModules"]
+# Columns of the CSV-File locating the spectrogram of every Sample in the feature chunks
+FEATURE_MANIFEST_COLUMNS = ['Feature-Chunk', 'Feature-Offset', 'Feature-Frames']
+# "files" writes one WAV- and one MIDI-File per Sample, "shards" packs the Samples into shard files
+OUTPUT_FORMATS = ["files", "shards"]
+# Settings which have to be the same to resume a batch or to merge its parts, with the value of older Settings Files
+PLAN_SETTINGS = {"number_of_notes_per_sample": None, "use_polyphonic": None, "seed_stream": None,
+                 "output_format": "files", "label_frame_rate": None, "number_of_parts": 1, "sampling_rate": 44100,
+                 "channels": 2, "bit_depth": 16, "audio_format": "wav", "chord_size_weights": None, "split": None,
+                 "dedup": None, "features": None}
+# Parameters of a duplicate Sample are drawn again at most this many times before the batch gives up
+MAX_DEDUP_ATTEMPTS = 100
+
+
+def _init_worker(generator):
+    """
+    Initializer for every worker process of the process pool used by DataBaseGenerator.batch_generate.
+    Every worker holds its own copy of the DataBaseGenerator, its own RenderSession and its own music21 state.
+    The RenderSession is closed when the worker process exits.
+
+    Args:
+        generator: DataBaseGenerator - Generator whose parameters are used inside the worker
+    """
+    global _worker_generator
+    _worker_generator = generator
+    _worker_generator.renderSession = open_render_session(_worker_generator.backend,
+                                                          _worker_generator.voiceCacheSize,
+                                                          _worker_generator.samplingRate,
+                                                          _worker_generator.channels,
+                                                          _worker_generator.bitDepth,
+                                                          _worker_generator.audioFormat)
+    Finalize(_worker_generator.renderSession, _worker_generator.renderSession.close, exitpriority=10)
+
+
+def _worker_generate(current_id):
+    """
+    Generates one Sample of the current Generation Plan inside a worker process.
+
+    Args:
+        current_id: int - ID of the Sample passed on to DataBaseGenerator.generate_sample
+    """
+    return _worker_generator.generate_sample(current_id)
+
+
+def _worker_generate_batch(sample_ids):
+    """
+    Generates several Samples of the current Generation Plan inside a worker process, which are rendered together.
+
+    Args:
+        sample_ids: List of int - IDs of the Samples passed on to DataBaseGenerator.generate_samples
+    """
+    return _worker_generator.generate_samples(sample_ids)
+
+
+class _BatchOutput:
+    """
+    Class holding where a batch, or the train or test Data Set of a split batch, is written into and the information
+    of its finished Samples which are not yet appended to its CSV-File
+    """
+
+    def __init__(self, folder_path, path_to_csv, shard_writer=None, feature_writer=None):
+        """
+        Initializing _BatchOutput - Object
+
+        Args:
+            folder_path: str - Folder of the Data Set
+            path_to_csv: str - Path of the CSV-File
+            shard_writer: ShardWriter - Writer of the shards, None if the Samples are written as single Files
+            feature_writer: FeatureWriter - Writer of the feature chunks, None if no features are written
+        """
+        self.folderPath = folder_path
+        self.pathToCsv = path_to_csv
+        self.shardWriter = shard_writer
+        self.featureWriter = feature_writer
+        self.finishedInfos = []
 
 
 class DataBaseGenerator:
@@ -17,19 +117,99 @@ class DataBaseGenerator:
     Class for Generating the Sample Data Base
     """
 
-    def __init__(self, number_of_notes_per_sample=20, use_synth_modules=False):
+    def __init__(self, number_of_notes_per_sample=20, use_synth_modules=False, seed=None, backend="pyo",
+                 output_format="files", shard_size=2 ** 30, voice_cache_size=2 ** 27, sampling_rate=44100, channels=2,
+                 bit_depth=16, audio_format="wav", chord_size_weights=None, dedup=None, dedup_capacity=10 ** 7,
+                 dedup_error_rate=0.001, render_batch_size=1, features=None, fft_size=2048, hop_size=512, mel_bins=128,
+                 feature_chunk_size=2 ** 28):
         """
         Initializing DataBaseGenerator - Object
 
         Args:
             number_of_notes_per_sample: int - Number of Notes generated for every Sample
             use_synth_modules: bool - Switch for using different Synth Modules
+            seed: int - Master Seed from which all Parameters are drawn. A random one is picked if None
+            backend: str - Either "pyo" or "numpy". Defines how the WAV-Files are synthesized
+            output_format: str - Either "files" for one WAV- and one MIDI-File per Sample or "shards" for packing
+                           the PCM, MIDI-File and metadata of the Samples into shard files
+            shard_size: int - Size in bytes after which a new shard is started
+            voice_cache_size: int - Maximum number of bytes of the wavetable positions of the voices every
+                              RenderSession of the "numpy" backend keeps in memory, 0 switches the cache off
+            sampling_rate: int - Sampling Rate the Samples are rendered at in Hz
+            channels: int - 2 for stereo Samples or 1 for their mono downmix
+            bit_depth: int - Bits per sample of the audio, 16, 24 or 32
+            audio_format: str - Either "wav" or "flac" for the audio Files, shards always hold 16 bit PCM
+            chord_size_weights: dict - Relative weight of every Chord size from 2 to 6 Notes, e.g. {2: 1, 3: 1, 6: .5}.
+                                By default Chords have 2 or 3 Notes with the same probability
+            dedup: str - None, "exact" or "bloom". With "exact" or "bloom" a Sample which sounds like another one of
+                   the batch is drawn again before it is rendered, see plan_unique. "bloom" keeps the hashes of the
+                   Samples in a Bloom filter, which takes about 1.8 bytes per Sample
+            dedup_capacity: int - Number of Samples the Bloom filter is sized for
+            dedup_error_rate: float - Probability of the Bloom filter to draw a new Sample again needlessly
+            render_batch_size: int - Number of consecutive Samples the "pyo" backend renders in one pass of its
+                               Server, see RenderSession.render_pcm_batch. The Samples are the same for any size
+            features: str - None, "mel" or "stft". With "mel" or "stft" the log-mel or log-power spectrogram of every
+                      Sample is computed right after it is rendered and written into the feature chunks
+            fft_size: int - Number of samples of every frame of the spectrogram
+            hop_size: int - Number of samples between the starts of two frames of the spectrogram
+            mel_bins: int - Number of mel bands of a "mel" spectrogram
+            feature_chunk_size: int - Size in bytes after which a new feature chunk is started
         """
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception("Unknown output format '{0}'. Possible formats: {1}".format(output_format,
+                                                                                      OUTPUT_FORMATS))
+        check_audio_options(sampling_rate, channels, bit_depth, audio_format)
+        if chord_size_weights is None:
+            chord_size_weights = DEFAULT_CHORD_SIZE_WEIGHTS
+        chord_size_probabilities(chord_size_weights)
+        if dedup is not None and dedup not in DEDUP_MODES:
+            raise Exception("Unknown dedup mode '{0}'. Possible modes: {1}".format(dedup, DEDUP_MODES))
+        if render_batch_size < 1:
+            raise Exception("The render batch size '{0}' is not positive.".format(render_batch_size))
+        if features is not None:
+            check_feature_options(features, fft_size, hop_size, mel_bins)
+        if output_format == "shards" and (bit_depth != 16 or audio_format != "wav"):
+            raise Exception("Shards hold 16 bit PCM, they can not store '{0}' bit '{1}' audio.".format(bit_depth,
+                                                                                                    audio_format))
         self.DEBUG = False
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed = seed
         self.folderPath = ''
+        self.backend = backend
+        self.outputFormat = output_format
+        self.shardSize = shard_size
+        self.voiceCacheSize = voice_cache_size
+        self.samplingRate = sampling_rate
+        self.channels = channels
+        self.bitDepth = bit_depth
+        self.audioFormat = audio_format
+        self.chordSizeWeights = {int(size): float(weight) for size, weight in chord_size_weights.items()}
+        self.dedup = dedup
+        self.dedupCapacity = dedup_capacity
+        self.dedupErrorRate = dedup_error_rate
+        self.renderBatchSize = render_batch_size
+        self.features = features
+        self.fftSize = fft_size
+        self.hopSize = hop_size
+        self.melBins = mel_bins
+        self.featureChunkSize = feature_chunk_size
+        self.melFilterbank = mel_filterbank(sampling_rate, fft_size, mel_bins) if features == "mel" else None
+        self.renderSession = None
+        self.labelFrameRate = None
+        self.pipelined = False
+        self.plan = None
+        # Data Set of every Sample of the plan of a split batch: 0 for train, 1 for test and -1 if it is left out
+        self.planSplits = None
+        # Number of parts the current batch is split into, see batch_generate
+        self.numberOfParts = 1
+        self.collectMetrics = False
         self.possibleChordRatios = []
         self.midiFolderName = "MIDI-Files"
         self.wavFolderName = "WAV-Files"
+        self.shardFolderName = "Shards"
+        self.labelFolderName = "Label-Files"
+        self.featureFolderName = "Features"
         self.possibleOctaves = [3, 4, 5, 6]
         self.possibleRoots = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
         self.possibleSigns = ["-", "", "#"]
@@ -38,6 +218,7 @@ class DataBaseGenerator:
         self.possibleChordRatios = np.linspace(0, 0.40, 10, endpoint=True)
         self.possibleTempos = np.linspace(40, 240, 50, endpoint=True, dtype=int)
         self.possibleScales = self.__init_scales()
+        self.pitchTable = PitchTable(self.possibleRoots, self.possibleSigns, self.possibleScales, self.possibleOctaves)
         self.numberOfNotesPerSample = number_of_notes_per_sample
         if use_synth_modules:
             self.synth_modules = [SynthModuleOne(), SynthModuleTwo()]
@@ -69,7 +250,7 @@ class DataBaseGenerator:
         return scales
 
     @staticmethod
-    def __create_save_file_name(prefix, postfix, current_id, sample_generator):
+    def __create_save_file_name(prefix, postfix, current_id, scale, root_note, tempo):
         """
         Creates a save filename for the MIDI and WAV Files from the Parameters used for generating them.
 
@@ -77,14 +258,16 @@ class DataBaseGenerator:
             prefix = str - Holds the string that is placed in front of the generated string.
             postfix = str - Holds the string that is placed after the generated string.
             id = int - Holds the current ID of the generated MIDI and WAV Files.
-            sample_generator - SampleGenerator - Holds all Parameters
+            scale = Scale - Scale of the Sample
+            root_note = str - Root Note of the Sample
+            tempo = int - Tempo of the Sample
         """
         # Create save FileName
-        scale = str(sample_generator.scale)
+        scale = str(scale)
         scale = scale.lower().replace("ä", "ae").replace("ö", "oe").replace("ü", "ue")
-        root_note = str(sample_generator.rootNote.nameWithOctave)
+        root_note = str(root_note)
         root_note = root_note.lower().replace("#", "_sharp").replace("-", "_flat")
-        tempo = str(sample_generator.tempo)
+        tempo = str(tempo)
 
         file_name = str.format("{0}_{1}_Scale({2})_Root({3})_BPM({4}).{5}",
                                prefix,
@@ -97,18 +280,46 @@ class DataBaseGenerator:
         file_name = file_name.replace(" ", "")
         return file_name
 
-    def __handle_folders(self, destination_directory):
+    @staticmethod
+    def dedup_paths(path_to_csv):
+        """
+        Returns the paths of the dedup index and of the CSV-File of the redrawn Samples of the batch of a CSV-File
+
+        Args:
+            path_to_csv: str - Path of the CSV-File
+        """
+        stem = os.path.splitext(path_to_csv)[0]
+        return stem + "_dedup.npz", stem + "_redrawn.csv"
+
+    def check_settings(self, stored_settings, settings):
+        """
+        Raises an Exception if Settings read from a Settings File do not match the Settings of the batch in any
+        Setting the Parameters of the Samples depend on. If the batch is split into parts, the number of Samples
+        of the whole batch has to match as well, as it defines the IDs of every part.
+
+        Args:
+            stored_settings: dict - Settings read from the Settings File
+            settings: dict - Settings of the batch
+        """
+        keys = list(PLAN_SETTINGS) + (["number_of_samples"] if settings["number_of_parts"] > 1 else [])
+        if any(stored_settings.get(key, PLAN_SETTINGS.get(key)) != settings[key] for key in keys):
+            raise Exception("The batch in '{0}' was generated with other Settings: {1}".format(self.folderPath,
+                                                                                              stored_settings))
+
+    def __handle_folders(self, destination_directory, resume=False):
         """
         Checks the destination Directory for errors and possible files inside.
-        Empties MIDI and WAV Folders or creates new ones if not existent.
+        Empties MIDI and WAV Folders or creates new ones if not existent. When resuming, the Directory may hold
+        Files and the MIDI and WAV Folders are kept.
 
         Args:
             destination_directory: str - Path to Directory that will be checked.
+            resume: bool - Switch for resuming a batch in the Directory
         """
 
         # Checks Paths
         if os.path.exists(destination_directory) and os.path.isdir(destination_directory):
-            if len(os.listdir(destination_directory)) == 0:
+            if len(os.listdir(destination_directory)) == 0 or resume:
                 self.folderPath = destination_directory
             else:
                 raise Exception("The given Directory: '{0}' is not empty!".format(destination_directory))
@@ -116,22 +327,624 @@ class DataBaseGenerator:
         else:
             raise Exception("The given Directory: '{0}' is not a valid Directory!".format(destination_directory))
 
-        # Empty Folders
-        midi_folder_path = os.path.join(self.folderPath, self.midiFolderName)
-        if os.path.exists(midi_folder_path):
-            shutil.rmtree(midi_folder_path, ignore_errors=True)
-            os.makedirs(midi_folder_path)
+        if self.outputFormat == "shards":
+            folder_names = [self.shardFolderName]
         else:
-            os.makedirs(midi_folder_path)
-        wave_folder_path = os.path.join(self.folderPath, self.wavFolderName)
-        if os.path.exists(wave_folder_path):
-            shutil.rmtree(wave_folder_path, ignore_errors=True)
-            os.makedirs(wave_folder_path)
+            folder_names = [self.midiFolderName, self.wavFolderName]
+            if self.labelFrameRate is not None:
+                folder_names.append(self.labelFolderName)
+        if self.features is not None:
+            folder_names.append(self.featureFolderName)
+
+        # Empty Folders
+        for folder_name in folder_names:
+            folder_path = os.path.join(self.folderPath, folder_name)
+            if os.path.exists(folder_path):
+                if resume:
+                    continue
+                shutil.rmtree(folder_path, ignore_errors=True)
+            os.makedirs(folder_path)
+
+    def plan_batch(self, number_of_samples, use_polyphonic=True, seed_stream=0, first_id=0, attempt=0):
+        """
+        Draws every Parameter of a batch of Samples at once and returns them as GenerationPlan. The Parameters of a
+        Sample only depend on the Master Seed, the Seed Stream and its ID.
+
+        Args:
+            number_of_samples: int - Number of Samples to plan
+            use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+            seed_stream: int - Key that separates Samples with the same ID of independent runs (e.g. train and test)
+            first_id: int - ID of the first Sample
+            attempt: int - Number of the draw, other attempts draw other Parameters for the same IDs
+        """
+        return GenerationPlan(self, first_id, number_of_samples, use_polyphonic, seed_stream, attempt)
+
+    def plan_unique(self, number_of_samples, use_polyphonic=True, seed_stream=0, first_id=0, dedup_index=None):
+        """
+        Plans a batch like plan_batch in which no Sample sounds like another one or like one in dedup_index: same
+        Notes, tempo and Synth Module, see SampleGenerator.content_hash. The Samples are composed in the order of
+        their IDs and the Parameters of a duplicate are drawn again from the next attempt of its ID until it is new,
+        before any File is written. So the plan only depends on the Master Seed, the Seed Stream, the IDs and the
+        hashes in dedup_index. Returns the plan and a dict of the attempt of every ID which was drawn again.
+
+        Args:
+            number_of_samples: int - Number of Samples to plan
+            use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+            seed_stream: int - Key that separates Samples with the same ID of independent runs (e.g. train and test)
+            first_id: int - ID of the first Sample
+            dedup_index: DedupIndex or BloomFilter - Hashes of Samples which must not be repeated, e.g. of another
+                         Data Set. The hashes of all planned Samples are added to it
+        """
+        if dedup_index is None:
+            dedup_index = new_dedup_index(self.dedup or "exact", self.dedupCapacity, self.dedupErrorRate)
+        plan = self.plan_batch(number_of_samples, use_polyphonic, seed_stream, first_id)
+        redrawn = {}
+        retry_plans = {}
+        for index in range(len(plan)):
+            attempt = 0
+            while not dedup_index.add(self.compose_planned(plan, index).content_hash(with_sound=True)):
+                attempt += 1
+                if attempt > MAX_DEDUP_ATTEMPTS:
+                    raise Exception("No new Sample was found for the ID '{0}' in {1} attempts, the batch has more "
+                                    "Samples than different ones can be drawn.".format(plan.firstId + index,
+                                                                                       MAX_DEDUP_ATTEMPTS))
+                self.__redraw(plan, index, attempt, retry_plans)
+            if attempt > 0:
+                redrawn[plan.firstId + index] = attempt
+        return plan, redrawn
+
+    def __redraw(self, plan, index, attempt, retry_plans):
+        """
+        Replaces the Parameters of a Sample of plan by the ones of the given attempt of its ID
+
+        Args:
+            plan: GenerationPlan - Plan holding the Sample
+            index: int - Position of the Sample in the plan
+            attempt: int - Number of the draw of the new Parameters
+            retry_plans: dict - Plans of the attempts of whole blocks of IDs, which are reused for every Sample of
+                         the block. Plans of other blocks are dropped from it
+        """
+        current_id = plan.firstId + index
+        block_first_id = current_id - current_id % GenerationPlan.BLOCK_SIZE
+        if (attempt, block_first_id) not in retry_plans:
+            for key in [key for key in retry_plans if key[1] != block_first_id]:
+                del retry_plans[key]
+            retry_plans[(attempt, block_first_id)] = self.plan_batch(GenerationPlan.BLOCK_SIZE, plan.usePolyphonic,
+                                                                     plan.seedStream, block_first_id, attempt)
+        plan.replace_sample(index, retry_plans[(attempt, block_first_id)], current_id - block_first_id)
+
+    def __apply_redrawn(self, plan, redrawn):
+        """
+        Draws the Parameters of the Samples of plan again which were redrawn when the batch was planned, so it is
+        the plan returned by plan_unique without composing any Sample
+
+        Args:
+            plan: GenerationPlan - Plan of the batch from plan_batch
+            redrawn: pandas.DataFrame - Columns 'ID' and 'Attempt' of the redrawn Samples, see dedup_paths
+        """
+        retry_plans = {}
+        for current_id, attempt in sorted(zip(redrawn['ID'].tolist(), redrawn['Attempt'].tolist())):
+            if plan.firstId <= current_id < plan.firstId + len(plan):
+                self.__redraw(plan, current_id - plan.firstId, attempt, retry_plans)
+
+    def compose_planned(self, plan, index):
+        """
+        Returns the SampleGenerator of a planned Sample after composing its Notes, nothing is rendered
+
+        Args:
+            plan: GenerationPlan - Plan holding the Sample
+            index: int - Position of the Sample in the plan
+        """
+        sample_gen = SampleGenerator(self.possibleRoots, self.possibleSigns, self.possibleScales,
+                                     self.possibleOctaves, self.possiblePauseRatios, self.possibleChordRatios,
+                                     self.possibleTempos, self.possibleNoteLengths, self.synth_modules,
+                                     None, self.pitchTable, plan, index)
+        sample_gen.compose(self.numberOfNotesPerSample, plan.usePolyphonic)
+        return sample_gen
+
+    def __open_dedup_index(self, dedup_against=None):
+        """
+        Returns a new dedup index of the mode of the DataBaseGenerator holding the hashes of the given dedup indexes
+
+        Args:
+            dedup_against: List of str - Paths of dedup indexes of other Data Sets, see dedup_paths
+        """
+        dedup_index = new_dedup_index(self.dedup, self.dedupCapacity, self.dedupErrorRate)
+        for path in dedup_against or []:
+            if not os.path.isfile(path):
+                raise Exception("The dedup index '{0}' does not exist.".format(path))
+            dedup_index.update(load_dedup_index(path))
+        return dedup_index
+
+    def __plan_deduplicated(self, path_to_csv, number_of_samples, use_polyphonic, seed_stream, first_id,
+                            dedup_against, resume):
+        """
+        Returns the plan of a batch without duplicates, see plan_unique, and saves its dedup index and its redrawn
+        Samples next to the CSV-File. A resumed batch takes the redrawn Samples saved before.
+
+        Args:
+            path_to_csv: str - Path of the CSV-File of the batch
+            number_of_samples: int - Number of Samples of the batch
+            use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+            seed_stream: int - Seed Stream of the batch
+            first_id: int - ID of the first Sample of the batch
+            dedup_against: List of str - Paths of dedup indexes of other Data Sets
+            resume: bool - Switch for taking the redrawn Samples of an interrupted batch
+        """
+        dedup_path, redrawn_path = self.dedup_paths(path_to_csv)
+        if resume and os.path.isfile(dedup_path) and os.path.isfile(redrawn_path):
+            plan = self.plan_batch(number_of_samples, use_polyphonic, seed_stream, first_id)
+            self.__apply_redrawn(plan, pd.read_csv(redrawn_path, sep=',', encoding='utf-8'))
+            return plan
+
+        dedup_index = self.__open_dedup_index(dedup_against)
+        plan, redrawn = self.plan_unique(number_of_samples, use_polyphonic, seed_stream, first_id, dedup_index)
+        dedup_index.save(dedup_path)
+        pd.DataFrame(data={"ID": list(redrawn), "Attempt": list(redrawn.values())},
+                     columns=["ID", "Attempt"]).to_csv(redrawn_path, sep=',', index=False, encoding='utf-8')
+        print("Drew {0} duplicate Samples again.\n".format(len(redrawn)))
+        return plan
+
+    def __planned_sample_info(self, plan, index):
+        """
+        Returns the information of a planned Sample which is stored in the CSV: ID, relative path to the MIDI File,
+        relative path to the WAV File, Tempo, Scale, Root Note, Synth Module, relative path to the Label File,
+        which is None if no labels are written, and the feature chunk, first frame and number of frames of its
+        spectrogram, which is None until it is written
+
+        Args:
+            plan: GenerationPlan - Plan holding the Sample
+            index: int - Position of the Sample in the plan
+        """
+        current_id = plan.firstId + index
+        tempo = self.possibleTempos[plan.tempoIndices[index]]
+        scale = self.possibleScales[plan.scaleIndices[index]]
+        root_note = self.possibleRoots[plan.rootIndices[index]] + self.possibleSigns[plan.signIndices[index]]
+        synth_module = self.synth_modules[plan.synthModuleIndices[index]]
+
+        midi_file_name = self.__create_save_file_name("MIDI", "mid", current_id, scale, root_note, tempo)
+        wav_file_name = self.__create_save_file_name("WAV", AUDIO_FORMATS[self.audioFormat][0], current_id, scale,
+                                                     root_note, tempo)
+        rel_midi_file_path = os.path.join(self.midiFolderName, midi_file_name)
+        rel_wav_file_path = os.path.join(self.wavFolderName, wav_file_name)
+        rel_label_file_path = None
+        if self.labelFrameRate is not None:
+            label_file_name = self.__create_save_file_name("LABELS", "npz", current_id, scale, root_note, tempo)
+            rel_label_file_path = os.path.join(self.labelFolderName, label_file_name)
+        return [str(current_id), rel_midi_file_path, rel_wav_file_path, tempo, scale, root_note, synth_module,
+                rel_label_file_path, None]
+
+    def create_manifest(self, plan, sample_ids=None):
+        """
+        Returns the content of the CSV-File of a planned batch as pandas DataFrame. As every Parameter is known from
+        the plan, it can be created before any Sample is rendered.
+
+        Args:
+            plan: GenerationPlan - Plan of the batch
+            sample_ids: List of int - IDs of the planned Samples in the CSV-File, all of them if None
+        """
+        indices = range(len(plan)) if sample_ids is None else [plan.index_of(int(i)) for i in sample_ids]
+        return self.__manifest_frame([self.__planned_sample_info(plan, index) for index in indices])
+
+    def __manifest_frame(self, infos):
+        """
+        Returns the rows of the CSV-File of the given Samples as pandas DataFrame. If the Samples are packed into
+        shards, the shard and the offset of the record are stored instead of the paths. If features are written, the
+        feature chunk, first frame and number of frames of every spectrogram are appended.
+
+        Args:
+            infos: List of List - Information of every Sample as returned by generate_sample
+        """
+        if self.outputFormat == "shards":
+            data = {'Shard': [info[1] for info in infos],
+                    'Offset': [info[2] for info in infos],
+                    'ID': [info[0] for info in infos],
+                    "BPM": [info[3] for info in infos],
+                    "Scale": [info[4] for info in infos],
+                    "RootNote": [info[5] for info in infos],
+                    "SynthModules": [info[6] for info in infos]
+                    }
+            columns = list(SHARD_MANIFEST_COLUMNS)
         else:
-            os.makedirs(wave_folder_path)
+            data = {'WAV-File': [info[2] for info in infos],
+                    'MIDI-File': [info[1] for info in infos],
+                    "BPM": [info[3] for info in infos],
+                    "Scale": [info[4] for info in infos],
+                    "RootNote": [info[5] for info in infos],
+                    "SynthModules": [info[6] for info in infos]
+                    }
+            columns = list(MANIFEST_COLUMNS)
+            if self.labelFrameRate is not None:
+                data['Label-File'] = [info[7] for info in infos]
+                columns.append('Label-File')
+            if self.planSplits is not None or self.numberOfParts > 1:
+                # The IDs of a Data Set of a split batch are not consecutive, the others are in the other Data Set,
+                # and the IDs of a part of a batch start after the ones of the parts before
+                data['ID'] = [info[0] for info in infos]
+                columns.append('ID')
+        if self.features is not None:
+            for position, column in enumerate(FEATURE_MANIFEST_COLUMNS):
+                data[column] = [info[8][position] if info[8] is not None else None for info in infos]
+            columns.extend(FEATURE_MANIFEST_COLUMNS)
+        return pd.DataFrame(data=data, columns=columns)
+
+    def __append_to_manifest(self, path_to_csv, infos):
+        """
+        Appends the rows of finished Samples to the CSV-File
+
+        Args:
+            path_to_csv: str - Path of the CSV-File
+            infos: List of List - Information of every finished Sample as returned by generate_sample
+        """
+        if infos:
+            self.__manifest_frame(infos).to_csv(path_to_csv, mode='a', header=False, sep=',', index=False,
+                                                encoding='utf-8')
+
+    @staticmethod
+    def __is_valid_sample(midi_file_path, wav_file_path, label_file_path=None):
+        """
+        Checks that all Files of a Sample exist and are complete: the MIDI-File starts with its header, the Label File
+        is a zip archive and the size of the WAV-File matches the size stored in its RIFF header. A FLAC-File stores
+        no size in its header, so only its signature and stream info are checked.
+
+        Args:
+            midi_file_path: str - Path of the MIDI-File
+            wav_file_path: str - Path of the WAV-File
+            label_file_path: str - Path of the Label File, None if the Sample has none
+        """
+        if not os.path.isfile(midi_file_path) or not os.path.isfile(wav_file_path):
+            return False
+        if label_file_path is not None:
+            if not os.path.isfile(label_file_path):
+                return False
+            with open(label_file_path, 'rb') as label_file:
+                if label_file.read(2) != b'PK':
+                    return False
+        with open(midi_file_path, 'rb') as midi_file:
+            if midi_file.read(4) != b'MThd':
+                return False
+        with open(wav_file_path, 'rb') as wav_file:
+            header = wav_file.read(12)
+        if header[:4] == b'fLaC':
+            # signature and the stream info block of 4 + 34 bytes
+            return os.path.getsize(wav_file_path) > 42
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            return False
+        return int.from_bytes(header[4:8], 'little') + 8 == os.path.getsize(wav_file_path)
+
+    @staticmethod
+    def __is_valid_record(shard_reader, offset, sample_id):
+        """
+        Checks that a shard holds the complete record of a Sample at the given offset
+
+        Args:
+            shard_reader: ShardReader - Opened shard
+            offset: int - Offset of the record
+            sample_id: int - ID of the Sample
+        """
+        try:
+            record = shard_reader.record(offset)
+        except Exception:
+            return False
+        return record.sampleId == sample_id and record.end <= os.path.getsize(shard_reader.shardPath)
+
+    def __resume_point(self, path_to_csv, settings, first_id, number_of_samples, plan=None):
+        """
+        Reads the CSV-File of an interrupted batch, whose Settings were taken over by __adopt_settings, and returns
+        the ID of the first Sample which has to be generated again. Every row of the CSV-File has to match the plan
+        of its ID and both of its Files have to be complete. The CSV-File is cut off at the first row that does not.
+
+        Args:
+            path_to_csv: str - Path of the CSV-File of the batch
+            settings: dict - Settings of the batch
+            first_id: int - ID of the first Sample of the batch
+            number_of_samples: int - Number of Samples of the batch from first_id on
+            plan: GenerationPlan - Plan of the whole batch, it is drawn from the Settings if None
+        """
+        existing = pd.read_csv(path_to_csv, sep=',', encoding='utf-8')
+        if plan is None:
+            plan = self.plan_batch(min(len(existing), number_of_samples), settings["use_polyphonic"],
+                                   settings["seed_stream"], first_id)
+        return first_id + self.__cut_manifest(path_to_csv, existing, self.folderPath, plan, plan.ids)
+
+    def __adopt_settings(self, path_to_csv, settings):
+        """
+        Reads the Settings File of an interrupted batch, checks it against the Settings of the batch and takes over
+        its Master Seed
+
+        Args:
+            path_to_csv: str - Path of the CSV-File of the batch
+            settings: dict - Settings of the batch
+        """
+        path_to_settings = settings_path(path_to_csv)
+        if not os.path.isfile(path_to_settings):
+            raise Exception("Can not resume without the Settings File '{0}'.".format(path_to_settings))
+        with open(path_to_settings) as settings_file:
+            stored_settings = json.load(settings_file)
+        self.check_settings(stored_settings, settings)
+        self.seed = stored_settings["seed"]
+
+    def __cut_manifest(self, path_to_csv, existing, folder_path, plan, sample_ids):
+        """
+        Cuts the CSV-File of an interrupted batch off at the first row that is not the planned Sample of its ID or
+        whose Files are not complete and returns the number of rows kept
+
+        Args:
+            path_to_csv: str - Path of the CSV-File
+            existing: pandas.DataFrame - Rows of the CSV-File
+            folder_path: str - Folder of the Data Set
+            plan: GenerationPlan - Plan holding the Samples of the batch
+            sample_ids: ndarray - IDs of the Samples of the batch in the order of the rows
+        """
+        valid_rows = self.__valid_planned_rows(existing, folder_path, plan, sample_ids)
+        if valid_rows < len(existing):
+            existing[:valid_rows].to_csv(path_to_csv, sep=',', index=False, encoding='utf-8')
+        return valid_rows
+
+    def valid_rows(self, existing, settings, first_id, number_of_samples, check_files=True, redrawn=None):
+        """
+        Returns the number of leading rows of a CSV-File which are the planned Samples of the IDs from first_id on
+        and, if check_files is True, whose Files or records are complete
+
+        Args:
+            existing: pandas.DataFrame - Rows of the CSV-File
+            settings: dict - Settings of the batch
+            first_id: int - ID of the Sample of the first row
+            number_of_samples: int - Maximum number of rows to check
+            check_files: bool - Switch for checking the Files or records of the rows
+            redrawn: pandas.DataFrame - Redrawn Samples of a deduplicated batch, see dedup_paths
+        """
+        plan = self.plan_batch(min(len(existing), number_of_samples), settings["use_polyphonic"],
+                               settings["seed_stream"], first_id)
+        if redrawn is not None:
+            self.__apply_redrawn(plan, redrawn)
+        return self.__valid_planned_rows(existing, self.folderPath, plan, plan.ids, check_files)
+
+    def __valid_planned_rows(self, existing, folder_path, plan, sample_ids, check_files=True):
+        """
+        Returns the number of leading rows of a CSV-File which are the planned Samples of the given IDs and, if
+        check_files is True, whose Files or records are complete
+
+        Args:
+            existing: pandas.DataFrame - Rows of the CSV-File
+            folder_path: str - Folder of the Data Set
+            plan: GenerationPlan - Plan holding the Samples
+            sample_ids: ndarray - IDs of the Samples expected in the rows, in their order
+            check_files: bool - Switch for checking the Files or records of the rows
+        """
+        sample_ids = sample_ids[:len(existing)]
+        if self.outputFormat == "shards":
+            return self.__valid_shard_rows(existing, folder_path, sample_ids, check_files)
+
+        planned = self.create_manifest(plan, sample_ids)
+        file_columns = [column for column in ['MIDI-File', 'WAV-File', 'Label-File'] if column in planned.columns]
+        matches = np.ones(len(planned), dtype=bool)
+        for column in file_columns:
+            matches &= existing[column].values[:len(planned)] == planned[column].values
+        valid_rows = len(planned) if matches.all() else int(np.argmin(matches))
+        if check_files:
+            for row in range(valid_rows):
+                paths = [os.path.join(folder_path, existing[column].iloc[row]) for column in file_columns]
+                if not self.__is_valid_sample(*paths) or not self.__has_features(existing, folder_path, row):
+                    return row
+        return valid_rows
+
+    def __has_features(self, existing, folder_path, row):
+        """
+        Checks that the feature chunk of a row of a CSV-File holds the whole spectrogram of its Sample, rows of a
+        batch without features have none to check
+
+        Args:
+            existing: pandas.DataFrame - Rows of the CSV-File
+            folder_path: str - Folder of the Data Set
+            row: int - Row of the CSV-File
+        """
+        if self.features is None:
+            return True
+        chunk, offset, frames = existing[FEATURE_MANIFEST_COLUMNS].iloc[row]
+        if pd.isnull(chunk):
+            return False
+        return is_valid_features(os.path.join(folder_path, self.featureFolderName, chunk), self.feature_bins,
+                                 int(offset), int(frames))
+
+    @property
+    def feature_bins(self):
+        """
+        Number of values of every frame of the written spectrograms
+        """
+        return feature_bins(self.features, self.fftSize, self.melBins)
+
+    def __valid_shard_rows(self, existing, folder_path, sample_ids, check_files=True):
+        """
+        Returns the number of leading rows of a shard CSV-File whose IDs are the given IDs and, if check_files is
+        True, whose records are complete
+
+        Args:
+            existing: pandas.DataFrame - Rows of the CSV-File
+            folder_path: str - Folder of the Data Set
+            sample_ids: ndarray - IDs of the Samples expected in the rows, in their order
+            check_files: bool - Switch for checking the records of the rows
+        """
+        readers = {}
+        try:
+            for row_index, row in enumerate(existing[:len(sample_ids)].itertuples(index=False)):
+                current_id = int(sample_ids[row_index])
+                if row.ID != current_id:
+                    return row_index
+                if not check_files:
+                    continue
+                shard_path = os.path.join(folder_path, self.shardFolderName, row.Shard)
+                if not os.path.isfile(shard_path):
+                    return row_index
+                if row.Shard not in readers:
+                    readers[row.Shard] = ShardReader(shard_path)
+                if not self.__is_valid_record(readers[row.Shard], row.Offset, current_id) or \
+                        not self.__has_features(existing, folder_path, row_index):
+                    return row_index
+            return min(len(existing), len(sample_ids))
+        finally:
+            for reader in readers.values():
+                reader.close()
+
+    def apply_batch_settings(self, destination_folder, settings):
+        """
+        Takes over the Master Seed and the Settings the Samples depend on from the Settings File of a batch which is
+        generated already, e.g. of a part of it, see Util.DataSetSplit.merge_parts
+
+        Args:
+            destination_folder: str - Folder of the batch
+            settings: dict - Settings read from its Settings File
+        """
+        self.folderPath = destination_folder
+        self.seed = settings["seed"]
+        self.numberOfNotesPerSample = settings["number_of_notes_per_sample"]
+        self.outputFormat = settings.get("output_format", "files")
+        self.labelFrameRate = settings.get("label_frame_rate")
+        self.audioFormat = settings.get("audio_format", "wav")
+
+    def merge_parts(self, destination_folder, number_of_parts, name_of_csv="DB_WAVs_and_MIDIs.csv"):
+        """
+        Merges the CSV-Files of all parts of a batch generated with batch_generate(part_index=i,
+        number_of_parts=number_of_parts) into one CSV-File, see Util.DataSetSplit.merge_parts
+
+        Args:
+            destination_folder: str - Folder holding the CSV-Files of all parts
+            number_of_parts: int - Number of parts the batch was split into
+            name_of_csv: str - Name of the merged CSV-File, the name the parts were generated with
+        """
+        merge_parts(self, destination_folder, number_of_parts, name_of_csv)
+
+    def merge_parts_with_split(self, destination_directory, number_of_parts):
+        """
+        Merges the parts of the train and the test Data Set generated with batch_generate_with_split, see merge_parts
+
+        Args:
+            destination_directory: str - Directory holding the folders 'Train' and 'Test'
+            number_of_parts: int - Number of parts the batches were split into
+        """
+        merge_parts_with_split(self, destination_directory, number_of_parts)
+
+    def plan_split(self, number_of_samples_train, number_of_samples_test, use_polyphonic=True, holdout=None,
+                   dedup_indexes=None):
+        """
+        Assigns the Samples of one combined ID space to a train and a test Data Set and returns the GenerationPlan and
+        the Data Set of every planned Sample, see Util.DataSetSplit.plan_split
+
+        Args:
+            number_of_samples_train: int - Number of Samples of the train Data Set
+            number_of_samples_test: int - Number of Samples of the test Data Set
+            use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+            holdout: dict - Values of the CSV columns 'Scale', 'RootNote', 'BPM' and 'SynthModules' which are only in
+                     the test Data Set, e.g. {"Scale": ["Dorian"], "RootNote": ["C#"]}
+            dedup_indexes: List of DedupIndex or BloomFilter - Index of the train and of the test Data Set
+        """
+        return plan_split(self, number_of_samples_train, number_of_samples_test, use_polyphonic, holdout,
+                          dedup_indexes)
+
+    def batch_generate_split(self, destination_directory, number_of_samples_train, number_of_samples_test,
+                             use_polyphonic=True, holdout=None, workers=1, resume=False, labels=False,
+                             label_frame_rate=100, writers=0, queue_size=32, metrics=False, metrics_hook=None,
+                             dedup_against=None):
+        """
+        Generates a train and a test Data Set in one pass into the folders 'Train' and 'Test' of destination_directory.
+        Both Data Sets are assigned from one combined ID space by plan_split, so their IDs never overlap and no melody
+        is in both, and they are rendered by the same worker processes and writers. Every Data Set gets its own
+        CSV-File ('train.csv' and 'test.csv') with the column 'ID' and its own Settings File. An interrupted run is
+        continued with resume=True, see batch_generate for the other arguments. With dedup a Sample which sounds like
+        another one of both Data Sets is left out and every Data Set saves its dedup index.
+
+        Args:
+            destination_directory: str - Directory where the folders 'Train' and 'Test' are created
+            number_of_samples_train: int - Number of Samples of the train Data Set
+            number_of_samples_test: int - Number of Samples of the test Data Set
+            use_polyphonic: bool - Switch for creating polyphonic Samples or Monophonic
+            holdout: dict - Values of CSV columns which are only in the test Data Set, see plan_split. Without them
+                     the Samples are split by the ratio of number_of_samples_train and number_of_samples_test
+            workers: int - Number of worker processes used for generating the Samples of both Data Sets
+            resume: bool - Switch for continuing an interrupted run in destination_directory
+            labels: bool - Switch for writing frame-level labels of every Sample
+            label_frame_rate: float - Frames per second of the labels
+            writers: int - Number of writer threads of the pipeline
+            queue_size: int - Maximum number of Samples waiting in each queue of the pipeline
+            metrics: bool - Switch for timing the stages and counting the Notes of every Sample
+            metrics_hook: callable - Called as metrics_hook(record, metrics) for every finished Sample
+            dedup_against: str or List of str - Paths of the dedup indexes of other Data Sets, whose Samples are not
+                           repeated, see dedup_paths
+        """
+        self.labelFrameRate = label_frame_rate if labels else None
+        self.pipelined = writers > 0
+        if isinstance(dedup_against, str):
+            dedup_against = [dedup_against]
+        if holdout is not None:
+            holdout = {column: [values] if isinstance(values, (str, int)) else list(values)
+                       for column, values in holdout.items()}
+            check_holdout(self, holdout)
+        targets = [number_of_samples_train, number_of_samples_test]
+        split = {"number_of_samples_train": number_of_samples_train, "number_of_samples_test": number_of_samples_test,
+                 "holdout": holdout}
+
+        folder_paths = [os.path.join(destination_directory, folder_name) for folder_name in SPLIT_FOLDERS]
+        paths_to_csv = [os.path.join(folder_path, name_of_csv)
+                        for folder_path, name_of_csv in zip(folder_paths, SPLIT_CSV_NAMES)]
+        settings = [dict(self.__batch_settings(target, use_polyphonic, 0, 0, 1, split, dedup_against),
+                         split_index=split_index) for split_index, target in enumerate(targets)]
+        for folder_path, path_to_csv, split_settings in zip(folder_paths, paths_to_csv, settings):
+            if not os.path.exists(folder_path):
+                os.makedirs(folder_path)
+            self.__handle_folders(folder_path, resume)
+            if resume and os.path.isfile(path_to_csv):
+                self.__adopt_settings(path_to_csv, split_settings)
+        self.folderPath = destination_directory
+        print("Generating Data into: '{0}'\n".format(self.folderPath))
+
+        # Assign the Samples to the Data Sets after the Master Seed of a resumed run is known
+        dedup_indexes = None
+        if self.dedup is not None:
+            dedup_indexes = [self.__open_dedup_index(dedup_against) for _ in SPLIT_FOLDERS]
+        self.plan, self.planSplits = self.plan_split(number_of_samples_train, number_of_samples_test, use_polyphonic,
+                                                     holdout, dedup_indexes)
+        if dedup_indexes is not None:
+            for dedup_index, path_to_csv in zip(dedup_indexes, paths_to_csv):
+                dedup_index.save(self.dedup_paths(path_to_csv)[0])
+        try:
+            remaining_ids = []
+            outputs = []
+            for split_index, (folder_path, path_to_csv) in enumerate(zip(folder_paths, paths_to_csv)):
+                sample_ids = self.plan.ids[self.planSplits == split_index]
+                first_row = 0
+                if resume and os.path.isfile(path_to_csv):
+                    first_row = self.__cut_manifest(path_to_csv, pd.read_csv(path_to_csv, sep=',', encoding='utf-8'),
+                                                    folder_path, self.plan, sample_ids)
+                    print("Resuming '{0}' at Sample {1}.\n".format(path_to_csv, first_row))
+                else:
+                    # The Master Seed may have been taken over from the other Data Set
+                    settings[split_index]["seed"] = self.seed
+                    self.__create_manifest_files(path_to_csv, settings[split_index])
+                remaining_ids.append(sample_ids[first_row:])
+                shard_writer = self.__open_shard_writer(folder_path, "shard") if self.outputFormat == "shards" \
+                    else None
+                outputs.append(_BatchOutput(folder_path, path_to_csv, shard_writer,
+                                            self.__open_feature_writer(folder_path, "features")))
+
+            self.collectMetrics = metrics or metrics_hook is not None
+            generation_metrics = GenerationMetrics(hook=metrics_hook) if self.collectMetrics else None
+            remaining_ids = np.sort(np.concatenate(remaining_ids))
+            self.__generate_samples(remaining_ids.tolist(), outputs, workers, writers, queue_size, generation_metrics,
+                                    sum(targets), sum(targets) - len(remaining_ids))
+        finally:
+            self.planSplits = None
+
+        if generation_metrics is not None:
+            generation_metrics.write(destination_directory, "split_metrics")
+
+        print("\nGenerated {0} train and {1} test Samples into '{2}', {3} IDs were left out.".format(
+            number_of_samples_train, number_of_samples_test, destination_directory, len(self.plan) - sum(targets)))
 
     def batch_generate_with_split(self, destination_directory, number_of_samples_train,
-                                  number_of_samples_test, use_polyphonic):
+                                  number_of_samples_test, use_polyphonic, workers=1, resume=False, writers=0,
+                                  part_index=0, number_of_parts=1, single_pass=False, holdout=None, labels=False,
+                                  label_frame_rate=100, queue_size=32, metrics=False, metrics_hook=None,
+                                  dedup_against=None):
         """
         Checks if self.midiFolderName and self.wavFolderName are already existent in destinationFolder and clears them
         if Files are already in them. If they do not exists then it will create them.
@@ -139,7 +952,10 @@ class DataBaseGenerator:
         Then it generates as much MIDI-Files as given by numberOfSamples. From these Files WAV-Files are synthesized and
         the Paths to both MIDI and WAV-Files are stored in a CSV File which is also saved into destinationFolder.
 
-        These generated Files are split into a test and a train Data Set.
+        These generated Files are split into a test and a train Data Set. With single_pass or holdout both Data Sets
+        are generated in one pass by batch_generate_split, which keeps every melody in only one of them. With dedup
+        the test Data Set is deduplicated against the train Data Set (of the same part). Labels, metrics and
+        dedup_against are passed on to both Data Sets, see batch_generate.
 
         Args:
 
@@ -147,7 +963,32 @@ class DataBaseGenerator:
             number_of_samples_train: int - Number of Samples to generate for the train Data Set
             number_of_samples_test: int - Number of Samples to generate for the test Data Set
             use_polyphonic: bool - Switch for creating polyphonic Samples or Monophonic
+            workers: int - Number of worker processes used for generating the Samples
+            resume: bool - Switch for continuing an interrupted run in destination_directory
+            writers: int - Number of writer threads of the pipeline, see batch_generate
+            part_index: int - Index of the part of both Data Sets to generate, see batch_generate
+            number_of_parts: int - Number of parts both Data Sets are split into
+            single_pass: bool - Switch for generating both Data Sets in one pass, see batch_generate_split
+            holdout: dict - Values of CSV columns which are only in the test Data Set, see plan_split
+            labels: bool - Switch for writing frame-level labels of every Sample
+            label_frame_rate: float - Frames per second of the labels
+            queue_size: int - Maximum number of Samples waiting in each queue of the pipeline
+            metrics: bool - Switch for timing the stages and counting the Notes of every Sample
+            metrics_hook: callable - Called as metrics_hook(record, metrics) for every finished Sample
+            dedup_against: str or List of str - Paths of the dedup indexes of other Data Sets, whose Samples are not
+                           repeated in either Data Set, see dedup_paths
         """
+        if isinstance(dedup_against, str):
+            dedup_against = [dedup_against]
+        if single_pass or holdout is not None:
+            if number_of_parts > 1:
+                raise Exception("A Data Set generated in one pass can not be split into parts.")
+            self.batch_generate_split(destination_directory, number_of_samples_train, number_of_samples_test,
+                                      use_polyphonic, holdout, workers=workers, resume=resume, labels=labels,
+                                      label_frame_rate=label_frame_rate, writers=writers, queue_size=queue_size,
+                                      metrics=metrics, metrics_hook=metrics_hook, dedup_against=dedup_against)
+            return
+
         # Train
         print("############## Generating Train Files...###########################\n")
         train_folder = os.path.join(destination_directory, "Train")
@@ -156,21 +997,50 @@ class DataBaseGenerator:
         self.batch_generate(destination_folder=train_folder,
                             number_of_samples=number_of_samples_train,
                             name_of_csv="train.csv",
-                            use_polyphonic=use_polyphonic)
+                            use_polyphonic=use_polyphonic,
+                            workers=workers,
+                            seed_stream=0,
+                            metrics=metrics,
+                            metrics_hook=metrics_hook,
+                            resume=resume,
+                            labels=labels,
+                            label_frame_rate=label_frame_rate,
+                            writers=writers,
+                            queue_size=queue_size,
+                            part_index=part_index,
+                            number_of_parts=number_of_parts,
+                            dedup_against=dedup_against)
         print("############## Finished generating Train Files####################\n")
         # Test
         print("############## Generating Test Files...###########################\n")
         test_folder = os.path.join(destination_directory, "Test")
         if not os.path.exists(test_folder):
             os.makedirs(test_folder)
+        if self.dedup is not None:
+            dedup_against = (dedup_against or []) + [self.dedup_paths(os.path.join(
+                train_folder, part_csv_name("train.csv", part_index, number_of_parts)))[0]]
         self.batch_generate(destination_folder=test_folder,
                             number_of_samples=number_of_samples_test,
                             name_of_csv="test.csv",
-                            use_polyphonic=use_polyphonic)
+                            use_polyphonic=use_polyphonic,
+                            workers=workers,
+                            seed_stream=1,
+                            metrics=metrics,
+                            metrics_hook=metrics_hook,
+                            resume=resume,
+                            labels=labels,
+                            label_frame_rate=label_frame_rate,
+                            writers=writers,
+                            queue_size=queue_size,
+                            part_index=part_index,
+                            number_of_parts=number_of_parts,
+                            dedup_against=dedup_against)
         print("############## Finished generating Test Files#####################\n")
 
     def batch_generate(self, destination_folder, number_of_samples, name_of_csv="DB_WAVs_and_MIDIs.csv",
-                       use_polyphonic=True):
+                       use_polyphonic=True, workers=1, seed_stream=0, metrics=False, metrics_hook=None,
+                       resume=False, labels=False, label_frame_rate=100, writers=0, queue_size=32, part_index=0,
+                       number_of_parts=1, dedup_against=None):
         """
         Checks if self.midiFolderName and self.wavFolderName are already existent in destinationFolder and clears them
         if Files are already in them. If they do not exists then it will create them.
@@ -178,76 +1048,634 @@ class DataBaseGenerator:
         Then it generates as much MIDI-Files as given by numberOfSamples. From these Files WAV-Files are synthesized and
         the Paths to both MIDI and WAV-Files are stored in a CSV File which is also saved into destinationFolder.
 
+        Before anything is rendered, all Parameters of the batch are drawn as GenerationPlan. The rows of finished
+        Samples are appended to the CSV File in batches of MANIFEST_FLUSH_SIZE, so an interrupted run keeps its
+        CSV File. It can be continued with resume=True, which checks the existing rows and Files and generates the
+        remaining Samples with the same Parameters. The Master Seed and Settings of the batch are stored in
+        '<CSV name>_settings.json' for that.
+
+        With the output format "shards" the Samples are packed into the shard files of the folder 'Shards' in the
+        order of their IDs and the CSV File stores the shard and offset of every Sample. A resumed run continues with
+        a new shard.
+
+        If labels is True the piano roll, onset and offset labels of every Sample are computed from its Notes at
+        label_frame_rate frames per second and stored as compressed npz-File, in the folder 'Label-Files' with its
+        path in the CSV column 'Label-File' or inside the record of the Sample in its shard.
+
+        If the DataBaseGenerator was created with features, the spectrogram of every Sample is computed right after it
+        is rendered and appended to the float32 chunks of the folder 'Features' in the order of the IDs. The CSV
+        columns 'Feature-Chunk', 'Feature-Offset' and 'Feature-Frames' locate it and its parameters are stored in the
+        Settings File. The Samples are then always rendered into memory and their Files are written by the main
+        process or by the writers.
+
+        If workers is greater than 1 the Sample IDs are distributed to a pool of worker processes, which all index
+        into the same plan, so the generated Data is the same for any number of workers.
+
+        If writers is greater than 0 the batch runs as pipeline: the Samples are composed and rendered into memory
+        and a pool of writer threads writes their Files (or a single one their records into the shards) while the
+        next Samples are rendered. At most queue_size Samples wait for rendering and at most queue_size for writing,
+        when a queue is full the stage before it waits. Samples are added to the CSV File in the order of their IDs
+        after their Files are written. The depth of both queues is part of the metrics.
+
+        A batch can be split into number_of_parts parts of consecutive IDs, which are generated apart from each other,
+        e.g. on several machines with the same Master Seed, into the same or into different folders. Every part writes
+        its own CSV File '<CSV name>.part-<part_index>-of-<number_of_parts>.csv' with its Settings, its Samples are
+        the same as in a batch generated at once. merge_parts combines the CSV Files of the finished parts.
+
+        If metrics is True every stage of every Sample is timed and the Notes, Chords and Rests are counted. The
+        rolling throughput and stage durations are shown in the progress bar and written as '<CSV name>_metrics.json'
+        (summary) and '<CSV name>_metrics.csv' (one row per Sample) next to the CSV File.
+
+        If the DataBaseGenerator was created with dedup, the batch is planned by plan_unique, so no Sample sounds like
+        another one of the batch or of the Data Sets of dedup_against. The hashes of the Samples are saved as
+        '<CSV name>_dedup.npz' and the IDs whose Parameters were drawn again as '<CSV name>_redrawn.csv', so a
+        resumed run has the same Samples and later batches can be deduplicated against this one. Every part of a
+        batch is deduplicated on its own.
+
         Args:
             number_of_samples: int - Number of Samples to generate
             destination_folder: str - Path where to save Files into
             name_of_csv: str - Name of CSV
             use_polyphonic: bool - Switch for creating polyphonic Samples or Monophonic
+            workers: int - Number of worker processes used for generating the Samples
+            seed_stream: int - Key mixed into the Seed of the plan to separate independent runs
+            metrics: bool - Switch for timing the stages and counting the Notes of every Sample
+            metrics_hook: callable - Called as metrics_hook(record, metrics) for every finished Sample, where record
+                          is a dict of the Sample and metrics the GenerationMetrics of the batch. Enables metrics
+            resume: bool - Switch for continuing an interrupted run in destination_folder
+            labels: bool - Switch for writing frame-level labels of every Sample
+            label_frame_rate: float - Frames per second of the labels
+            writers: int - Number of writer threads of the pipeline, 0 writes every Sample before the next one is
+                     generated
+            queue_size: int - Maximum number of Samples waiting in each queue of the pipeline
+            part_index: int - Index of the part of the batch to generate, from 0 to number_of_parts - 1
+            number_of_parts: int - Number of parts the batch is split into, e.g. to generate it on several machines
+            dedup_against: str or List of str - Paths of the dedup indexes of other Data Sets, whose Samples are not
+                           repeated, see dedup_paths
         """
-        self.__handle_folders(destination_folder)
+        self.labelFrameRate = label_frame_rate if labels else None
+        self.pipelined = writers > 0
+        self.planSplits = None
+        self.numberOfParts = number_of_parts
+        if isinstance(dedup_against, str):
+            dedup_against = [dedup_against]
+        # The parts of a batch may be generated into the same folder, so the Files of other parts are kept
+        self.__handle_folders(destination_folder, resume or number_of_parts > 1)
         print("Generating Data into: '{0}'\n".format(self.folderPath))
-        # Init Lists
-        ids = []
-        midi_file_paths = []
-        wave_file_paths = []
-        tempos = []
-        scales = []
-        root_notes = []
-        synth_modules = []
-
-        inputs = tqdm(range(0, number_of_samples))
-
-        for i in inputs:
-            result = self.__generate(i, use_polyphonic)
-            ids.append(result[0])
-            midi_file_paths.append(result[1])
-            wave_file_paths.append(result[2])
-            tempos.append(result[3])
-            scales.append(result[4])
-            root_notes.append(result[5])
-            synth_modules.append(result[6])
-
-        # Create and save CSV-File from Lists
-        data = {'WAV-File': wave_file_paths,
-                'MIDI-File': midi_file_paths,
-                "BPM": tempos,
-                "Scale": scales,
-                "RootNote": root_notes,
-                "SynthModules": synth_modules
-                }
-
-        df = pd.DataFrame(data=data)
+
+        range_first_id, range_end_id = part_range(number_of_samples, part_index, number_of_parts)
+        name_of_csv = part_csv_name(name_of_csv, part_index, number_of_parts)
         path_to_csv = os.path.join(self.folderPath, name_of_csv)
-        df.to_csv(path_to_csv, sep=',', index=False, encoding='utf-8')
+        settings = self.__batch_settings(number_of_samples, use_polyphonic, seed_stream, part_index, number_of_parts,
+                                         dedup_against=dedup_against)
+        resuming = resume and os.path.isfile(path_to_csv)
+        if resuming:
+            # The Samples are planned from the Master Seed of the interrupted run
+            self.__adopt_settings(path_to_csv, settings)
+        plan = None
+        if self.dedup is not None:
+            # Whether a Sample is a duplicate depends on the Samples before it, so the whole batch is planned
+            plan = self.__plan_deduplicated(path_to_csv, range_end_id - range_first_id, use_polyphonic, seed_stream,
+                                            range_first_id, dedup_against, resuming)
+        first_id = range_first_id
+        if resuming:
+            first_id = self.__resume_point(path_to_csv, settings, range_first_id, range_end_id - range_first_id, plan)
+            print("Resuming at Sample ID {0}.\n".format(first_id))
+        else:
+            self.__create_manifest_files(path_to_csv, settings)
+        remaining_samples = max(range_end_id - first_id, 0)
+
+        self.collectMetrics = metrics or metrics_hook is not None
+        generation_metrics = GenerationMetrics(hook=metrics_hook) if self.collectMetrics else None
+
+        # Draw all Parameters of the remaining Samples
+        self.plan = plan if plan is not None else self.plan_batch(remaining_samples, use_polyphonic, seed_stream,
+                                                                  first_id)
+        shard_writer = None
+        if self.outputFormat == "shards":
+            shard_writer = self.__open_shard_writer(self.folderPath, "shard" if number_of_parts == 1 else
+                                                    "part-{0:05d}-of-{1:05d}_shard".format(part_index, number_of_parts))
+
+        feature_writer = self.__open_feature_writer(self.folderPath, "features" if number_of_parts == 1 else
+                                                    "part-{0:05d}-of-{1:05d}_features".format(part_index,
+                                                                                             number_of_parts))
+        output = _BatchOutput(self.folderPath, path_to_csv, shard_writer, feature_writer)
+        self.__generate_samples(list(range(first_id, range_end_id)), [output], workers, writers, queue_size,
+                                generation_metrics, range_end_id - range_first_id, first_id - range_first_id)
+
+        if generation_metrics is not None:
+            generation_metrics.write(self.folderPath, os.path.splitext(name_of_csv)[0] + "_metrics")
 
         print("\nGenerated {0} MIDI- and Wave-File(s) and a CSV-File storing "
-              "both references in the Directory: '{1}'.".format(number_of_samples, self.folderPath))
+              "both references in the Directory: '{1}'.".format(range_end_id - range_first_id, self.folderPath))
 
-    def __generate(self, i, use_polyphonic):
+    def __batch_settings(self, number_of_samples, use_polyphonic, seed_stream, part_index, number_of_parts,
+                         split=None, dedup_against=None):
         """
-        Picks a specific set of Parameters for generating one Sample (Midi- and WAV), creates save filenames,
-        generates the Sample from the picked Parameters and returns the paths to the saved Files with some other
+        Returns the Settings of a batch, which are stored in its Settings File
 
         Args:
-            use_polyphonic: bool - Switch for creating polyphonic Samples or Monophonic
+            number_of_samples: int - Number of Samples of the whole batch
+            use_polyphonic: bool - Switch for polyphonic Samples or Monophonic
+            seed_stream: int - Seed Stream of the plan
+            part_index: int - Index of the generated part of the batch
+            number_of_parts: int - Number of parts the batch is split into
+            split: dict - Numbers of train and test Samples and held-out values of a split batch, None otherwise
+            dedup_against: List of str - Paths of the dedup indexes of other Data Sets of a deduplicated batch
         """
-        # Init Sample
-        sample_gen = SampleGenerator(self.possibleRoots, self.possibleSigns, self.possibleScales,
-                                     self.possibleOctaves, self.possiblePauseRatios, self.possibleChordRatios,
-                                     self.possibleTempos, self.possibleNoteLengths, self.synth_modules)
+        dedup = None
+        if self.dedup is not None:
+            dedup = {"mode": self.dedup, "against": list(dedup_against or [])}
+            if self.dedup == "bloom":
+                dedup.update(capacity=self.dedupCapacity, error_rate=self.dedupErrorRate)
+        return {"seed": self.seed, "seed_stream": seed_stream, "number_of_samples": number_of_samples,
+                "number_of_notes_per_sample": self.numberOfNotesPerSample, "use_polyphonic": use_polyphonic,
+                "backend": self.backend, "output_format": self.outputFormat,
+                "label_frame_rate": self.labelFrameRate, "part_index": part_index,
+                "number_of_parts": number_of_parts, "sampling_rate": self.samplingRate, "channels": self.channels,
+                "bit_depth": self.bitDepth, "audio_format": self.audioFormat,
+                "chord_size_weights": {str(size): weight for size, weight in sorted(self.chordSizeWeights.items())},
+                "split": split, "dedup": dedup, "features": self.__feature_settings()}
 
-        # Create save FileName
-        midi_file_name = self.__create_save_file_name("MIDI", "mid", i, sample_gen)
-        wav_file_name = self.__create_save_file_name("WAV", "wav", i, sample_gen)
+    def __feature_settings(self):
+        """
+        Returns the parameters of the spectrograms of a batch which are stored in its Settings File, None if no
+        features are written
+        """
+        if self.features is None:
+            return None
+        return {"kind": self.features, "fft_size": self.fftSize, "hop_size": self.hopSize,
+                "mel_bins": self.melBins if self.features == "mel" else None, "bins": self.feature_bins,
+                "window": "hann", "dtype": "float32"}
 
-        midi_file_path = os.path.join(self.folderPath, self.midiFolderName, midi_file_name)
-        wav_file_path = os.path.join(self.folderPath, self.wavFolderName, wav_file_name)
-        rel_midi_file_path = os.path.join(self.midiFolderName, midi_file_name)
-        rel_wav_file_path = os.path.join(self.wavFolderName, wav_file_name)
+    def __create_manifest_files(self, path_to_csv, settings):
+        """
+        Writes the Settings File and a CSV-File without rows for a new batch
+
+        Args:
+            path_to_csv: str - Path of the CSV-File
+            settings: dict - Settings of the batch
+        """
+        with open(settings_path(path_to_csv), "w") as settings_file:
+            json.dump(settings, settings_file, indent=2)
+        self.__manifest_frame([]).to_csv(path_to_csv, sep=',', index=False, encoding='utf-8')
+
+    def __open_shard_writer(self, folder_path, prefix):
+        """
+        Returns a ShardWriter for the folder 'Shards' in folder_path, which continues after the shards with the same
+        prefix written before
+
+        Args:
+            folder_path: str - Folder of the Data Set
+            prefix: str - Start of the filenames of the shards
+        """
+        shard_folder_path = os.path.join(folder_path, self.shardFolderName)
+        return ShardWriter(shard_folder_path, self.shardSize,
+                           first_shard=len([name for name in os.listdir(shard_folder_path)
+                                            if name.startswith(prefix + "_") and name.endswith(".bin")]),
+                           prefix=prefix)
+
+    def __open_feature_writer(self, folder_path, prefix):
+        """
+        Returns a FeatureWriter for the folder 'Features' in folder_path, which continues after the chunks with the
+        same prefix written before, or None if no features are written
+
+        Args:
+            folder_path: str - Folder of the Data Set
+            prefix: str - Start of the filenames of the chunks
+        """
+        if self.features is None:
+            return None
+        feature_folder_path = os.path.join(folder_path, self.featureFolderName)
+        return FeatureWriter(feature_folder_path, self.feature_bins, self.featureChunkSize,
+                             first_chunk=len([name for name in os.listdir(feature_folder_path)
+                                              if name.startswith(prefix + "_") and name.endswith(".f32")]),
+                             prefix=prefix)
+
+    def __generate_samples(self, sample_ids, outputs, workers, writers, queue_size, generation_metrics,
+                           total, initial=0):
+        """
+        Generates the Samples of the current plan with the given IDs, in ascending order, and writes every one into
+        its output. The rows of finished Samples are appended to the CSV-File of their output in batches of
+        MANIFEST_FLUSH_SIZE, so every CSV-File holds its Samples in the order of their IDs.
+
+        Args:
+            sample_ids: List of int - IDs of the Samples
+            outputs: List of _BatchOutput - Outputs of the batch, indexed by the split of the Samples
+            workers: int - Number of worker processes, see batch_generate
+            writers: int - Number of writer threads of the pipeline, see batch_generate
+            queue_size: int - Maximum number of Samples waiting in each queue of the pipeline
+            generation_metrics: GenerationMetrics - Receives the record of every Sample, None if not collected
+            total: int - Number of Samples of the batch shown in the progress bar
+            initial: int - Number of Samples of the batch generated before
+        """
+        # NumPy has no fixed cost per render which rendering several Samples at once could save
+        batch_size = self.renderBatchSize if self.backend == "pyo" else 1
+        batches = [sample_ids[i:i + batch_size] for i in range(0, len(sample_ids), batch_size)]
+        if workers > 1:
+            # Every worker opens its own RenderSession in _init_worker and gets a copy of the plan
+            pool = multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(self,))
+            if self.pipelined:
+                results = self.__bounded_results(pool, batches, max(queue_size, workers))
+            elif batch_size > 1:
+                results = (result for batch in pool.imap(_worker_generate_batch, batches) for result in batch)
+            else:
+                chunk_size = max(1, min(64, len(sample_ids) // (workers * 4)))
+                results = pool.imap(_worker_generate, sample_ids, chunksize=chunk_size)
+        else:
+            pool = None
+            self.renderSession = open_render_session(self.backend, self.voiceCacheSize, self.samplingRate,
+                                                     self.channels, self.bitDepth, self.audioFormat)
+            results = (result for batch in batches for result in self.generate_samples(batch))
+
+        if self.features is not None:
+            results = (self.__write_features(info, record, packed_sample, outputs)
+                       for info, record, packed_sample in results)
+        if self.pipelined:
+            written_samples = self.__write_pipelined(results, outputs, writers, queue_size)
+        else:
+            written_samples = (self.__write_sample(info, record, packed_sample, outputs)
+                               for info, record, packed_sample in results)
+
+        try:
+            progress = tqdm(written_samples, total=total, initial=initial)
+            for info, record in progress:
+                output = outputs[self.__split_of(self.plan.index_of(int(info[0])))]
+                output.finishedInfos.append(info)
+                if len(output.finishedInfos) >= MANIFEST_FLUSH_SIZE:
+                    if output.shardWriter is not None:
+                        output.shardWriter.flush()
+                    if output.featureWriter is not None:
+                        output.featureWriter.flush()
+                    self.__append_to_manifest(output.pathToCsv, output.finishedInfos)
+                    output.finishedInfos = []
+                if generation_metrics is not None:
+                    generation_metrics.add(record)
+                    progress.set_postfix(generation_metrics.postfix(), refresh=False)
+        except BaseException:
+            if pool is not None:
+                pool.terminate()
+            raise
+        finally:
+            # Waits for the writer threads, before the shard they write into is closed
+            written_samples.close()
+            # Samples are only added to the CSV-File after both of their Files are written
+            for output in outputs:
+                if output.shardWriter is not None:
+                    output.shardWriter.close()
+                if output.featureWriter is not None:
+                    output.featureWriter.close()
+                self.__append_to_manifest(output.pathToCsv, output.finishedInfos)
+                output.finishedInfos = []
+            if self.renderSession is not None:
+                self.renderSession.close()
+                self.renderSession = None
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def __bounded_results(pool, batches, queue_size):
+        """
+        Generates the Samples in the worker processes of pool and yields their results in the order of their IDs.
+        Unlike Pool.imap at most queue_size Samples are handed to the workers before their results are taken, so
+        rendering waits while the writers are behind. The number of Samples still waiting is recorded as
+        'render_queue'.
+
+        Args:
+            pool: multiprocessing.Pool - Pool initialized with _init_worker
+            batches: List of List of int - IDs of the Samples, split into the batches rendered together
+            queue_size: int - Maximum number of Samples handed to the workers at once
+        """
+        pending = deque()
+        pending_samples = 0
+        next_index = 0
+        while next_index < len(batches) or pending:
+            while next_index < len(batches) and pending_samples < queue_size:
+                pending.append(pool.apply_async(_worker_generate_batch, (batches[next_index],)))
+                pending_samples += len(batches[next_index])
+                next_index += 1
+            for info, record, packed_sample in pending.popleft().get():
+                pending_samples -= 1
+                if record is not None:
+                    record["render_queue"] = pending_samples
+                yield info, record, packed_sample
+
+    def __write_pipelined(self, results, outputs, writers, queue_size):
+        """
+        Hands every generated Sample to a pool of writer threads and yields the information and metrics record of
+        the written Samples in the order of their IDs. If queue_size Samples are waiting to be written, the oldest
+        one is waited for before the next Sample is generated, the time waited is recorded as 'write_wait'.
+
+        Args:
+            results: iterable - (information, record, packed Sample) of the generated Samples in the order of their IDs
+            outputs: List of _BatchOutput - Outputs of the batch, indexed by the split of the Samples
+            writers: int - Number of writer threads, shards are always written by one
+            queue_size: int - Maximum number of Samples waiting to be written
+        """
+        # Records are appended to a shard one after the other, so only one thread can write them
+        shards = any(output.shardWriter is not None for output in outputs)
+        with ThreadPoolExecutor(max_workers=1 if shards else writers) as writer_pool:
+            pending = deque()
+            for info, record, packed_sample in results:
+                if record is not None:
+                    record["write_queue"] = len(pending)
+                pending.append(writer_pool.submit(self.__write_sample, info, record, packed_sample, outputs))
+                with time_stage(record, "write_wait"):
+                    while len(pending) > queue_size or (pending and pending[0].done()):
+                        yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def __write_sample(self, info, record, packed_sample, outputs):
+        """
+        Writes a Sample generated into memory into its shard or into its MIDI-, WAV- and Label-File and returns its
+        information stored in the CSV File and its metrics record. A Sample whose Files were already written while it
+        was generated is only passed on.
+
+        Args:
+            info: List - Information of the Sample stored in the CSV File
+            record: dict - Metrics record of the Sample, None if metrics are not collected
+            packed_sample: tuple - (PCM, sampling rate, MIDI bytes, metadata, label bytes, features), None if it is
+                           written
+            outputs: List of _BatchOutput - Outputs of the batch, indexed by the split of the Samples
+        """
+        if packed_sample is None:
+            return info, record
+        output = outputs[self.__split_of(self.plan.index_of(int(info[0])))]
+        if output.shardWriter is not None:
+            with time_stage(record, "shard_write"):
+                info[1], info[2] = output.shardWriter.add(int(info[0]), *packed_sample[:5])
+            return info, record
+
+        self.__write_files(output.folderPath, info, record, packed_sample)
+        return info, record
+
+    def __write_features(self, info, record, packed_sample, outputs):
+        """
+        Appends the features of a Sample generated into memory to the feature chunks of its output and stores their
+        location in its information, then passes the Sample on to be written. The features are appended in the order
+        of the IDs by the main process, so the Files can still be written by several threads.
+
+        Args:
+            info: List - Information of the Sample stored in the CSV File
+            record: dict - Metrics record of the Sample, None if metrics are not collected
+            packed_sample: tuple - (PCM, sampling rate, MIDI bytes, metadata, label bytes, features)
+            outputs: List of _BatchOutput - Outputs of the batch, indexed by the split of the Samples
+        """
+        output = outputs[self.__split_of(self.plan.index_of(int(info[0])))]
+        with time_stage(record, "feature_write"):
+            info[8] = output.featureWriter.add(packed_sample[5])
+        return info, record, packed_sample
+
+    def __write_files(self, folder_path, info, record, packed_sample):
+        """
+        Writes the MIDI-, WAV- and Label-File of a Sample generated into memory
+
+        Args:
+            folder_path: str - Folder of the Data Set of the Sample
+            info: List - Information of the Sample stored in the CSV File
+            record: dict - Metrics record of the Sample, None if metrics are not collected
+            packed_sample: tuple - (PCM, sampling rate, MIDI bytes, metadata, label bytes, features)
+        """
+        pcm, sampling_rate, midi_bytes, _, labels_bytes, _ = packed_sample
+        with time_stage(record, "file_write"):
+            with open(os.path.join(folder_path, info[1]), 'wb') as midi_file:
+                midi_file.write(midi_bytes)
+            write_pcm(os.path.join(folder_path, info[2]), pcm, sampling_rate, self.bitDepth, self.audioFormat)
+            if self.labelFrameRate is not None:
+                with open(os.path.join(folder_path, info[7]), 'wb') as label_file:
+                    label_file.write(labels_bytes)
+
+    def __split_of(self, index):
+        """
+        Returns the index of the output a Sample of the current plan is written into: 0 for a batch which is not
+        split or the train Data Set, 1 for the test Data Set
+
+        Args:
+            index: int - Position of the Sample in the plan
+        """
+        return 0 if self.planSplits is None else int(self.planSplits[index])
+
+    def __sample_folder(self, index):
+        """
+        Returns the folder of the Data Set a Sample of the current plan is written into
+
+        Args:
+            index: int - Position of the Sample in the plan
+        """
+        if self.planSplits is None:
+            return self.folderPath
+        return os.path.join(self.folderPath, SPLIT_FOLDERS[self.planSplits[index]])
+
+    def generate_sample(self, current_id):
+        """
+        Generates one Sample of the current Generation Plan and returns its information stored in the CSV File,
+        its metrics record, which is None if metrics are not collected, and the packed Sample (PCM, sampling rate,
+        MIDI bytes, metadata, label bytes, features) which is only set for the output format "shards", a pipelined
+        batch or a batch with features.
+
+        Args:
+            current_id: int - ID of the Sample
+        """
+        if self.plan is None:
+            raise Exception("There is no Generation Plan for the Sample ID '{0}'.".format(current_id))
+        return self.__generate(self.plan.index_of(current_id))
+
+    def generate_samples(self, sample_ids):
+        """
+        Generates several Samples of the current Generation Plan and returns the result of generate_sample for every
+        one. The Samples are composed first and then rendered together in one pass of the RenderSession, see
+        RenderSession.render_pcm_batch, the rendered audio is the same as generate_sample renders.
+
+        Args:
+            sample_ids: List of int - IDs of the Samples
+        """
+        if self.plan is None:
+            raise Exception("There is no Generation Plan for the Sample IDs '{0}'.".format(sample_ids))
+        if len(sample_ids) == 1:
+            return [self.generate_sample(sample_ids[0])]
+        return self.__generate_batch([self.plan.index_of(current_id) for current_id in sample_ids])
+
+    def generate_in_memory(self, number_of_samples, use_polyphonic=True, seed_stream=0, first_id=0,
+                           label_frame_rate=None):
+        """
+        Generates consecutive Samples into memory without writing any File and returns (PCM, Note Events, metadata)
+        of every one. The Samples are the same as batch_generate writes for the same IDs with the same Master Seed
+        and Seed Stream. The PCM has the shape (frames, channels) in the bit depth of the DataBaseGenerator, see
+        Util.AudioFile.to_pcm, the Note Events hold pitch, velocity, start time and duration in seconds and the
+        metadata holds ID, BPM, Scale, RootNote, SynthModules, Length and SamplingRate of the Sample, its
+        frame-level labels as "Labels" if a label frame rate is given and its spectrogram as "Features" if the
+        DataBaseGenerator was created with features. The "pyo" backend renders render_batch_size
+        Samples in one pass. Needs an open RenderSession, see Generators.SampleStream.
+
+        Args:
+            number_of_samples: int - Number of Samples to generate
+            use_polyphonic: bool - Switch for generating polyphonic Samples or Monophonic
+            seed_stream: int - Key that separates Samples with the same ID of independent runs (e.g. train and test)
+            first_id: int - ID of the first Sample
+            label_frame_rate: float - Frames per second of the labels, None for no labels
+        """
+        if self.renderSession is None:
+            raise Exception("There is no open RenderSession for generating the Sample ID '{0}'.".format(first_id))
+        plan = self.plan_batch(number_of_samples, use_polyphonic, seed_stream, first_id)
+        sample_gens = [self.compose_planned(plan, index) for index in range(number_of_samples)]
+
+        batch_size = self.renderBatchSize if self.backend == "pyo" else 1
+        rendered = []
+        for start in range(0, number_of_samples, batch_size):
+            items = [sample_gen.render_item() for sample_gen in sample_gens[start:start + batch_size]]
+            if len(items) > 1:
+                rendered.extend(self.renderSession.render_pcm_batch(items))
+            else:
+                rendered.append(self.renderSession.render_pcm(*items[0]))
+
+        samples = []
+        for index, sample_gen, (pcm, sampling_rate) in zip(range(number_of_samples), sample_gens, rendered):
+            info = self.__planned_sample_info(plan, index)
+            metadata = {"ID": int(info[0]), "BPM": int(info[3]), "Scale": str(info[4]), "RootNote": info[5],
+                        "SynthModules": str(info[6]), "Length": sample_gen.length, "SamplingRate": sampling_rate}
+            if label_frame_rate is not None:
+                metadata["Labels"] = sample_gen.frame_labels(label_frame_rate)
+            if self.features is not None:
+                metadata["Features"] = self.spectrogram(pcm, sampling_rate)
+            samples.append((pcm, sample_gen.note_events, metadata))
+        return samples
+
+    def __generate_batch(self, indices):
+        """
+        Generates several Samples from the Parameters of the current Generation Plan, which are rendered together,
+        and returns the result of __generate for every one. The time of rendering the batch is split evenly among its
+        Samples in their metrics records.
+
+        Args:
+            indices: List of int - Positions of the Samples in the plan
+        """
+        infos, records, sample_gens = [], [], []
+        for index in indices:
+            record = {} if self.collectMetrics else None
+            with time_stage(record, "setup"):
+                info = self.__planned_sample_info(self.plan, index)
+                sample_gen = SampleGenerator(self.possibleRoots, self.possibleSigns, self.possibleScales,
+                                             self.possibleOctaves, self.possiblePauseRatios, self.possibleChordRatios,
+                                             self.possibleTempos, self.possibleNoteLengths, self.synth_modules,
+                                             self.renderSession, self.pitchTable, self.plan, index)
+            with time_stage(record, "compose"):
+                sample_gen.compose(self.numberOfNotesPerSample, self.plan.usePolyphonic)
+            infos.append(info)
+            records.append(record)
+            sample_gens.append(sample_gen)
+
+        batch_timings = {} if self.collectMetrics else None
+        with time_stage(batch_timings, "render"):
+            rendered = self.renderSession.render_pcm_batch([sample_gen.render_item() for sample_gen in sample_gens])
+
+        results = []
+        for index, info, record, sample_gen, (pcm, sampling_rate) in zip(indices, infos, records, sample_gens,
+                                                                         rendered):
+            if record is not None:
+                record["render"] = batch_timings["render"] / len(indices)
+            with time_stage(record, "midi_write"):
+                midi_bytes = sample_gen.encode_midi()
+            packed_sample = self.__pack(info, record, sample_gen, pcm, sampling_rate, midi_bytes)
+            if self.outputFormat != "shards" and not self.pipelined and self.features is None:
+                self.__write_files(self.__sample_folder(index), info, record, packed_sample)
+                packed_sample = None
+            if record is not None:
+                record.update(id=self.plan.firstId + index, notes=len(sample_gen.midi_notes),
+                              chords=sample_gen.numberOfChords, rests=sample_gen.numberOfRests)
+            results.append((info, record, packed_sample))
+        return results
+
+    def __pack(self, info, record, sample_gen, pcm, sampling_rate, midi_bytes):
+        """
+        Returns the packed Sample (PCM, sampling rate, MIDI bytes, metadata, label bytes, features) of a Sample
+        generated into memory, its labels are computed from its Notes and its features from its PCM
+
+        Args:
+            info: List - Information of the Sample stored in the CSV File
+            record: dict - Metrics record of the Sample, None if metrics are not collected
+            sample_gen: SampleGenerator - Generator of the composed Sample
+            pcm: ndarray - Rendered PCM with the shape (frames, channels)
+            sampling_rate: int - Sampling Rate of the PCM in Hz
+            midi_bytes: bytes - Content of the MIDI-File
+        """
+        metadata = {"ID": int(info[0]), "BPM": int(info[3]), "Scale": str(info[4]), "RootNote": info[5],
+                    "SynthModules": str(info[6]), "Length": sample_gen.length}
+        labels_bytes = b''
+        if self.labelFrameRate is not None:
+            with time_stage(record, "labels"):
+                labels_bytes = labels_to_bytes(sample_gen.frame_labels(self.labelFrameRate), self.labelFrameRate)
+        features = None
+        if self.features is not None:
+            with time_stage(record, "features"):
+                features = self.spectrogram(pcm, sampling_rate)
+        return pcm, sampling_rate, midi_bytes, metadata, labels_bytes, features
+
+    def spectrogram(self, pcm, sampling_rate):
+        """
+        Returns the spectrogram of the kind and with the parameters of the DataBaseGenerator, see
+        Util.FeatureStore.spectrogram
+
+        Args:
+            pcm: ndarray - Rendered PCM with the shape (frames, channels)
+            sampling_rate: int - Sampling Rate of the PCM in Hz
+        """
+        return spectrogram(pcm, sampling_rate, self.bitDepth, self.features, self.fftSize, self.hopSize, self.melBins,
+                           self.melFilterbank)
+
+    def __generate(self, index):
+        """
+        Generates one Sample (Midi- and WAV) from the Parameters of the current Generation Plan and returns the paths
+        to the saved Files with some other information, the metrics record of the Sample and the packed Sample if
+        it is written into a shard or by the writers of a pipelined batch.
+
+        Args:
+            index: int - Position of the Sample in the plan
+        """
+        record = {} if self.collectMetrics else None
+        voice_cache = self.renderSession.voiceCache if self.renderSession is not None else None
+        if voice_cache is not None:
+            cache_counts = (voice_cache.hits, voice_cache.misses)
+
+        with time_stage(record, "setup"):
+            info = self.__planned_sample_info(self.plan, index)
+
+            # Init Sample
+            sample_gen = SampleGenerator(self.possibleRoots, self.possibleSigns, self.possibleScales,
+                                         self.possibleOctaves, self.possiblePauseRatios, self.possibleChordRatios,
+                                         self.possibleTempos, self.possibleNoteLengths, self.synth_modules,
+                                         self.renderSession, self.pitchTable, self.plan, index)
+
+        packed_sample = None
+        if self.outputFormat == "shards" or self.pipelined or self.features is not None:
+            # Generate Sample in memory, it is written into its shard or Files by the main process
+            pcm, sampling_rate, midi_bytes = sample_gen.generate_packed(self.numberOfNotesPerSample,
+                                                                        self.plan.usePolyphonic, record)
+            packed_sample = self.__pack(info, record, sample_gen, pcm, sampling_rate, midi_bytes)
+        else:
+            folder_path = self.__sample_folder(index)
+            midi_file_path = os.path.join(folder_path, info[1])
+            wav_file_path = os.path.join(folder_path, info[2])
+
+            # Generate Sample
+            sample_gen.generate(self.numberOfNotesPerSample, midi_file_path, wav_file_path, self.plan.usePolyphonic,
+                                record)
+
+            if self.labelFrameRate is not None:
+                with time_stage(record, "labels"):
+                    labels_bytes = labels_to_bytes(sample_gen.frame_labels(self.labelFrameRate), self.labelFrameRate)
+                    with open(os.path.join(folder_path, info[7]), 'wb') as label_file:
+                        label_file.write(labels_bytes)
 
-        # Generate Sample
-        sample_gen.generate(self.numberOfNotesPerSample, midi_file_path, wav_file_path, use_polyphonic)
+        if record is not None:
+            record.update(id=self.plan.firstId + index, notes=len(sample_gen.midi_notes),
+                          chords=sample_gen.numberOfChords, rests=sample_gen.numberOfRests)
+            if voice_cache is not None:
+                record.update(voice_cache_hits=voice_cache.hits - cache_counts[0],
+                              voice_cache_misses=voice_cache.misses - cache_counts[1])
 
-        # Returns ID, relative path to Midi File, relative path to Wave File, Tempo, Scale, Key
-        return [str(i), rel_midi_file_path, rel_wav_file_path, sample_gen.tempo, sample_gen.scale,
-                sample_gen.rootNote.nameWithOctave, sample_gen.wav_generator.synth_module]
+        # Returns ID, relative path to Midi File, relative path to Wave File, Tempo, Scale, Key, Synth Module, relative
+        # path to Label File and location of the features
+        return info, record, packed_sample
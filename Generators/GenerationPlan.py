@@ -0,0 +1,213 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import numpy as np
+
+# Chords have between 2 and MAX_CHORD_SIZE Notes
+MAX_CHORD_SIZE = 6
+# Relative weight of every Chord size, by default Chords have 2 or 3 Notes with the same probability
+DEFAULT_CHORD_SIZE_WEIGHTS = {2: 1.0, 3: 1.0}
+
+
+def chord_size_probabilities(chord_size_weights):
+    """
+    Returns the possible Chord sizes and their probabilities as arrays
+
+    Args:
+        chord_size_weights: dict - Relative weight of every Chord size from 2 to MAX_CHORD_SIZE
+    """
+    sizes = np.array(sorted(chord_size_weights), dtype=np.int8)
+    weights = np.array([chord_size_weights[size] for size in sorted(chord_size_weights)], dtype=np.float64)
+    if len(sizes) == 0 or sizes.min() < 2 or sizes.max() > MAX_CHORD_SIZE:
+        raise Exception("Chords have between 2 and {0} Notes, not '{1}'.".format(MAX_CHORD_SIZE,
+                                                                               list(chord_size_weights)))
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise Exception("The Chord size weights '{0}' are no distribution.".format(chord_size_weights))
+    return sizes, weights / weights.sum()
+
+
+class GenerationPlan:
+    """
+    Class holding every randomly picked Parameter of a batch of Samples as columnar arrays, indexed by the position
+    of the Sample in the batch (ID - firstId).
+
+    All Parameters are drawn with numpy Generators in blocks of BLOCK_SIZE IDs. Every block has its own Generator,
+    seeded from the Master Seed, the Seed Stream and the index of the block, so the Parameters of an ID are the same
+    no matter which range of IDs is planned and in which process the Sample is generated. A plan with an attempt > 0
+    draws other Parameters for the same IDs, which replace the ones of duplicate Samples, see replace_sample.
+
+    Per Sample: scaleIndices, rootIndices, signIndices, pauseRatioIndices, chordRatioIndices, tempoIndices,
+    synthModuleIndices and splitDraws, a uniform draw which assigns the Sample to train or test in a split batch, each
+    with the shape (samples,).
+
+    Per Note: isNote (False for a Rest), isChord, chordSizes and noteLengths with the shape (samples, notes) and the
+    scale degrees and octaves of distinct pitches with the shape (samples, notes, largest Chord size), the first one
+    is used for Rests and single Notes.
+    """
+
+    BLOCK_SIZE = 1024
+
+    SAMPLE_COLUMNS = ["scaleIndices", "rootIndices", "signIndices", "pauseRatioIndices", "chordRatioIndices",
+                      "tempoIndices", "synthModuleIndices", "splitDraws"]
+    NOTE_COLUMNS = ["isNote", "isChord", "chordSizes", "degrees", "octaves", "noteLengths"]
+
+    def __init__(self, generator, first_id, number_of_samples, use_polyphonic, seed_stream=0, attempt=0):
+        """
+        Initializing GenerationPlan - Object
+
+        Args:
+            generator: DataBaseGenerator - Holds the Master Seed and all possible Parameters
+            first_id: int - ID of the first planned Sample
+            number_of_samples: int - Number of planned Samples
+            use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+            seed_stream: int - Key that separates Samples with the same ID of independent runs (e.g. train and test)
+            attempt: int - Number of the draw of the Parameters, 0 for the first one
+        """
+        self.seed = generator.seed
+        self.seedStream = seed_stream
+        self.attempt = attempt
+        self.firstId = first_id
+        self.numberOfSamples = number_of_samples
+        self.numberOfNotesPerSample = generator.numberOfNotesPerSample
+        self.usePolyphonic = use_polyphonic
+        self.chordSizeWeights = generator.chordSizeWeights
+
+        first_block = first_id // self.BLOCK_SIZE
+        last_block = max(first_block, (first_id + number_of_samples - 1) // self.BLOCK_SIZE)
+        blocks = [self.__draw_block(generator, block_index) for block_index in range(first_block, last_block + 1)]
+
+        offset = first_id - first_block * self.BLOCK_SIZE
+        for column in self.SAMPLE_COLUMNS + self.NOTE_COLUMNS:
+            values = np.concatenate([block[column] for block in blocks])
+            setattr(self, column, values[offset:offset + number_of_samples])
+
+    def __len__(self):
+        return self.numberOfSamples
+
+    @property
+    def ids(self):
+        """
+        Returns the IDs of all planned Samples
+        """
+        return np.arange(self.firstId, self.firstId + self.numberOfSamples)
+
+    def index_of(self, current_id):
+        """
+        Returns the position of a Sample ID in the columns of the plan
+
+        Args:
+            current_id: int - ID of a planned Sample
+        """
+        index = current_id - self.firstId
+        if not 0 <= index < self.numberOfSamples:
+            raise Exception("The Sample ID '{0}' is not part of the Generation Plan.".format(current_id))
+        return index
+
+    def note_columns(self, index):
+        """
+        Returns the Note Parameters of one Sample as Lists: (is_note, is_chord, chord_sizes, degrees, octaves,
+        note_lengths)
+
+        Args:
+            index: int - Position of the Sample in the plan
+        """
+        return tuple(getattr(self, column)[index].tolist() for column in self.NOTE_COLUMNS)
+
+    def replace_sample(self, index, other, other_index):
+        """
+        Replaces all Parameters of a Sample by the ones of a Sample of another plan with the same settings
+
+        Args:
+            index: int - Position of the replaced Sample in the plan
+            other: GenerationPlan - Plan holding the new Parameters, e.g. the next attempt of the same IDs
+            other_index: int - Position of the new Parameters in other
+        """
+        for column in self.SAMPLE_COLUMNS + self.NOTE_COLUMNS:
+            getattr(self, column)[index] = getattr(other, column)[other_index]
+
+    def __draw_block(self, generator, block_index):
+        """
+        Draws all Parameters of the Samples of one block of IDs and returns them as dict of columns
+
+        Args:
+            generator: DataBaseGenerator - Holds all possible Parameters
+            block_index: int - Index of the block, the block holds the IDs starting at block_index * BLOCK_SIZE
+        """
+        entropy = [self.seed, self.seedStream, block_index] + ([self.attempt] if self.attempt > 0 else [])
+        rng = np.random.default_rng(np.random.SeedSequence(entropy))
+        size = self.BLOCK_SIZE
+        block = {
+            "scaleIndices": rng.integers(len(generator.possibleScales), size=size, dtype=np.int16),
+            "rootIndices": rng.integers(len(generator.possibleRoots), size=size, dtype=np.int16),
+            "signIndices": rng.integers(len(generator.possibleSigns), size=size, dtype=np.int16),
+            "pauseRatioIndices": rng.integers(len(generator.possiblePauseRatios), size=size, dtype=np.int16),
+            "chordRatioIndices": rng.integers(len(generator.possibleChordRatios), size=size, dtype=np.int16),
+            "tempoIndices": rng.integers(len(generator.possibleTempos), size=size, dtype=np.int16),
+            "synthModuleIndices": rng.integers(len(generator.synth_modules), size=size, dtype=np.int16)
+        }
+        scale_keys = (block["rootIndices"], block["signIndices"], block["scaleIndices"])
+        notes = self.draw_notes(rng,
+                                generator.pitchTable.distinctPitchIndices[scale_keys],
+                                generator.pitchTable.distinctPitchCounts[scale_keys],
+                                np.asarray(generator.possiblePauseRatios)[block["pauseRatioIndices"]],
+                                np.asarray(generator.possibleChordRatios)[block["chordRatioIndices"]],
+                                self.numberOfNotesPerSample,
+                                len(generator.possibleOctaves),
+                                len(generator.possibleNoteLengths),
+                                self.usePolyphonic,
+                                self.chordSizeWeights)
+        block.update(zip(self.NOTE_COLUMNS, notes))
+        # Drawn last, so the other Parameters are the same as before it was added
+        block["splitDraws"] = rng.random(size, dtype=np.float32)
+        return block
+
+    @staticmethod
+    def draw_notes(rng, pitch_indices, pitch_counts, pause_ratios, chord_ratios, number_of_notes, number_of_octaves,
+                   number_of_note_lengths, use_polyphonic, chord_size_weights=None):
+        """
+        Draws the Note Parameters of several Samples at once and returns them as arrays: (is_note, is_chord,
+        chord_sizes, degrees, octaves, note_lengths)
+
+        A Note is played if its draw is above the Pause Ratio of its Sample and is a Chord if polyphonic and its
+        second draw is above the Chord Ratio. The size of every Chord is drawn once from the Chord size weights.
+        The pitches of all Notes are drawn without replacement from the distinct pitches of the scale of their
+        Sample in one draw: the j-th pitch of a Note is a random rank among the pitches not taken yet, which is moved
+        past every pitch taken before it. So the Notes of a Chord never repeat a pitch and no draw is rejected.
+        Rests and single Notes use the first pitch.
+
+        Args:
+            rng: numpy.random.Generator - Generator the Parameters are drawn from
+            pitch_indices: ndarray - Distinct pitches of the scale of every Sample as degree * octaves + octave, with
+                           the shape (samples, max distinct pitches), see PitchTable.distinctPitchIndices
+            pitch_counts: ndarray - Number of distinct pitches of the scale of every Sample
+            pause_ratios: ndarray - Pause Ratio of every Sample
+            chord_ratios: ndarray - Chord Ratio of every Sample
+            number_of_notes: int - Number of Notes of every Sample
+            number_of_octaves: int - Number of possible octaves
+            number_of_note_lengths: int - Number of possible Note Lengths
+            use_polyphonic: bool - Switch for drawing Chords
+            chord_size_weights: dict - Relative weight of every Chord size, DEFAULT_CHORD_SIZE_WEIGHTS if None
+        """
+        sizes, probabilities = chord_size_probabilities(chord_size_weights or DEFAULT_CHORD_SIZE_WEIGHTS)
+        pitch_indices = np.asarray(pitch_indices)
+        pitch_counts = np.asarray(pitch_counts)
+        shape = (len(pitch_counts), number_of_notes)
+        pitches_per_note = int(sizes.max()) if use_polyphonic else 1
+        is_note = rng.random(shape) > np.asarray(pause_ratios)[:, np.newaxis]
+        is_chord = rng.random(shape) > np.asarray(chord_ratios)[:, np.newaxis]
+        is_chord &= is_note & bool(use_polyphonic)
+        chord_sizes = np.minimum(rng.choice(sizes, size=shape, p=probabilities), pitch_counts[:, np.newaxis])
+        draws = rng.random(shape + (pitches_per_note,))
+        ranks = np.zeros(draws.shape, dtype=np.int16)
+        for j in range(pitches_per_note):
+            rank = (draws[:, :, j] * np.maximum(pitch_counts[:, np.newaxis] - j, 1)).astype(np.int16)
+            # Going through the taken ranks in ascending order skips every one of them
+            for taken in np.sort(ranks[:, :, :j], axis=2).transpose(2, 0, 1):
+                rank += rank >= taken
+            ranks[:, :, j] = rank
+        pitches = np.take_along_axis(pitch_indices[:, np.newaxis, :], ranks, axis=2)
+        degrees, octaves = np.divmod(pitches, number_of_octaves)
+        note_lengths = rng.integers(number_of_note_lengths, size=shape, dtype=np.int8)
+        return is_note, is_chord, chord_sizes.astype(np.int8), degrees.astype(np.int8), octaves.astype(np.int8), \
+            note_lengths
@@ -2,9 +2,22 @@
 Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
 Licensed under the MIT License.
 """
+import hashlib
 import random
-from music21 import stream, tempo, note, chord
-from Util.Helpers import WavGenerator
+import numpy as np
+from Generators.GenerationPlan import GenerationPlan
+from Util.Helpers import WavGenerator, PitchTable
+from Util.GenerationMetrics import time_stage
+from Util.Labels import frame_labels
+from Util.MidiWriter import MidiWriter
+from Util.NoteExtractor import NoteEvent
+
+# Velocity of every generated Note, the velocity music21 writes for Notes without a set velocity
+MIDI_VELOCITY = 90
+# Trailing Rests are dropped and the MIDI track ends one quarter note after the last Note, like music21 does
+END_OF_TRACK_PADDING = 1.0
+# Length of every Note Type in quarter notes
+QUARTER_LENGTHS = {'16th': 0.25, 'eighth': 0.5, 'quarter': 1.0, 'half': 2.0, 'whole': 4.0}
 
 
 class SampleGenerator:
@@ -13,7 +26,8 @@ class SampleGenerator:
     """
 
     def __init__(self, roots, signs, scales, octaves, pause_ratios,
-                 chord_ratios, tempos, note_lengths, synth_modules, debug=False):
+                 chord_ratios, tempos, note_lengths, synth_modules, render_session=None, pitch_table=None,
+                 plan=None, plan_index=0, debug=False, chord_size_weights=None):
         """
         Initializing SampleGenerator - Object
 
@@ -27,35 +41,89 @@ class SampleGenerator:
             tempos: List of int - used for generating Note-Objects
             note_lengths: List of Str - used for generating Note-Objects
             synth_modules: List of SynthModule Objects - user for creating a WAV File from the generated MIDI FIle
+            render_session: RenderSession - Open Session used for rendering the WAV File, None opens a new one
+            pitch_table: PitchTable - Pitches of roots, signs, scales and octaves. Computed if None
+            plan: GenerationPlan - Holds all Parameters of the Sample. They are picked randomly if None
+            plan_index: int - Position of the Sample in the plan
             debug: bool - Switch for Printing Debug-Statements into the console
+            chord_size_weights: dict - Relative weight of every Chord size, only used if the Sample has no plan
         """
-        self.scale = scales[random.randrange(len(scales))]
-        root = roots[random.randrange(len(roots))]
-        sign = signs[random.randrange(len(signs))]
-        self.rootNote = note.Note(root + sign)
-        self.possibleNotes = self.scale.calc_notes(self.rootNote)
+        self.plan = plan
+        self.planIndex = plan_index
+        if plan is not None:
+            scale_index = int(plan.scaleIndices[plan_index])
+            root_index = int(plan.rootIndices[plan_index])
+            sign_index = int(plan.signIndices[plan_index])
+            pause_ratio_index = int(plan.pauseRatioIndices[plan_index])
+            chord_ratio_index = int(plan.chordRatioIndices[plan_index])
+            tempo_index = int(plan.tempoIndices[plan_index])
+            synth_module_index = int(plan.synthModuleIndices[plan_index])
+        else:
+            scale_index = random.randrange(len(scales))
+            root_index = random.randrange(len(roots))
+            sign_index = random.randrange(len(signs))
+            pause_ratio_index = random.randrange(len(pause_ratios))
+            chord_ratio_index = random.randrange(len(chord_ratios))
+            tempo_index = random.randrange(len(tempos))
+            synth_module_index = random.randrange(len(synth_modules))
+        self.scale = scales[scale_index]
+        self.rootNote = roots[root_index] + signs[sign_index]
+        if pitch_table is None:
+            pitch_table = PitchTable(roots, signs, scales, octaves)
+        # MIDI Pitch of every scale degree in every octave
+        self.possiblePitches = pitch_table.scale_pitches(root_index, sign_index, scale_index).tolist()
+        self.distinctPitchIndices = pitch_table.distinctPitchIndices[root_index, sign_index, scale_index]
+        self.distinctPitchCount = pitch_table.distinctPitchCounts[root_index, sign_index, scale_index]
+        self.chordSizeWeights = chord_size_weights
         self.possibleOctaves = octaves
-        self.pauseRatio = pause_ratios[random.randrange(len(pause_ratios))]
-        self.chordRatio = chord_ratios[random.randrange(len(chord_ratios))]
-        self.tempo = tempos[random.randrange(len(tempos))]
+        self.pauseRatio = pause_ratios[pause_ratio_index]
+        self.chordRatio = chord_ratios[chord_ratio_index]
+        self.tempo = tempos[tempo_index]
         self.possibleNoteLengths = note_lengths
-        self.wav_generator = WavGenerator(synth_modules[random.randrange((len(synth_modules)))])
+        self.wav_generator = WavGenerator(synth_modules[synth_module_index], render_session)
+        self.midi_writer = MidiWriter(velocity=MIDI_VELOCITY)
+        self.midi_notes = []
+        self.note_events = []
+        self.length = 0.0
+        self.numberOfChords = 0
+        self.numberOfRests = 0
         self.debug = debug
 
     def __str__(self):
         return str.format("Sample Information: Octave: {0} Root: {1}  Scale {2}", min(self.possibleOctaves),
                           self.rootNote, self.scale)
 
-    def __get_note_params(self):
+    def __get_note_columns(self, number_of_notes_per_sample, use_polyphonic):
+        """
+        Returns the Note Parameters of the Sample from the plan, or draws them if the Sample has no plan
+
+        Args:
+            number_of_notes_per_sample: int - Number of Notes generated for the Sample
+            use_polyphonic: bool - Switch for Polyphonic Samples or Monophonic
         """
-        Returns randomly picked Note Parameters from which Music21 Note,Rest or Chord Objects can be made.
+        if self.plan is not None:
+            if self.plan.numberOfNotesPerSample != number_of_notes_per_sample or \
+                    self.plan.usePolyphonic != use_polyphonic:
+                raise Exception("The Sample was planned with {0} Notes and use_polyphonic={1}.".format(
+                    self.plan.numberOfNotesPerSample, self.plan.usePolyphonic))
+            return self.plan.note_columns(self.planIndex)
+        rng = np.random.default_rng(random.getrandbits(32))
+        columns = GenerationPlan.draw_notes(rng, [self.distinctPitchIndices], [self.distinctPitchCount],
+                                            [self.pauseRatio], [self.chordRatio], number_of_notes_per_sample,
+                                            len(self.possibleOctaves), len(self.possibleNoteLengths), use_polyphonic,
+                                            self.chordSizeWeights)
+        return tuple(column[0].tolist() for column in columns)
+
+    def __get_duration(self, note_length):
         """
-        note_picker = self.possibleNotes[random.randrange(len(self.possibleNotes))]
-        octave_picker = self.possibleOctaves[random.randrange(len(self.possibleOctaves))]
-        note_length_picker = self.possibleNoteLengths[random.randrange(len(self.possibleNoteLengths))]
-        return note_picker.name + str(octave_picker), note_length_picker
+        Returns the duration in ticks of the Note Length picked by the index
 
-    def generate(self, number_of_notes_per_sample, midi_file_path, wav_file_path, use_polyphonic):
+        Args:
+            note_length: int - Index of the Note Length
+        """
+        return int(QUARTER_LENGTHS[self.possibleNoteLengths[note_length]] * self.midi_writer.ticksPerQuarter)
+
+    def generate(self, number_of_notes_per_sample, midi_file_path, wav_file_path, use_polyphonic, timings=None):
         """
         Generates as much MIDI-Files as given by numberOfSamples. From these Files WAV-Files are synthesized and
         the Paths to both MIDI and WAV-Files are stored in a CSV File which is also saved into destinationFolder.
@@ -66,38 +134,141 @@ class SampleGenerator:
             midi_file_path: str - Path where to save MIDI-Files into
             wav_file_path: str - Path where to save WAV-Files into
             use_polyphonic: bool - Switch for Polyphonic Samples or Monophonic
+            timings: dict - Receives the duration in seconds of every stage if not None
         """
-        # Initializing Stream
-        s = stream.Measure()
-        s.append(tempo.MetronomeMark(number=self.tempo))
+        with time_stage(timings, "compose"):
+            self.compose(number_of_notes_per_sample, use_polyphonic)
+
+        if self.debug:
+            print("MIDI: " + midi_file_path)
+            print("WAV: " + wav_file_path)
+            self.midi_writer.validate_against_music21(self.midi_notes, self.tempo)
+
+        with time_stage(timings, "render"):
+            self.render_wav(wav_file_path)
+        with time_stage(timings, "midi_write"):
+            self.write_midi(midi_file_path)
+
+    def compose(self, number_of_notes_per_sample, use_polyphonic):
+        """
+        Composes the Notes of the Sample from its Parameters and stores them as (pitch, tick, duration) tuples in
+        self.midi_notes and as NoteEvents in self.note_events. The number of Chords and Rests is counted.
+
+        Args:
+            number_of_notes_per_sample: int - Number of Notes generated for every Sample
+            use_polyphonic: bool - Switch for Polyphonic Samples or Monophonic
+        """
+        # (pitch, tick, duration) of every Note
+        self.midi_notes = []
+        self.numberOfChords = 0
+        self.numberOfRests = 0
+        tick = 0
+        is_note, is_chord, chord_sizes, degrees, octaves, lengths = self.__get_note_columns(number_of_notes_per_sample,
+                                                                                            use_polyphonic)
 
         for i in range(0, number_of_notes_per_sample):
-            if random.uniform(0, 1) > self.pauseRatio:
-                if use_polyphonic and random.uniform(0, 1) > self.chordRatio:
-                    # Add Chord
-                    notes = []
-                    # Creates a chord with either 2, 3 or 4 Notes
-                    while len(notes) < random.randrange(2, 4, 1):
-                        note_string, note_length = self.__get_note_params()
-                        new_note = note.Note(note_string, type=note_length)
-                        if new_note not in notes:
-                            notes.append(new_note)
-                    s.append(chord.Chord(notes))
-                else:
-                    # Add single Note
-                    note_string, note_length = self.__get_note_params()
-                    s.append(note.Note(note_string, type=note_length))
+            duration = self.__get_duration(lengths[i])
+            if is_note[i]:
+                # A Chord plays the first chord_sizes[i] pitches, which are distinct, a single Note the first one
+                voices = chord_sizes[i] if is_chord[i] else 1
+                for degree, octave in zip(degrees[i][:voices], octaves[i][:voices]):
+                    self.midi_notes.append((self.possiblePitches[degree][octave], tick, duration))
+                self.numberOfChords += int(is_chord[i])
             else:
                 # Add Pause
-                note_string, note_length = self.__get_note_params()
-                s.append(note.Rest(note_string, type=note_length))
+                self.numberOfRests += 1
+            tick += duration
 
-        # Write a MIDI-File from Stream
-        if self.debug:
-            print("MIDI: " + midi_file_path)
-            print("WAV: " + wav_file_path)
-        s.write('midi', fp=midi_file_path)
+        self.__calc_note_events()
+
+    def render_wav(self, wav_file_path):
+        """
+        Synthesizes the WAV-File from the composed Note Events
+
+        Args:
+            wav_file_path: str - Path where to save the WAV-File
+        """
+        self.wav_generator.events_to_wav(wav_file_path, self.note_events, self.length)
 
-        # Synthesize WAV-File from MIDI-File
-        self.wav_generator.midi_to_wav(wav_file_path, midi_file_path)
+    def generate_packed(self, number_of_notes_per_sample, use_polyphonic, timings=None):
+        """
+        Generates the Sample in memory instead of writing Files and returns its PCM with the shape (frames, channels)
+        in the bit depth of the RenderSession, the sampling rate and the content of its MIDI-File
+
+        Args:
+            number_of_notes_per_sample: int - Number of Notes generated for every Sample
+            use_polyphonic: bool - Switch for Polyphonic Samples or Monophonic
+            timings: dict - Receives the duration in seconds of every stage if not None
+        """
+        with time_stage(timings, "compose"):
+            self.compose(number_of_notes_per_sample, use_polyphonic)
+        with time_stage(timings, "render"):
+            pcm, sampling_rate = self.wav_generator.events_to_pcm(self.note_events, self.length)
+        with time_stage(timings, "midi_write"):
+            midi_bytes = self.encode_midi()
+        return pcm, sampling_rate, midi_bytes
 
+    def render_item(self):
+        """
+        Returns (duration, Note Events, Synth Module) of the composed Sample, the audio rendered by render_wav, for
+        rendering several Samples in one pass with RenderSession.render_pcm_batch
+        """
+        # The rendered audio is 0.1 seconds longer than the piece
+        return self.length + .1, self.note_events, self.wav_generator.synth_module
+
+    def frame_labels(self, frame_rate):
+        """
+        Returns the piano roll, onset and offset labels of the composed Notes for every frame of the rendered audio,
+        see Util.Labels.frame_labels
+
+        Args:
+            frame_rate: float - Frames per second
+        """
+        notes = np.array(self.midi_notes, dtype=np.int64).reshape(-1, 3)
+        seconds_per_tick = 60.0 / float(self.tempo) / self.midi_writer.ticksPerQuarter
+        # The rendered audio is 0.1 seconds longer than the piece
+        number_of_frames = int(np.ceil((self.length + .1) * frame_rate))
+        return frame_labels(notes[:, 0], notes[:, 1] * seconds_per_tick, (notes[:, 1] + notes[:, 2]) * seconds_per_tick,
+                            number_of_frames, frame_rate)
+
+    def content_hash(self, with_sound=False):
+        """
+        Returns a hash of the composed Notes as hex string. Samples with the same Notes (pitch, start and duration in
+        ticks) get the same hash no matter the order of the Notes of a Chord. With with_sound the tempo and the Synth
+        Module are part of the hash, so only Samples which sound the same get the same hash.
+
+        Args:
+            with_sound: bool - Switch for hashing the tempo and the Synth Module with the Notes
+        """
+        notes = np.array(sorted(self.midi_notes), dtype='<i4').reshape(-1, 3)
+        content = notes.tobytes()
+        if with_sound:
+            content = "{0}|{1}|".format(int(self.tempo), self.wav_generator.synth_module).encode('utf-8') + content
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def encode_midi(self):
+        """
+        Returns the content of the MIDI-File of the composed Notes
+        """
+        return self.midi_writer.encode(self.midi_notes, self.tempo)
+
+    def write_midi(self, midi_file_path):
+        """
+        Writes the composed Notes as MIDI-File, it is not read again
+
+        Args:
+            midi_file_path: str - Path where to save the MIDI-File
+        """
+        self.midi_writer.write(midi_file_path, self.midi_notes, self.tempo)
+
+    def __calc_note_events(self):
+        """
+        Stores the generated Notes as NoteEvents in self.note_events and the Length of the piece in self.length,
+        both in seconds and timed the same as in the written MIDI-File.
+        """
+        ticks_per_quarter = self.midi_writer.ticksPerQuarter
+        seconds_per_tick = 60.0 / float(self.tempo) / ticks_per_quarter
+        self.note_events = [NoteEvent(pitch, MIDI_VELOCITY, tick * seconds_per_tick, duration * seconds_per_tick)
+                            for pitch, tick, duration in self.midi_notes]
+        end = max([tick + duration for _, tick, duration in self.midi_notes], default=0)
+        self.length = (end + END_OF_TRACK_PADDING * ticks_per_quarter) * seconds_per_tick
@@ -0,0 +1,194 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import itertools
+import multiprocessing
+from collections import deque
+from multiprocessing.util import Finalize
+
+from Util.Helpers import open_render_session
+
+try:
+    from torch.utils.data import IterableDataset, get_worker_info
+except ImportError:
+    # torch is only needed for passing a SampleStream to a DataLoader
+    IterableDataset = object
+    get_worker_info = None
+
+# DataBaseGenerator of the current prefetch process, set by _init_stream_worker
+_stream_generator = None
+
+
+def _init_stream_worker(generator):
+    """
+    Initializer for every prefetch process of a SampleStream, which opens its own RenderSession. The RenderSession
+    is closed when the process exits.
+
+    Args:
+        generator: DataBaseGenerator - Generator whose parameters are used inside the process
+    """
+    global _stream_generator
+    _stream_generator = generator
+    _stream_generator.renderSession = open_render_session(_stream_generator.backend,
+                                                          _stream_generator.voiceCacheSize,
+                                                          _stream_generator.samplingRate,
+                                                          _stream_generator.channels,
+                                                          _stream_generator.bitDepth,
+                                                          _stream_generator.audioFormat)
+    Finalize(_stream_generator.renderSession, _stream_generator.renderSession.close, exitpriority=10)
+
+
+def _stream_generate_block(first_id, number_of_samples, use_polyphonic, seed_stream, label_frame_rate):
+    """
+    Generates one block of a SampleStream inside a prefetch process, see DataBaseGenerator.generate_in_memory
+
+    Args:
+        first_id: int - ID of the first Sample of the block
+        number_of_samples: int - Number of Samples of the block
+        use_polyphonic: bool - Switch for generating polyphonic Samples or Monophonic
+        seed_stream: int - Seed Stream of the stream
+        label_frame_rate: float - Frames per second of the labels, None for no labels
+    """
+    return _stream_generator.generate_in_memory(number_of_samples, use_polyphonic, seed_stream, first_id,
+                                                label_frame_rate)
+
+
+class SampleStream(IterableDataset):
+    """
+    Class for generating Samples on the fly without writing any File, e.g. for training on endless random Data.
+    Iterating yields (PCM, Note Events, metadata) of every Sample, see DataBaseGenerator.generate_in_memory, and
+    the Samples are the same as batch_generate writes for the same IDs with the same Master Seed and Seed Stream.
+
+    The IDs are handed out in blocks of block_size. If the stream is read by several workers, e.g. the workers of a
+    torch DataLoader, worker k of n takes the blocks k, k + n, k + 2n, ... so every worker yields other Samples and
+    all workers together yield every ID once. Every worker yields its Samples in the order of their IDs, so a stream
+    is reproducible no matter how many prefetch processes generate it. Pass another seed_stream for other Samples,
+    e.g. one per epoch.
+
+    Usage:
+        stream = SampleStream(DataBaseGenerator(seed=1, backend="numpy"), number_of_samples=1000, workers=4)
+        for pcm, note_events, metadata in stream:
+            ...
+    """
+    STREAM_BLOCK_SIZE = 16
+
+    def __init__(self, generator, number_of_samples=None, use_polyphonic=True, seed_stream=0, first_id=0, workers=0,
+                 queue_size=32, label_frame_rate=None, block_size=STREAM_BLOCK_SIZE, worker_index=None,
+                 number_of_workers=None):
+        """
+        Initializing SampleStream - Object
+
+        Args:
+            generator: DataBaseGenerator - Holds the Master Seed, the backend and all possible Parameters
+            number_of_samples: int - Number of IDs of the stream, None for an endless stream
+            use_polyphonic: bool - Switch for generating polyphonic Samples or Monophonic
+            seed_stream: int - Key that separates Samples with the same ID of independent runs (e.g. train and test)
+            first_id: int - ID of the first Sample
+            workers: int - Number of prefetch processes, 0 generates every block when it is needed
+            queue_size: int - Maximum number of Samples generated ahead by the prefetch processes
+            label_frame_rate: float - Frames per second of the labels in the metadata, None for no labels
+            block_size: int - Number of consecutive IDs generated at once
+            worker_index: int - Index of the worker reading this stream, None takes the one of the torch DataLoader
+                          worker or 0
+            number_of_workers: int - Number of workers reading this stream, None takes the one of the torch
+                               DataLoader or 1
+        """
+        if number_of_samples is not None and number_of_samples < 0:
+            raise Exception("The number of Samples '{0}' is negative.".format(number_of_samples))
+        if workers < 0:
+            raise Exception("The number of prefetch workers '{0}' is negative.".format(workers))
+        if queue_size < 1 or block_size < 1:
+            raise Exception("The queue size '{0}' and the block size '{1}' have to be positive.".format(
+                queue_size, block_size))
+        self.generator = generator
+        self.numberOfSamples = number_of_samples
+        self.usePolyphonic = use_polyphonic
+        self.seedStream = seed_stream
+        self.firstId = first_id
+        self.workers = workers
+        self.queueSize = queue_size
+        self.labelFrameRate = label_frame_rate
+        self.blockSize = block_size
+        self.workerIndex = worker_index
+        self.numberOfWorkers = number_of_workers
+
+    def __worker(self):
+        """
+        Returns the index of the worker reading this stream and the number of workers
+        """
+        worker_index, number_of_workers = self.workerIndex, self.numberOfWorkers
+        worker_info = get_worker_info() if get_worker_info is not None else None
+        if worker_info is not None:
+            worker_index = worker_info.id if worker_index is None else worker_index
+            number_of_workers = worker_info.num_workers if number_of_workers is None else number_of_workers
+        worker_index = 0 if worker_index is None else worker_index
+        number_of_workers = 1 if number_of_workers is None else number_of_workers
+        if not 0 <= worker_index < number_of_workers:
+            raise Exception("The worker index '{0}' is not in the range of '{1}' workers.".format(worker_index,
+                                                                                            number_of_workers))
+        return worker_index, number_of_workers
+
+    def blocks(self):
+        """
+        Returns an iterator over (first ID, number of Samples) of every block of the worker reading this stream
+        """
+        worker_index, number_of_workers = self.__worker()
+        if self.numberOfSamples is None:
+            block_indices = itertools.count(worker_index, number_of_workers)
+        else:
+            number_of_blocks = -(-self.numberOfSamples // self.blockSize)
+            block_indices = range(worker_index, number_of_blocks, number_of_workers)
+        for block_index in block_indices:
+            start = block_index * self.blockSize
+            end = start + self.blockSize if self.numberOfSamples is None else min(start + self.blockSize,
+                                                                                  self.numberOfSamples)
+            yield self.firstId + start, end - start
+
+    def __iter__(self):
+        if self.workers > 0:
+            return self.__prefetched()
+        return self.__generated()
+
+    def __generated(self):
+        """
+        Generates every block in this process with its own RenderSession, which is closed when the stream ends
+        """
+        generator = self.generator
+        generator.renderSession = open_render_session(generator.backend, generator.voiceCacheSize,
+                                                      generator.samplingRate, generator.channels,
+                                                      generator.bitDepth, generator.audioFormat)
+        try:
+            for first_id, number_of_samples in self.blocks():
+                for sample in generator.generate_in_memory(number_of_samples, self.usePolyphonic, self.seedStream,
+                                                           first_id, self.labelFrameRate):
+                    yield sample
+        finally:
+            generator.renderSession.close()
+            generator.renderSession = None
+
+    def __prefetched(self):
+        """
+        Generates the blocks in a pool of prefetch processes. At most queue_size Samples are handed to the processes
+        at once, the blocks are yielded in the order of their IDs.
+        """
+        pool = multiprocessing.Pool(processes=self.workers, initializer=_init_stream_worker,
+                                    initargs=(self.generator,))
+        try:
+            blocks = self.blocks()
+            pending = deque()
+            pending_samples = 0
+            block = next(blocks, None)
+            while block is not None or pending:
+                while block is not None and (not pending or pending_samples + block[1] <= self.queueSize):
+                    pending.append((block[1], pool.apply_async(_stream_generate_block, (
+                        block[0], block[1], self.usePolyphonic, self.seedStream, self.labelFrameRate))))
+                    pending_samples += block[1]
+                    block = next(blocks, None)
+                number_of_samples, result = pending.popleft()
+                pending_samples -= number_of_samples
+                for sample in result.get():
+                    yield sample
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,147 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import wave
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:
+    # soundfile is only needed for writing FLAC-Files with the "numpy" backend
+    soundfile = None
+
+# Audio formats with the file extension and the fileformat of pyo
+AUDIO_FORMATS = {"wav": ("wav", 0), "flac": ("flac", 5)}
+# Bit depths with the sampletype of pyo, FLAC-Files can hold at most 24 bit
+BIT_DEPTHS = {16: 0, 24: 1, 32: 2}
+FLAC_SUBTYPES = {16: "PCM_16", 24: "PCM_24"}
+
+
+def check_audio_options(sampling_rate, channels, bit_depth, audio_format):
+    """
+    Raises an Exception if the options of the rendered audio are not supported
+
+    Args:
+        sampling_rate: int - Sampling Rate of the audio in Hz
+        channels: int - 1 for mono or 2 for stereo
+        bit_depth: int - Bits per sample, 16, 24 or 32
+        audio_format: str - Either "wav" or "flac"
+    """
+    if sampling_rate <= 0:
+        raise Exception("The sampling rate '{0}' is not positive.".format(sampling_rate))
+    if channels not in [1, 2]:
+        raise Exception("Only 1 or 2 channels are supported, not '{0}'.".format(channels))
+    if bit_depth not in BIT_DEPTHS:
+        raise Exception("Unknown bit depth '{0}'. Possible bit depths: {1}".format(bit_depth, list(BIT_DEPTHS)))
+    if audio_format not in AUDIO_FORMATS:
+        raise Exception("Unknown audio format '{0}'. Possible formats: {1}".format(audio_format, list(AUDIO_FORMATS)))
+    if audio_format == "flac" and bit_depth not in FLAC_SUBTYPES:
+        raise Exception("FLAC-Files can not hold '{0}' bit.".format(bit_depth))
+
+
+def to_pcm(audio, bit_depth=16):
+    """
+    Returns float Samples as PCM, as int16 for 16 bit and as int32 for 24 and 32 bit
+
+    Args:
+        audio: ndarray - Float Samples in the range [-1, 1]
+        bit_depth: int - Bits per sample
+    """
+    if bit_depth > 16:
+        # float32 can not hold every 24 or 32 bit value
+        audio = np.asarray(audio, dtype=np.float64)
+    pcm = np.rint(np.clip(audio, -1.0, 1.0) * (2.0 ** (bit_depth - 1) - 1))
+    return pcm.astype('<i2' if bit_depth == 16 else '<i4')
+
+
+def pcm_to_bytes(pcm, bit_depth=16):
+    """
+    Returns PCM as little-endian bytes as stored in a WAV-File, 24 bit samples take 3 bytes
+
+    Args:
+        pcm: ndarray - PCM as returned by to_pcm
+        bit_depth: int - Bits per sample
+    """
+    if bit_depth != 24:
+        return np.ascontiguousarray(pcm, dtype='<i2' if bit_depth == 16 else '<i4').tobytes()
+    return np.ascontiguousarray(pcm, dtype='<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+
+def pcm_from_bytes(content, bit_depth=16):
+    """
+    Returns little-endian PCM bytes as flat array, as int16 for 16 bit and as int32 for 24 and 32 bit
+
+    Args:
+        content: bytes - PCM as stored in a WAV-File
+        bit_depth: int - Bits per sample
+    """
+    if bit_depth != 24:
+        return np.frombuffer(content, dtype='<i2' if bit_depth == 16 else '<i4')
+    padded = np.zeros((len(content) // 3, 4), dtype=np.uint8)
+    padded[:, 1:] = np.frombuffer(content, dtype=np.uint8).reshape(-1, 3)
+    # The 24 bit samples are the upper bytes, so the sign is kept when shifting them down
+    return padded.view('<i4')[:, 0] >> 8
+
+
+class AudioWriter:
+    """
+    Class for writing PCM block by block into a WAV- or FLAC-File
+
+    Usage:
+        with AudioWriter(filename, 16000, 1, 16, "flac") as audio_writer:
+            audio_writer.write(pcm)
+    """
+
+    def __init__(self, filename, sampling_rate, channels, bit_depth=16, audio_format="wav"):
+        """
+        Initializing AudioWriter - Object, which opens the File
+
+        Args:
+            filename: str - Filename of the written File
+            sampling_rate: int - Sampling Rate of the audio in Hz
+            channels: int - Number of channels
+            bit_depth: int - Bits per sample
+            audio_format: str - Either "wav" or "flac"
+        """
+        check_audio_options(sampling_rate, channels, bit_depth, audio_format)
+        self.bitDepth = bit_depth
+        if audio_format == "flac":
+            if soundfile is None:
+                raise Exception("soundfile is not installed, it is needed for writing FLAC-Files with NumPy.")
+            self.soundFile = soundfile.SoundFile(filename, 'w', samplerate=sampling_rate, channels=channels,
+                                                 format="FLAC", subtype=FLAC_SUBTYPES[bit_depth])
+            self.wavFile = None
+        else:
+            self.soundFile = None
+            self.wavFile = wave.open(filename, 'wb')
+            self.wavFile.setnchannels(channels)
+            self.wavFile.setsampwidth(bit_depth // 8)
+            self.wavFile.setframerate(sampling_rate)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, pcm):
+        """
+        Appends PCM with the shape (frames, channels) as returned by to_pcm
+
+        Args:
+            pcm: ndarray - PCM of the next frames
+        """
+        if self.soundFile is not None:
+            # soundfile takes 24 bit samples in the upper bytes of int32
+            self.soundFile.write(pcm if self.bitDepth == 16 else np.left_shift(pcm, 8, dtype='<i4'))
+        else:
+            self.wavFile.writeframes(pcm_to_bytes(pcm, self.bitDepth))
+
+    def close(self):
+        if self.soundFile is not None:
+            self.soundFile.close()
+            self.soundFile = None
+        if self.wavFile is not None:
+            self.wavFile.close()
+            self.wavFile = None
@@ -0,0 +1,308 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import json
+import os
+import struct
+import numpy as np
+import pandas as pd
+
+from Util.ShardStore import RECORD_HEADER, ShardRecord
+from Util.Labels import labels_from_bytes
+from Util.FeatureStore import FEATURE_DTYPE
+from Util.DataSetSplit import part_range
+
+
+class DataSetReader:
+    """
+    Class for reading a Data Set generated by DataBaseGenerator.batch_generate through its CSV-File.
+
+    The audio is returned as read-only NumPy views of shape (frames, channels) and dtype int16, backed by
+    numpy.memmap. For Data Sets packed into shards every shard is memory-mapped once and the records are found from
+    the offsets in the CSV-File, so reading a Sample opens no file and copies nothing. For Data Sets of single
+    WAV-Files the data chunk of every WAV-File is memory-mapped when it is read.
+
+    Usage:
+        reader = DataSetReader("path/to/Train", "train.csv")
+        ids = reader.filter(bpm_range=(60, 120), scales=["Major", "Minor"])
+        batch = reader.get_batch(ids[:32])
+    """
+
+    def __init__(self, folder_path, name_of_csv="DB_WAVs_and_MIDIs.csv"):
+        """
+        Initializing DataSetReader - Object
+
+        Args:
+            folder_path: str - Folder of the Data Set, which holds the CSV-File
+            name_of_csv: str - Name of the CSV-File
+        """
+        self.folderPath = folder_path
+        self.manifest = pd.read_csv(os.path.join(folder_path, name_of_csv), sep=',', encoding='utf-8')
+        self.settingsPath = os.path.join(folder_path, os.path.splitext(name_of_csv)[0] + "_settings.json")
+        self.isSharded = 'Shard' in self.manifest.columns
+        if 'ID' in self.manifest.columns:
+            self.ids = self.manifest['ID'].values.astype(np.int64)
+        else:
+            # Rows of a CSV-File of single Files without 'ID' column are in the order of the IDs, which start at the
+            # first ID of the part if only a part of a batch was generated
+            self.ids = np.arange(len(self.manifest), dtype=np.int64) + self.__first_id()
+        self.__rowIndex = pd.Index(self.ids)
+        self.__shards = {}
+        self.__chunks = {}
+
+    def __first_id(self):
+        """
+        Returns the first ID of the part of a batch stored in the Settings File, 0 for a whole batch or a Data Set
+        without Settings File
+        """
+        if not os.path.isfile(self.settingsPath):
+            return 0
+        with open(self.settingsPath) as settings_file:
+            settings = json.load(settings_file)
+        return part_range(settings["number_of_samples"], settings.get("part_index", 0),
+                          settings.get("number_of_parts", 1))[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def close(self):
+        """
+        Releases all memory-mapped shards and feature chunks. Views returned before stay valid as long as they are
+        referenced.
+        """
+        self.__shards = {}
+        self.__chunks = {}
+
+    def rows(self, sample_ids):
+        """
+        Returns the rows of the CSV-File of the given Sample IDs
+
+        Args:
+            sample_ids: List of int - IDs of the Samples
+        """
+        rows = self.__rowIndex.get_indexer(np.asarray(sample_ids, dtype=np.int64))
+        if (rows < 0).any():
+            raise Exception("The Sample IDs '{0}' are not in the Data Set.".format(
+                np.asarray(sample_ids)[rows < 0].tolist()))
+        return rows
+
+    def metadata(self, sample_id):
+        """
+        Returns the row of the CSV-File of a Sample as dict
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        return self.manifest.iloc[self.rows([sample_id])[0]].to_dict()
+
+    def __shard(self, name):
+        """
+        Returns the memory-mapped shard with the given name, it is mapped at the first access
+
+        Args:
+            name: str - Filename of the shard
+        """
+        if name not in self.__shards:
+            path = os.path.join(self.folderPath, "Shards", name)
+            self.__shards[name] = np.memmap(path, dtype=np.uint8, mode='r')
+        return self.__shards[name]
+
+    def __record(self, row):
+        """
+        Returns the memory-mapped shard and the ShardRecord of a row of the CSV-File
+
+        Args:
+            row: int - Row of the CSV-File
+        """
+        shard = self.__shard(self.manifest['Shard'].iat[row])
+        offset = int(self.manifest['Offset'].iat[row])
+        return shard, ShardRecord(offset, shard[offset:offset + RECORD_HEADER.size].tobytes())
+
+    @staticmethod
+    def __map_wav(wav_file_path):
+        """
+        Returns the data chunk of a 16 bit PCM WAV-File as memory-mapped array of shape (frames, channels)
+
+        Args:
+            wav_file_path: str - Path of the WAV-File
+        """
+        with open(wav_file_path, 'rb') as wav_file:
+            if wav_file.read(12)[8:] != b'WAVE':
+                raise Exception("'{0}' is not a WAV-File.".format(wav_file_path))
+            channels = 1
+            while True:
+                chunk_header = wav_file.read(8)
+                if len(chunk_header) < 8:
+                    raise Exception("'{0}' has no data chunk.".format(wav_file_path))
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                if chunk_id == b'fmt ':
+                    fmt = wav_file.read(chunk_size)
+                    channels, sample_width = struct.unpack('<H', fmt[2:4])[0], struct.unpack('<H', fmt[14:16])[0]
+                    if sample_width != 16:
+                        raise Exception("'{0}' is no 16 bit WAV-File.".format(wav_file_path))
+                elif chunk_id == b'data':
+                    data_offset = wav_file.tell()
+                    break
+                else:
+                    wav_file.seek(chunk_size + chunk_size % 2, 1)
+        return np.memmap(wav_file_path, dtype='<i2', mode='r', offset=data_offset,
+                         shape=(chunk_size // (2 * channels), channels))
+
+    def audio(self, sample_id):
+        """
+        Returns the audio of a Sample as read-only int16 view of shape (frames, channels)
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        row = self.rows([sample_id])[0]
+        if not self.isSharded:
+            return self.__map_wav(os.path.join(self.folderPath, self.manifest['WAV-File'].iat[row]))
+        shard, record = self.__record(row)
+        pcm = shard[record.pcm_offset:record.midi_offset].view('<i2')
+        return pcm.reshape(-1, record.channels)
+
+    def sampling_rate(self, sample_id):
+        """
+        Returns the sampling rate of the audio of a Sample in Hz
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        row = self.rows([sample_id])[0]
+        if not self.isSharded:
+            with open(os.path.join(self.folderPath, self.manifest['WAV-File'].iat[row]), 'rb') as wav_file:
+                return struct.unpack('<I', wav_file.read(28)[24:28])[0]
+        return self.__record(row)[1].samplingRate
+
+    def midi_bytes(self, sample_id):
+        """
+        Returns the content of the MIDI-File of a Sample
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        row = self.rows([sample_id])[0]
+        if not self.isSharded:
+            with open(os.path.join(self.folderPath, self.manifest['MIDI-File'].iat[row]), 'rb') as midi_file:
+                return midi_file.read()
+        shard, record = self.__record(row)
+        return shard[record.midi_offset:record.metadata_offset].tobytes()
+
+    def packed_metadata(self, sample_id):
+        """
+        Returns the JSON metadata stored with a Sample in its shard
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        if not self.isSharded:
+            raise Exception("Only Data Sets packed into shards store metadata with the Samples.")
+        shard, record = self.__record(self.rows([sample_id])[0])
+        return json.loads(shard[record.metadata_offset:record.labels_offset].tobytes().decode('utf-8'))
+
+    def labels(self, sample_id):
+        """
+        Returns the frame-level labels of a Sample written by batch_generate(labels=True) as dict with the bool
+        arrays 'piano_roll', 'onsets' and 'offsets' of shape (frames, pitches), the 'frame_rate' and the
+        'lowest_pitch' of the first column
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        row = self.rows([sample_id])[0]
+        if not self.isSharded:
+            if 'Label-File' not in self.manifest.columns:
+                raise Exception("The Data Set in '{0}' has no labels.".format(self.folderPath))
+            with open(os.path.join(self.folderPath, self.manifest['Label-File'].iat[row]), 'rb') as label_file:
+                return labels_from_bytes(label_file.read())
+        shard, record = self.__record(row)
+        if record.labelsBytes == 0:
+            raise Exception("The Sample '{0}' has no labels.".format(sample_id))
+        return labels_from_bytes(shard[record.labels_offset:record.end].tobytes())
+
+    def feature_settings(self):
+        """
+        Returns the parameters of the spectrograms of the Data Set as stored in its Settings File: kind, fft_size,
+        hop_size, mel_bins and bins
+        """
+        if 'Feature-Chunk' not in self.manifest.columns or not os.path.isfile(self.settingsPath):
+            raise Exception("The Data Set in '{0}' has no features.".format(self.folderPath))
+        with open(self.settingsPath) as settings_file:
+            return json.load(settings_file)["features"]
+
+    def __chunk(self, name):
+        """
+        Returns the memory-mapped feature chunk with the given name as array of shape (frames, bins), it is mapped at
+        the first access
+
+        Args:
+            name: str - Filename of the chunk
+        """
+        if name not in self.__chunks:
+            path = os.path.join(self.folderPath, "Features", name)
+            self.__chunks[name] = np.memmap(path, dtype=FEATURE_DTYPE, mode='r').reshape(
+                -1, self.feature_settings()["bins"])
+        return self.__chunks[name]
+
+    def features(self, sample_id):
+        """
+        Returns the spectrogram of a Sample written by a DataBaseGenerator with features as read-only float32 view of
+        shape (frames, bins) into its memory-mapped feature chunk
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        row = self.rows([sample_id])[0]
+        if 'Feature-Chunk' not in self.manifest.columns:
+            raise Exception("The Data Set in '{0}' has no features.".format(self.folderPath))
+        offset = int(self.manifest['Feature-Offset'].iat[row])
+        return self.__chunk(self.manifest['Feature-Chunk'].iat[row])[
+            offset:offset + int(self.manifest['Feature-Frames'].iat[row])]
+
+    def get_batch(self, sample_ids, pad=False):
+        """
+        Returns the audio of several Samples. Without padding it is a list of views of shape (frames, channels).
+        With padding it is a tuple of one zero padded array of shape (samples, max frames, channels), which is a copy,
+        and the number of frames of every Sample.
+
+        Args:
+            sample_ids: List of int - IDs of the Samples
+            pad: bool - Switch for returning one zero padded array
+        """
+        views = [self.audio(sample_id) for sample_id in sample_ids]
+        if not pad:
+            return views
+        lengths = np.array([len(view) for view in views], dtype=np.int64)
+        channels = max([view.shape[1] for view in views], default=1)
+        batch = np.zeros((len(views), lengths.max(initial=0), channels), dtype=np.int16)
+        for i, view in enumerate(views):
+            batch[i, :len(view), :view.shape[1]] = view
+        return batch, lengths
+
+    def filter(self, bpm_range=None, scales=None, root_notes=None, synth_modules=None):
+        """
+        Returns the IDs of all Samples matching every given condition of their metadata
+
+        Args:
+            bpm_range: tuple - (lowest, highest) BPM, both included
+            scales: str or List of str - Names of the Scales, e.g. "Major"
+            root_notes: str or List of str - Root Notes, e.g. "C#"
+            synth_modules: str or List of str - Names of the Synth Modules, e.g. "Synth Module One"
+        """
+        mask = np.ones(len(self.manifest), dtype=bool)
+        if bpm_range is not None:
+            mask &= self.manifest['BPM'].between(bpm_range[0], bpm_range[1]).values
+        for column, values in [('Scale', scales), ('RootNote', root_notes), ('SynthModules', synth_modules)]:
+            if values is not None:
+                if isinstance(values, str):
+                    values = [values]
+                mask &= self.manifest[column].isin(values).values
+        return self.ids[mask]
@@ -0,0 +1,269 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+from Generators.GenerationPlan import GenerationPlan
+from Util.DedupIndex import load_dedup_index
+
+# Folders and CSV-Files of the train and the test Data Set of a split batch
+SPLIT_FOLDERS = ["Train", "Test"]
+SPLIT_CSV_NAMES = ["train.csv", "test.csv"]
+# Columns of the CSV-File whose values a split batch can hold out for the test Data Set
+HOLDOUT_COLUMNS = ["Scale", "RootNote", "BPM", "SynthModules"]
+# A split batch plans at most this many IDs per requested Sample before it gives up filling both Data Sets
+MAX_SPLIT_CANDIDATES = 100
+# Part of the path of the dedup index of a part of a batch which is left out in the path of the merged one
+PART_DEDUP_PATTERN = re.compile(r"\.part-\d+-of-\d+(?=_dedup\.npz$)")
+
+
+def part_range(number_of_samples, part_index, number_of_parts):
+    """
+    Returns the first ID and the ID after the last one of a part of a batch. The parts split the IDs of the
+    batch into number_of_parts ranges of nearly the same size.
+
+    Args:
+        number_of_samples: int - Number of Samples of the whole batch
+        part_index: int - Index of the part, from 0 to number_of_parts - 1
+        number_of_parts: int - Number of parts the batch is split into
+    """
+    if not 0 <= part_index < number_of_parts:
+        raise Exception("The part '{0}' is not one of the {1} parts.".format(part_index, number_of_parts))
+    return (part_index * number_of_samples // number_of_parts,
+            (part_index + 1) * number_of_samples // number_of_parts)
+
+
+def part_csv_name(name_of_csv, part_index, number_of_parts):
+    """
+    Returns the name of the CSV-File of a part of a batch, e.g. 'train.part-00001-of-00004.csv'
+
+    Args:
+        name_of_csv: str - Name of the CSV-File of the whole batch
+        part_index: int - Index of the part
+        number_of_parts: int - Number of parts the batch is split into
+    """
+    if number_of_parts == 1:
+        return name_of_csv
+    stem, extension = os.path.splitext(name_of_csv)
+    return "{0}.part-{1:05d}-of-{2:05d}{3}".format(stem, part_index, number_of_parts, extension)
+
+
+def settings_path(path_to_csv):
+    """
+    Returns the path of the Settings File of the batch of a CSV-File
+
+    Args:
+        path_to_csv: str - Path of the CSV-File
+    """
+    return os.path.splitext(path_to_csv)[0] + "_settings.json"
+
+
+def merged_dedup_settings(settings):
+    """
+    Returns the Settings of a part of a batch with the dedup indexes of parts it was deduplicated against replaced
+    by the merged ones, e.g. the test Data Set of every part of a split batch against the train Data Set of the same
+    part. So these Settings are the same for every part and for the merged batch.
+
+    Args:
+        settings: dict - Settings read from the Settings File of a part
+    """
+    if settings.get("dedup") is None:
+        return settings
+    dedup = dict(settings["dedup"], against=[PART_DEDUP_PATTERN.sub("", path) for path in settings["dedup"]["against"]])
+    return dict(settings, dedup=dedup)
+
+
+def merge_parts(generator, destination_folder, number_of_parts, name_of_csv="DB_WAVs_and_MIDIs.csv"):
+    """
+    Merges the CSV-Files of all parts of a batch generated with batch_generate(part_index=i,
+    number_of_parts=number_of_parts) into destination_folder into one CSV-File name_of_csv, the same as if the
+    batch was generated at once. Every part has to be finished and generated with the same Settings, and every
+    row has to be the planned Sample of its ID, so no ID is missing. The Settings are read from the parts and taken
+    over by the generator, only its use_synth_modules has to be the one the parts were generated with. The Settings
+    of the merged batch are written as well, so it can be resumed like a batch generated at once. The dedup indexes
+    and redrawn Samples of deduplicated parts are merged too.
+
+    Args:
+        generator: DataBaseGenerator - Generator which plans the Samples of the parts again
+        destination_folder: str - Folder holding the CSV-Files of all parts
+        number_of_parts: int - Number of parts the batch was split into
+        name_of_csv: str - Name of the merged CSV-File, the name the parts were generated with
+    """
+    part_frames = []
+    redrawn_frames = []
+    dedup_indexes = []
+    settings = None
+    for part_index in range(number_of_parts):
+        path_to_csv = os.path.join(destination_folder, part_csv_name(name_of_csv, part_index, number_of_parts))
+        path_to_settings = settings_path(path_to_csv)
+        if not os.path.isfile(path_to_csv) or not os.path.isfile(path_to_settings):
+            raise Exception("The part '{0}' of the batch in '{1}' is missing.".format(part_index, destination_folder))
+        with open(path_to_settings) as settings_file:
+            part_settings = merged_dedup_settings(json.load(settings_file))
+        if settings is None:
+            # The Settings of the first part are taken over, every other part has to match them
+            settings = part_settings
+            generator.apply_batch_settings(destination_folder, settings)
+        else:
+            generator.check_settings(part_settings, settings)
+            if part_settings["seed"] != settings["seed"]:
+                raise Exception("The part '{0}' of the batch in '{1}' was generated with another Seed.".format(
+                    part_index, destination_folder))
+
+        first_id, end_id = part_range(settings["number_of_samples"], part_index, number_of_parts)
+        existing = pd.read_csv(path_to_csv, sep=',', encoding='utf-8')
+        redrawn = None
+        if settings.get("dedup") is not None:
+            dedup_path, redrawn_path = generator.dedup_paths(path_to_csv)
+            if not os.path.isfile(dedup_path) or not os.path.isfile(redrawn_path):
+                raise Exception("The dedup index of the part '{0}' of the batch in '{1}' is missing.".format(
+                    part_index, destination_folder))
+            redrawn = pd.read_csv(redrawn_path, sep=',', encoding='utf-8')
+            redrawn_frames.append(redrawn)
+            dedup_indexes.append(load_dedup_index(dedup_path))
+        valid_rows = generator.valid_rows(existing, settings, first_id, end_id - first_id, check_files=False,
+                                          redrawn=redrawn)
+        if len(existing) != end_id - first_id or valid_rows != len(existing):
+            raise Exception("The part '{0}' of the batch in '{1}' is missing the Samples from the ID '{2}' on."
+                            .format(part_index, destination_folder, first_id + valid_rows))
+        part_frames.append(existing)
+
+    pd.concat(part_frames, ignore_index=True).to_csv(os.path.join(destination_folder, name_of_csv), sep=',',
+                                                      index=False, encoding='utf-8')
+    settings.update(part_index=0, number_of_parts=1)
+    if dedup_indexes:
+        # Every part was deduplicated on its own, so Samples of different parts may sound the same
+        number_of_hashes = sum(len(part_dedup_index) for part_dedup_index in dedup_indexes)
+        dedup_index = dedup_indexes[0]
+        for part_dedup_index in dedup_indexes[1:]:
+            dedup_index.update(part_dedup_index)
+        if dedup_index.mode == "exact" and len(dedup_index) < number_of_hashes:
+            print("{0} Samples sound like a Sample of another part.".format(number_of_hashes - len(dedup_index)))
+        dedup_path, redrawn_path = generator.dedup_paths(os.path.join(destination_folder, name_of_csv))
+        dedup_index.save(dedup_path)
+        pd.concat(redrawn_frames, ignore_index=True).to_csv(redrawn_path, sep=',', index=False, encoding='utf-8')
+    with open(settings_path(os.path.join(destination_folder, name_of_csv)), "w") as settings_file:
+        json.dump(settings, settings_file, indent=2)
+    print("Merged {0} parts with {1} Samples into '{2}'.".format(number_of_parts, settings["number_of_samples"],
+                                                                 os.path.join(destination_folder, name_of_csv)))
+
+
+def merge_parts_with_split(generator, destination_directory, number_of_parts):
+    """
+    Merges the parts of the train and the test Data Set generated with batch_generate_with_split, see merge_parts
+
+    Args:
+        generator: DataBaseGenerator - Generator which plans the Samples of the parts again
+        destination_directory: str - Directory holding the folders 'Train' and 'Test'
+        number_of_parts: int - Number of parts the batches were split into
+    """
+    for folder_name, name_of_csv in zip(SPLIT_FOLDERS, SPLIT_CSV_NAMES):
+        merge_parts(generator, os.path.join(destination_directory, folder_name), number_of_parts, name_of_csv)
+
+
+def plan_split(generator, number_of_samples_train, number_of_samples_test, use_polyphonic=True, holdout=None,
+               dedup_indexes=None):
+    """
+    Assigns the Samples of one combined ID space to a train and a test Data Set. Returns the GenerationPlan of all
+    IDs up to the last assigned one and the Data Set of every planned Sample: 0 for train, 1 for test and -1 if it
+    is left out.
+
+    Without holdout a Sample belongs to the test Data Set if its split draw is below the share of test Samples.
+    With holdout every Sample with one of the held-out values belongs to the test Data Set and every other one to
+    the train Data Set. The IDs are assigned in ascending order and a Sample is left out if its Data Set is full
+    or if a Sample with the same Notes, see SampleGenerator.content_hash, is already in the other Data Set. So no
+    melody is in both Data Sets and the split only depends on the Master Seed and the arguments. With
+    dedup_indexes a Sample which sounds like one in any of them is left out as well and the hash of every assigned
+    Sample is added to the index of its Data Set.
+
+    Args:
+        generator: DataBaseGenerator - Generator which plans and composes the Samples
+        number_of_samples_train: int - Number of Samples of the train Data Set
+        number_of_samples_test: int - Number of Samples of the test Data Set
+        use_polyphonic: bool - Switch for planning polyphonic Samples or Monophonic
+        holdout: dict - Values of the CSV columns 'Scale', 'RootNote', 'BPM' and 'SynthModules' which are only in
+                 the test Data Set, e.g. {"Scale": ["Dorian"], "RootNote": ["C#"]}
+        dedup_indexes: List of DedupIndex or BloomFilter - Index of the train and of the test Data Set
+    """
+    targets = [number_of_samples_train, number_of_samples_test]
+    test_share = number_of_samples_test / max(sum(targets), 1)
+    hashes = [set(), set()]
+    counts = [0, 0]
+    splits = []
+    while counts != targets:
+        if len(splits) >= MAX_SPLIT_CANDIDATES * sum(targets) + GenerationPlan.BLOCK_SIZE:
+            raise Exception("Only {0} train and {1} test Samples were found in the first {2} IDs.".format(
+                counts[0], counts[1], len(splits)))
+        plan = generator.plan_batch(GenerationPlan.BLOCK_SIZE, use_polyphonic, 0, len(splits))
+        wanted = holdout_mask(generator, plan, holdout) if holdout else plan.splitDraws < test_share
+        for index in range(len(plan)):
+            if counts == targets:
+                break
+            split = int(wanted[index])
+            splits.append(-1)
+            if counts[split] == targets[split]:
+                continue
+            sample_gen = generator.compose_planned(plan, index)
+            content_hash = sample_gen.content_hash()
+            if content_hash in hashes[1 - split]:
+                continue
+            if dedup_indexes is not None:
+                sound_hash = sample_gen.content_hash(with_sound=True)
+                if any(sound_hash in dedup_index for dedup_index in dedup_indexes):
+                    continue
+                dedup_indexes[split].add(sound_hash)
+            hashes[split].add(content_hash)
+            counts[split] += 1
+            splits[-1] = split
+    return generator.plan_batch(len(splits), use_polyphonic, 0, 0), np.array(splits, dtype=np.int8)
+
+
+def check_holdout(generator, holdout):
+    """
+    Raises an Exception if a held-out column or value does not exist and returns every possible value of the
+    CSV columns in the order of their Parameters
+
+    Args:
+        generator: DataBaseGenerator - Generator whose Parameters are held out
+        holdout: dict - Held-out values of the CSV columns, see plan_split
+    """
+    possible_values = {"Scale": [str(scale) for scale in generator.possibleScales],
+                       "RootNote": [root + sign for root in generator.possibleRoots
+                                    for sign in generator.possibleSigns],
+                       "BPM": generator.possibleTempos.tolist(),
+                       "SynthModules": [str(module) for module in generator.synth_modules]}
+    for column, values in holdout.items():
+        if column not in HOLDOUT_COLUMNS:
+            raise Exception("The column '{0}' can not be held out. Possible columns: {1}".format(
+                column, HOLDOUT_COLUMNS))
+        unknown = [value for value in values if value not in possible_values[column]]
+        if unknown:
+            raise Exception("The values '{0}' of '{1}' do not exist. Possible values: {2}".format(
+                unknown, column, possible_values[column]))
+    return possible_values
+
+
+def holdout_mask(generator, plan, holdout):
+    """
+    Returns for every Sample of plan whether one of its Parameters is held out for the test Data Set
+
+    Args:
+        generator: DataBaseGenerator - Generator which planned the Samples
+        plan: GenerationPlan - Plan of the Samples
+        holdout: dict - Held-out values of the CSV columns, see plan_split
+    """
+    possible_values = check_holdout(generator, holdout)
+    # Index of the value of every planned Sample in possible_values
+    indices = {"Scale": plan.scaleIndices,
+               "RootNote": plan.rootIndices.astype(np.int64) * len(generator.possibleSigns) + plan.signIndices,
+               "BPM": plan.tempoIndices,
+               "SynthModules": plan.synthModuleIndices}
+    mask = np.zeros(len(plan), dtype=bool)
+    for column, values in holdout.items():
+        mask |= np.isin(possible_values[column], values)[indices[column]]
+    return mask
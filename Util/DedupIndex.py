@@ -0,0 +1,228 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import math
+import numpy as np
+
+# "exact" keeps every hash, "bloom" keeps a Bloom filter of a fixed size
+DEDUP_MODES = ["exact", "bloom"]
+
+
+def hash_to_int(content_hash):
+    """
+    Returns a 128 bit hash as returned by SampleGenerator.content_hash as int
+
+    Args:
+        content_hash: str - Hash as hex string
+    """
+    return int(content_hash, 16)
+
+
+class DedupIndex:
+    """
+    Class holding the content hashes of all Samples of a Data Set, which finds every duplicate.
+    Every hash takes about 100 bytes of memory, so for tens of millions of Samples the BloomFilter is used.
+    """
+    mode = "exact"
+
+    def __init__(self):
+        """
+        Initializing DedupIndex - Object
+        """
+        self.hashes = set()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, content_hash):
+        return hash_to_int(content_hash) in self.hashes
+
+    def add(self, content_hash):
+        """
+        Adds the hash of a Sample and returns False if it was already in the index
+
+        Args:
+            content_hash: str - Hash as hex string
+        """
+        value = hash_to_int(content_hash)
+        if value in self.hashes:
+            return False
+        self.hashes.add(value)
+        return True
+
+    def update(self, other):
+        """
+        Adds every hash of another DedupIndex
+
+        Args:
+            other: DedupIndex - Index of another Data Set
+        """
+        if not isinstance(other, DedupIndex):
+            raise Exception("A '{0}' index can not be added to an '{1}' index.".format(other.mode, self.mode))
+        self.hashes |= other.hashes
+
+    def save(self, path):
+        """
+        Saves the index as npz-File
+
+        Args:
+            path: str - Path of the File
+        """
+        # Both halves are filled straight into the array without a list of all hashes, the unchanged set is iterated
+        # in the same order twice
+        hashes = np.empty((len(self.hashes), 2), dtype='<u8')
+        hashes[:, 0] = np.fromiter((value >> 64 for value in self.hashes), dtype='<u8', count=len(self.hashes))
+        hashes[:, 1] = np.fromiter((value & (2 ** 64 - 1) for value in self.hashes), dtype='<u8',
+                                   count=len(self.hashes))
+        # Sorted in place by both halves, so the same hashes always give the same File
+        hashes.view([('high', '<u8'), ('low', '<u8')]).sort(axis=0)
+        with open(path, 'wb') as index_file:
+            np.savez(index_file, mode=self.mode, hashes=hashes)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Returns the DedupIndex of the arrays of a File written by save
+
+        Args:
+            arrays: NpzFile - Content of the File
+        """
+        index = cls()
+        index.hashes = set((int(high) << 64) | int(low) for high, low in arrays["hashes"].tolist())
+        return index
+
+
+class BloomFilter:
+    """
+    Class holding the content hashes of the Samples of a Data Set in a Bloom filter of a fixed size, which is about
+    1.8 bytes per Sample for an error rate of 0.001. No duplicate is missed, but with a probability of about
+    error_rate a new Sample is taken for a duplicate as long as at most capacity Samples are added.
+    The positions of a hash are derived from its two 64 bit halves by double hashing.
+    """
+    mode = "bloom"
+
+    def __init__(self, capacity=10 ** 7, error_rate=0.001):
+        """
+        Initializing BloomFilter - Object
+
+        Args:
+            capacity: int - Number of Samples the filter is sized for
+            error_rate: float - Probability of taking a new Sample for a duplicate when it holds capacity Samples
+        """
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise Exception("A Bloom filter for '{0}' Samples with the error rate '{1}' can not be built.".format(
+                capacity, error_rate))
+        self.capacity = capacity
+        self.errorRate = error_rate
+        self.numberOfBits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.numberOfHashes = max(1, int(round(self.numberOfBits / capacity * math.log(2))))
+        self.bits = np.zeros((self.numberOfBits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __positions(self, content_hash):
+        """
+        Returns the byte and the bit of every position of a hash in self.bits
+
+        Args:
+            content_hash: str - Hash as hex string
+        """
+        value = hash_to_int(content_hash)
+        first, second = value >> 64, (value & (2 ** 64 - 1)) | 1
+        positions = [(first + i * second) % self.numberOfBits for i in range(self.numberOfHashes)]
+        return [(position >> 3, 1 << (position & 7)) for position in positions]
+
+    def __contains__(self, content_hash):
+        return all(self.bits[byte] & bit for byte, bit in self.__positions(content_hash))
+
+    def add(self, content_hash):
+        """
+        Adds the hash of a Sample and returns False if it was probably already in the filter
+
+        Args:
+            content_hash: str - Hash as hex string
+        """
+        is_new = False
+        for byte, bit in self.__positions(content_hash):
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                is_new = True
+        self.count += int(is_new)
+        return is_new
+
+    def update(self, other):
+        """
+        Adds every hash of another BloomFilter of the same size or of a DedupIndex
+
+        Args:
+            other: BloomFilter or DedupIndex - Index of another Data Set
+        """
+        if isinstance(other, DedupIndex):
+            for value in other.hashes:
+                self.add("{0:032x}".format(value))
+            return
+        if other.numberOfBits != self.numberOfBits or other.numberOfHashes != self.numberOfHashes:
+            raise Exception("Bloom filters for {0} and {1} Samples with the error rates {2} and {3} can not be "
+                            "merged.".format(self.capacity, other.capacity, self.errorRate, other.errorRate))
+        self.bits |= other.bits
+        # Samples in both filters are counted twice
+        self.count += other.count
+
+    def save(self, path):
+        """
+        Saves the filter as npz-File
+
+        Args:
+            path: str - Path of the File
+        """
+        with open(path, 'wb') as index_file:
+            np.savez(index_file, mode=self.mode, bits=self.bits, capacity=self.capacity, error_rate=self.errorRate,
+                     count=self.count)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Returns the BloomFilter of the arrays of a File written by save
+
+        Args:
+            arrays: NpzFile - Content of the File
+        """
+        bloom_filter = cls(int(arrays["capacity"]), float(arrays["error_rate"]))
+        bloom_filter.bits = arrays["bits"].copy()
+        bloom_filter.count = int(arrays["count"])
+        return bloom_filter
+
+
+def new_dedup_index(mode, capacity=10 ** 7, error_rate=0.001):
+    """
+    Returns an empty DedupIndex or BloomFilter
+
+    Args:
+        mode: str - Either "exact" or "bloom"
+        capacity: int - Number of Samples a BloomFilter is sized for
+        error_rate: float - Error rate of a BloomFilter
+    """
+    if mode == "exact":
+        return DedupIndex()
+    if mode == "bloom":
+        return BloomFilter(capacity, error_rate)
+    raise Exception("Unknown dedup mode '{0}'. Possible modes: {1}".format(mode, DEDUP_MODES))
+
+
+def load_dedup_index(path):
+    """
+    Returns the DedupIndex or BloomFilter saved in a npz-File
+
+    Args:
+        path: str - Path of the File
+    """
+    with np.load(path) as arrays:
+        mode = str(arrays["mode"])
+        if mode == "exact":
+            return DedupIndex.from_arrays(arrays)
+        if mode == "bloom":
+            return BloomFilter.from_arrays(arrays)
+    raise Exception("'{0}' holds no dedup index.".format(path))
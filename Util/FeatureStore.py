@@ -0,0 +1,207 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import os
+import numpy as np
+
+# "mel" is a log-mel spectrogram, "stft" the log power of every bin of the FFT
+FEATURE_KINDS = ["mel", "stft"]
+# Frames of a spectrogram are transformed in blocks of FFT_BLOCK_FRAMES, so long Samples need no more memory
+FFT_BLOCK_FRAMES = 512
+# Power added before taking the logarithm, so silence stays finite
+LOG_OFFSET = 1e-10
+# Features are stored as little-endian float32, one row per frame
+FEATURE_DTYPE = '<f4'
+
+
+def check_feature_options(kind, fft_size, hop_size, mel_bins):
+    """
+    Raises an Exception if the options of the features are not supported
+
+    Args:
+        kind: str - Either "mel" or "stft"
+        fft_size: int - Number of samples of every frame
+        hop_size: int - Number of samples between the starts of two frames
+        mel_bins: int - Number of mel bands of a "mel" spectrogram
+    """
+    if kind not in FEATURE_KINDS:
+        raise Exception("Unknown feature kind '{0}'. Possible kinds: {1}".format(kind, FEATURE_KINDS))
+    if fft_size < 2 or hop_size < 1 or mel_bins < 1:
+        raise Exception("Spectrograms with the FFT size '{0}', the hop size '{1}' and '{2}' mel bins can not be "
+                        "computed.".format(fft_size, hop_size, mel_bins))
+
+
+def feature_bins(kind, fft_size, mel_bins):
+    """
+    Returns the number of values of every frame of a spectrogram
+
+    Args:
+        kind: str - Either "mel" or "stft"
+        fft_size: int - Number of samples of every frame
+        mel_bins: int - Number of mel bands of a "mel" spectrogram
+    """
+    return mel_bins if kind == "mel" else fft_size // 2 + 1
+
+
+def hz_to_mel(frequency):
+    return 2595.0 * np.log10(1.0 + np.asarray(frequency, dtype=np.float64) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel, dtype=np.float64) / 2595.0) - 1.0)
+
+
+def mel_filterbank(sampling_rate, fft_size, mel_bins):
+    """
+    Returns the triangular filters of mel_bins bands evenly spaced on the mel scale from 0 Hz to the Nyquist frequency
+    as array of shape (mel_bins, fft_size // 2 + 1)
+
+    Args:
+        sampling_rate: int - Sampling Rate of the audio in Hz
+        fft_size: int - Number of samples of every frame
+        mel_bins: int - Number of mel bands
+    """
+    fft_frequencies = np.linspace(0.0, sampling_rate / 2.0, fft_size // 2 + 1)
+    band_edges = mel_to_hz(np.linspace(0.0, hz_to_mel(sampling_rate / 2.0), mel_bins + 2))
+    rising = (fft_frequencies[np.newaxis, :] - band_edges[:-2, np.newaxis]) / \
+        (band_edges[1:-1] - band_edges[:-2])[:, np.newaxis]
+    falling = (band_edges[2:, np.newaxis] - fft_frequencies[np.newaxis, :]) / \
+        (band_edges[2:] - band_edges[1:-1])[:, np.newaxis]
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def spectrogram(pcm, sampling_rate, bit_depth=16, kind="mel", fft_size=2048, hop_size=512, mel_bins=128,
+                filterbank=None):
+    """
+    Returns the log spectrogram of the mono downmix of PCM as float32 array of shape (frames, bins). Frame i starts
+    at sample i * hop_size and is weighted by a Hann window, the last frame is padded with zeros, so every sample is
+    part of a frame. The frames are sliced out of the audio without copying it and transformed in blocks by one
+    batched FFT each.
+
+    Args:
+        pcm: ndarray - PCM with the shape (frames, channels) as returned by Util.AudioFile.to_pcm
+        sampling_rate: int - Sampling Rate of the PCM in Hz
+        bit_depth: int - Bits per sample of the PCM
+        kind: str - Either "mel" or "stft"
+        fft_size: int - Number of samples of every frame
+        hop_size: int - Number of samples between the starts of two frames
+        mel_bins: int - Number of mel bands of a "mel" spectrogram
+        filterbank: ndarray - Filters as returned by mel_filterbank, computed if None
+    """
+    audio = np.asarray(pcm, dtype=np.float32).mean(axis=1)
+    audio /= 2.0 ** (bit_depth - 1) - 1
+    number_of_frames = 1 + -(-max(len(audio) - fft_size, 0) // hop_size)
+    padded = np.zeros((number_of_frames - 1) * hop_size + fft_size, dtype=np.float32)
+    padded[:len(audio)] = audio
+    frames = np.lib.stride_tricks.sliding_window_view(padded, fft_size)[::hop_size]
+    window = np.hanning(fft_size + 1)[:-1].astype(np.float32)
+    if kind == "mel" and filterbank is None:
+        filterbank = mel_filterbank(sampling_rate, fft_size, mel_bins)
+
+    features = np.empty((number_of_frames, feature_bins(kind, fft_size, mel_bins)), dtype=np.float32)
+    for start in range(0, number_of_frames, FFT_BLOCK_FRAMES):
+        spectrum = np.fft.rfft(frames[start:start + FFT_BLOCK_FRAMES] * window, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        if kind == "mel":
+            power = power @ filterbank.T
+        features[start:start + FFT_BLOCK_FRAMES] = np.log(power + LOG_OFFSET)
+    return features
+
+
+def chunk_name(chunk_index, prefix="features"):
+    """
+    Returns the filename of a feature chunk
+
+    Args:
+        chunk_index: int - Running number of the chunk
+        prefix: str - Start of the filename, which separates chunks written into the same folder by different runs
+    """
+    return "{0}_{1:05d}.f32".format(prefix, chunk_index)
+
+
+def is_valid_features(chunk_path, number_of_bins, offset, frames):
+    """
+    Checks that a chunk holds all frames of the features of a Sample
+
+    Args:
+        chunk_path: str - Path of the chunk
+        number_of_bins: int - Number of values of every frame
+        offset: int - First frame of the Sample in the chunk
+        frames: int - Number of frames of the Sample
+    """
+    if not os.path.isfile(chunk_path):
+        return False
+    return os.path.getsize(chunk_path) >= (offset + frames) * number_of_bins * np.dtype(FEATURE_DTYPE).itemsize
+
+
+class FeatureWriter:
+    """
+    Class for appending the spectrograms of Samples to chunk files. A chunk is raw float32 of shape (frames, bins)
+    without any header, so it can be memory-mapped as a whole, and a Sample is found by its first frame and its
+    number of frames. A new chunk is started as soon as the current one holds chunk_size bytes.
+    """
+
+    def __init__(self, folder_path, number_of_bins, chunk_size=2 ** 28, first_chunk=0, prefix="features"):
+        """
+        Initializing FeatureWriter - Object
+
+        Args:
+            folder_path: str - Folder where to save the chunks into
+            number_of_bins: int - Number of values of every frame
+            chunk_size: int - Size in bytes after which a new chunk is started
+            first_chunk: int - Running number of the first chunk, used to continue an existing set of chunks
+            prefix: str - Start of the filenames of the chunks
+        """
+        self.folderPath = folder_path
+        self.numberOfBins = number_of_bins
+        self.chunkSize = chunk_size
+        self.chunkIndex = first_chunk
+        self.prefix = prefix
+        self.chunkFile = None
+        self.chunkFrames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def chunk_name(self):
+        return chunk_name(self.chunkIndex, self.prefix)
+
+    def add(self, features):
+        """
+        Appends the features of one Sample to the current chunk and returns the name of the chunk, the first frame
+        of the Sample in it and its number of frames
+
+        Args:
+            features: ndarray - Features with the shape (frames, bins) as returned by spectrogram
+        """
+        if features.ndim != 2 or features.shape[1] != self.numberOfBins:
+            raise Exception("Features of the shape '{0}' can not be stored in chunks of '{1}' bins.".format(
+                features.shape, self.numberOfBins))
+        if self.chunkFile is not None and self.chunkFile.tell() >= self.chunkSize:
+            self.close()
+            self.chunkIndex += 1
+        if self.chunkFile is None:
+            self.chunkFile = open(os.path.join(self.folderPath, self.chunk_name), 'wb')
+            self.chunkFrames = 0
+
+        offset = self.chunkFrames
+        self.chunkFile.write(np.ascontiguousarray(features, dtype=FEATURE_DTYPE).tobytes())
+        self.chunkFrames += len(features)
+        return self.chunk_name, offset, len(features)
+
+    def flush(self):
+        """
+        Flushes the features of the current chunk to disk
+        """
+        if self.chunkFile is not None:
+            self.chunkFile.flush()
+
+    def close(self):
+        if self.chunkFile is not None:
+            self.chunkFile.close()
+            self.chunkFile = None
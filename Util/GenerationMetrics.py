@@ -0,0 +1,154 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Keys of a Sample record which are counts and not durations of a stage
+COUNT_KEYS = ["id", "notes", "chords", "rests", "voice_cache_hits", "voice_cache_misses"]
+# Keys of a Sample record which are the number of Samples waiting in a queue of the pipeline when it was queued
+QUEUE_KEYS = ["render_queue", "write_queue"]
+
+
+@contextmanager
+def time_stage(timings, name):
+    """
+    Adds the duration in seconds of the enclosed code to timings[name]. Does nothing if timings is None, so the
+    instrumentation costs nothing when it is switched off.
+
+    Args:
+        timings: dict or None - Durations of the stages of one Sample
+        name: str - Name of the stage
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class GenerationMetrics:
+    """
+    Class for collecting the stage durations and Note counts of every generated Sample. The records are created
+    where the Sample is generated, which can be a worker process, and added here in the main process.
+    """
+
+    def __init__(self, window=50, hook=None):
+        """
+        Initializing GenerationMetrics - Object
+
+        Args:
+            window: int - Number of last finished Samples the rolling throughput is computed from
+            hook: callable - Called as hook(record, metrics) for every added Sample record, e.g. to forward the
+                  metrics to an own collector
+        """
+        self.hook = hook
+        self.records = []
+        # Names of the timed stages in the order they first appeared, kept up to date by add
+        self.stageNames = []
+        self.startTime = time.perf_counter()
+        self.completionTimes = deque(maxlen=window)
+
+    def add(self, record):
+        """
+        Adds the record of one finished Sample
+
+        Args:
+            record: dict - ID, Note counts and durations in seconds of the stages of the Sample
+        """
+        self.records.append(record)
+        for key in record:
+            if key not in COUNT_KEYS and key not in QUEUE_KEYS and key not in self.stageNames:
+                self.stageNames.append(key)
+        self.completionTimes.append(time.perf_counter())
+        if self.hook is not None:
+            self.hook(record, self)
+
+    def stage_names(self):
+        """
+        Returns the names of all timed stages in the order they first appeared
+        """
+        return list(self.stageNames)
+
+    def rolling_throughput(self):
+        """
+        Returns the Samples per second of the last finished Samples
+        """
+        if len(self.completionTimes) < 2:
+            return 0.0
+        duration = self.completionTimes[-1] - self.completionTimes[0]
+        return (len(self.completionTimes) - 1) / duration if duration > 0 else 0.0
+
+    def postfix(self):
+        """
+        Returns the rolling throughput, the mean duration of every stage of the last Samples and the last queue
+        depths as dict for the postfix of a tqdm progress bar
+        """
+        postfix = {"samples/s": "{0:.1f}".format(self.rolling_throughput())}
+        last_records = self.records[-self.completionTimes.maxlen:]
+        for name in QUEUE_KEYS:
+            if last_records and name in last_records[-1]:
+                postfix[name] = last_records[-1][name]
+        for name in self.stage_names():
+            values = [record[name] for record in last_records if name in record]
+            if values:
+                postfix[name + " ms"] = "{0:.1f}".format(1000.0 * sum(values) / len(values))
+        return postfix
+
+    def summary(self):
+        """
+        Returns the throughput, the totals of the Note counts, the mean and maximum queue depths and the duration
+        statistics of every stage of all added Samples as dict
+        """
+        seconds = time.perf_counter() - self.startTime
+        summary = {"samples": len(self.records),
+                   "seconds": seconds,
+                   "samples_per_second": len(self.records) / seconds if seconds > 0 else 0.0,
+                   "notes": sum(record.get("notes", 0) for record in self.records),
+                   "chords": sum(record.get("chords", 0) for record in self.records),
+                   "rests": sum(record.get("rests", 0) for record in self.records),
+                   "voice_cache_hits": sum(record.get("voice_cache_hits", 0) for record in self.records),
+                   "voice_cache_misses": sum(record.get("voice_cache_misses", 0) for record in self.records),
+                   "queues": {},
+                   "stages": {}}
+        for name in QUEUE_KEYS:
+            depths = [record[name] for record in self.records if name in record]
+            if depths:
+                summary["queues"][name] = {"mean": float(np.mean(depths)), "max": int(np.max(depths))}
+        stage_totals = {}
+        for name in self.stage_names():
+            stage_totals[name] = np.array([record[name] for record in self.records if name in record])
+        time_of_all_stages = sum(values.sum() for values in stage_totals.values())
+        for name, values in stage_totals.items():
+            p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000.0
+            summary["stages"][name] = {"total_s": float(values.sum()),
+                                       "mean_ms": float(values.mean() * 1000.0),
+                                       "p50_ms": float(p50),
+                                       "p90_ms": float(p90),
+                                       "p99_ms": float(p99),
+                                       "share": float(values.sum() / time_of_all_stages)
+                                       if time_of_all_stages > 0 else 0.0}
+        return summary
+
+    def write(self, folder_path, name):
+        """
+        Writes the summary as JSON-File and the records of all Samples as CSV-File into the given folder
+
+        Args:
+            folder_path: str - Folder where to save the Files into
+            name: str - Name of both Files without extension
+        """
+        with open(os.path.join(folder_path, name + ".json"), "w") as json_file:
+            json.dump(self.summary(), json_file, indent=2)
+        df = pd.DataFrame(self.records, columns=COUNT_KEYS + QUEUE_KEYS + self.stage_names())
+        df.to_csv(os.path.join(folder_path, name + ".csv"), sep=',', index=False, encoding='utf-8')
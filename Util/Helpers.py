@@ -2,10 +2,26 @@
 Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
 Licensed under the MIT License.
 """
-from pyo import *
 from mido import MidiFile
 from Util.NoteExtractor import NoteExtractor
+from Util.NumpySynth import NumpyRenderSession
+from Util.AudioFile import AUDIO_FORMATS, BIT_DEPTHS, check_audio_options, pcm_from_bytes
 import os
+import tempfile
+import wave
+from collections import deque
+import numpy as np
+
+try:
+    from pyo import Server, Sine, SineLoop, SuperSaw, midiToHz
+except ImportError:
+    # pyo is only needed for the "pyo" backend, the "numpy" backend works without it
+    Server = Sine = SineLoop = SuperSaw = midiToHz = None
+
+BACKENDS = ["pyo", "numpy"]
+# Pitch Class of every Note Step and the alteration of every Sign, as music21 spells them
+STEP_PITCH_CLASSES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+SIGN_ALTERATIONS = {'-': -1, '': 0, '#': 1}
 
 
 class Scale:
@@ -62,18 +78,396 @@ class Scale:
 
         return notes
 
+    def calc_pitch_classes(self, root, sign):
+        """
+        Calculates the pitch classes of all notes in Scale without music21. They are the same as the pitch classes
+        of the notes of calc_notes: The root keeps its spelling (e.g. 'C-' is -1 and 'B#' is 12) and music21 spells
+        all transposed notes in the range 0 to 11.
+
+        Args:
+            root: str - Step of the root Note
+            sign: str - Sign of the root Note ('-', '' or '#')
+        Return:
+            pitch_classes: List of int
+        """
+        root_pitch_class = STEP_PITCH_CLASSES[root] + SIGN_ALTERATIONS[sign]
+        pitch_classes = [root_pitch_class]
+        semitones = root_pitch_class
+        for interval in self.intervals:
+            semitones += interval
+            pitch_classes.append(semitones % 12)
+
+        return pitch_classes
+
+
+class PitchTable:
+    """
+    Class for holding the MIDI Pitch of every combination of root, sign, scale, scale degree and octave, computed once
+    so Samples can pick their Notes without music21.
+    """
+
+    def __init__(self, roots, signs, scales, octaves):
+        """
+        Initializing PitchTable - Object
+
+        Args:
+            roots: List of Str - Steps of possible root Notes
+            signs: List of Str - Signs of possible root Notes
+            scales: List of Scale Objects - Possible scales
+            octaves: List of int - Possible octaves
+        """
+        self.degreeCounts = np.array([len(scale.intervals) + 1 for scale in scales])
+        # Indexed by root, sign, scale, scale degree and octave. Degrees a scale does not have are -1
+        self.pitches = np.full((len(roots), len(signs), len(scales), self.degreeCounts.max(), len(octaves)), -1,
+                               dtype=np.int16)
+        octave_offsets = (np.asarray(octaves) + 1) * 12
+        for root_index, root in enumerate(roots):
+            for sign_index, sign in enumerate(signs):
+                for scale_index, scale in enumerate(scales):
+                    pitch_classes = scale.calc_pitch_classes(root, sign)
+                    self.pitches[root_index, sign_index, scale_index, :len(pitch_classes)] = \
+                        np.add.outer(pitch_classes, octave_offsets)
+
+        # Some combinations of scale degree and octave share a pitch, e.g. the last degree and the root one octave
+        # up, depending on how the root is spelled. Every distinct pitch of a scale is stored once as
+        # degree * octaves + octave, padded with 0 behind the last one.
+        self.distinctPitchCounts = np.zeros(self.pitches.shape[:3], dtype=np.int16)
+        self.distinctPitchIndices = np.zeros(self.pitches.shape[:3] + (self.degreeCounts.max() * len(octaves),),
+                                             dtype=np.int16)
+        for (root_index, sign_index, scale_index), _ in np.ndenumerate(self.distinctPitchCounts):
+            flat_pitches = self.scale_pitches(root_index, sign_index, scale_index).ravel()
+            _, first_indices = np.unique(flat_pitches, return_index=True)
+            self.distinctPitchCounts[root_index, sign_index, scale_index] = len(first_indices)
+            self.distinctPitchIndices[root_index, sign_index, scale_index, :len(first_indices)] = first_indices
+
+    def scale_pitches(self, root_index, sign_index, scale_index):
+        """
+        Returns the MIDI Pitches of one scale as ndarray with the shape (scale degrees, octaves)
+
+        Args:
+            root_index: int - Index of the root
+            sign_index: int - Index of the sign
+            scale_index: int - Index of the scale
+        """
+        return self.pitches[root_index, sign_index, scale_index, :self.degreeCounts[scale_index]]
+
+
+class RenderSession:
+    """
+    Class for holding one long-lived pyo Server in offline mode, which is reused for rendering many WAV-Files.
+    Only one RenderSession should be open per process. The Server runs at the sampling rate and with the channels of
+    the rendered Files, so nothing has to be resampled or mixed down afterwards.
+
+    Usage:
+        with RenderSession() as session:
+            WavGenerator(SynthModuleOne(), session).midi_to_wav(filename, midi_file_path)
+    """
+
+    def __init__(self, sampling_rate=44100, channels=2, bit_depth=16, audio_format="wav", block_size=2 ** 16):
+        """
+        Initializing RenderSession - Object
+
+        Args:
+            sampling_rate: int - Sampling Rate of the Server and the rendered Files in Hz
+            channels: int - 2 for the stereo channels of the Synth Modules or 1 for mono
+            bit_depth: int - Bits per sample of the rendered Files and PCM, 16, 24 or 32
+            audio_format: str - Either "wav" or "flac"
+            block_size: int - Number of frames recorded at once when rendering PCM, rounded down to whole buffers
+                              of the Server
+        """
+        check_audio_options(sampling_rate, channels, bit_depth, audio_format)
+        self.samplingRate = sampling_rate
+        self.channels = channels
+        self.bitDepth = bit_depth
+        self.audioFormat = audio_format
+        self.blockSize = block_size
+        self.server = None
+        # pyo renders all voices of a WAV-File together in the Server, so there are no single voices to cache
+        self.voiceCache = None
+        # (first buffer, all_notes, synth_module) of the Samples of a batch which are not started yet, the pyo
+        # Objects of the current Sample and the index of the next buffer, see render_pcm_batch
+        self.batchSamples = deque()
+        self.batchObjects = []
+        self.bufferIndex = 0
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Creates and boots the Server in offline mode if it is not running yet.
+        """
+        if Server is None:
+            raise Exception("pyo is not installed. Use the 'numpy' backend for rendering without pyo.")
+        if self.server is None:
+            self.server = Server(sr=self.samplingRate, nchnls=self.channels, duplex=0, audio="offline")
+            # only show Errors
+            self.server.setVerbosity(1)
+            self.server.boot()
+            self.__warm_up()
+        return self
+
+    def __warm_up(self):
+        """
+        Renders one silent buffer. A freshly booted Server fades its output in during the first buffer, so without
+        this the first WAV-File of a Session would sound different than all following ones.
+        """
+        handle, path = tempfile.mkstemp(suffix=".wav")
+        os.close(handle)
+        try:
+            self.server.recordOptions(dur=self.server.getBufferSize() / self.server.getSamplingRate(),
+                                      filename=path,
+                                      fileformat=0,
+                                      sampletype=0)
+            self.server.start()
+        finally:
+            os.remove(path)
+
+    def close(self):
+        """
+        Shuts the Server down. The Session can be opened again afterwards.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+    def render(self, filename, duration, all_notes, synth_module):
+        """
+        Renders all Notes into a WAV- or FLAC-File in the format of the Session
+
+        Args:
+            filename: str - Filename of generated File
+            duration: float - Length of the File in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        self.__record(filename, AUDIO_FORMATS[self.audioFormat][1], duration, all_notes, synth_module)
+
+    def __record(self, filename, fileformat, duration, all_notes, synth_module):
+        """
+        Renders all Notes into a File and removes every pyo Object afterwards, so the Server holds no Objects
+        of this render when the next one starts.
+
+        Args:
+            filename: str - Filename of generated File
+            fileformat: int - File format of pyo, 0 for WAV
+            duration: float - Length of the File in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        if self.server is None:
+            raise Exception("The RenderSession has to be opened before rendering '{0}'.".format(filename))
+
+        # Set recording parameters.
+        self.server.recordOptions(dur=duration,
+                                  filename=filename,
+                                  fileformat=fileformat,
+                                  sampletype=BIT_DEPTHS[self.bitDepth])
+
+        pyo_objects = self.__synthesize(all_notes, synth_module)
+
+        # Start with rendering. In offline mode this returns when the rendering is finished.
+        self.server.start()
+
+        # Reset the object graph for the next pass.
+        for obj in pyo_objects + self.batchObjects:
+            obj.stop()
+        del pyo_objects[:]
+        self.batchObjects = []
+
+        if not os.path.isfile(filename) or os.path.getsize(filename) == 0:
+            # pyo only prints an Error if libsndfile can not write the format
+            raise Exception("pyo could not write '{0}', its libsndfile may not support the format.".format(filename))
+
+    def __synthesize(self, all_notes, synth_module):
+        """
+        Creates the pyo Objects of all Notes and returns them, they have to be kept until the Notes are rendered
+
+        Args:
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        pyo_objects = []
+        for midiNote in all_notes:
+            note_freq = midiToHz(midiNote.pitch)
+            dur = midiNote.duration
+            delay = midiNote.startTime
+
+            # synthesize object for every tone and channel and add them to List so they stay in memory
+            pyo_objects.extend(synth_module.synthesize_midi_note(note_freq, dur, delay, self.channels))
+        return pyo_objects
+
+    def render_pcm(self, duration, all_notes, synth_module):
+        """
+        Renders all Notes and returns the PCM with the shape (frames, channels) in the bit depth of the Session, see
+        Util.AudioFile.to_pcm, and the sampling rate. The Notes are rendered in blocks, see __render_blocks, and the
+        PCM holds the same audio as render writes.
+
+        Args:
+            duration: float - Length of the audio in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        return np.concatenate(list(self.__render_blocks(duration, all_notes, synth_module))), self.samplingRate
+
+    def __render_blocks(self, duration, all_notes, synth_module):
+        """
+        Renders all Notes in blocks of block_size frames and yields the PCM of every block with the shape
+        (frames, channels). pyo can only record into files, so every block is recorded into the same temporary
+        WAV-File and read again. The offline Server keeps the state of its Objects from one recording to the next,
+        so the blocks hold the same audio as one recording of the whole duration.
+
+        The pyo Objects of a Note are created right before the block it starts in and stopped in the block after it
+        ended, so the Server only holds the Notes sounding in a block. All Notes share one LFO of the Synth Module,
+        which starts with the first block as the LFO of every Note would. Every pyo Object is removed afterwards, so
+        the Server holds no Objects of this render when the next one starts.
+
+        Args:
+            duration: float - Length of the audio in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        if self.server is None:
+            raise Exception("The RenderSession has to be opened before rendering '{0}' Notes.".format(len(all_notes)))
+        buffer_size = self.server.getBufferSize()
+        buffer_duration = buffer_size / float(self.samplingRate)
+        buffers_per_block = max(1, self.blockSize // buffer_size)
+        # The Server rounds the duration of every recording up to whole buffers
+        number_of_buffers = int(np.ceil(duration * self.samplingRate / buffer_size))
+        starting_notes = sorted(all_notes, key=lambda midi_note: midi_note.startTime)
+        next_note = 0
+        # (end in seconds, pyo Objects) of the Notes which are created and not stopped yet
+        sounding_notes = []
+        lfo = synth_module.create_lfo() if all_notes else None
+
+        handle, path = tempfile.mkstemp(suffix=".wav")
+        os.close(handle)
+        try:
+            for first_buffer in range(0, number_of_buffers, buffers_per_block):
+                block_buffers = min(buffers_per_block, number_of_buffers - first_buffer)
+                block_start = first_buffer * buffer_duration
+                block_end = (first_buffer + block_buffers) * buffer_duration
+
+                # pyo stops the Notes itself after their duration, a buffer later their Objects are surely silent
+                for end, pyo_objects in sounding_notes:
+                    if end + buffer_duration < block_start:
+                        for obj in pyo_objects:
+                            obj.stop()
+                sounding_notes = [(end, pyo_objects) for end, pyo_objects in sounding_notes
+                                  if end + buffer_duration >= block_start]
+                while next_note < len(starting_notes) and starting_notes[next_note].startTime < block_end:
+                    midi_note = starting_notes[next_note]
+                    pyo_objects = synth_module.synthesize_midi_note(midiToHz(midi_note.pitch), midi_note.duration,
+                                                                    midi_note.startTime - block_start, self.channels,
+                                                                    lfo)
+                    sounding_notes.append((midi_note.startTime + midi_note.duration, pyo_objects))
+                    next_note += 1
+
+                # Half a buffer less than the block, so the duration can not be rounded up to one buffer more
+                self.server.recordOptions(dur=(block_buffers - .5) * buffer_duration,
+                                          filename=path,
+                                          fileformat=AUDIO_FORMATS["wav"][1],
+                                          sampletype=BIT_DEPTHS[self.bitDepth])
+                self.server.start()
+                with wave.open(path, 'rb') as wav_file:
+                    frames = wav_file.readframes(wav_file.getnframes())
+                pcm = pcm_from_bytes(frames, self.bitDepth).reshape(-1, self.channels)
+                if len(pcm) != block_buffers * buffer_size:
+                    raise Exception("pyo rendered '{0}' instead of '{1}' frames for a block.".format(
+                        len(pcm), block_buffers * buffer_size))
+                yield pcm
+        finally:
+            os.remove(path)
+            # Reset the object graph for the next pass.
+            for _, pyo_objects in sounding_notes:
+                for obj in pyo_objects:
+                    obj.stop()
+            for obj in ([lfo] if lfo is not None else []) + self.batchObjects:
+                obj.stop()
+            self.batchObjects = []
+
+    def render_pcm_batch(self, items):
+        """
+        Renders several Samples in one pass of the Server and returns (PCM, sampling rate) of every one, the same as
+        render_pcm returns for it. Every render has a fixed cost for starting the Server and for writing and reading
+        the temporary File, which a batch only pays once per block.
+
+        The Samples are laid out one after the other in one timeline, which is sliced at their offsets afterwards.
+        The Server renders whole buffers, so every Sample starts at a buffer boundary. Its pyo Objects are created
+        by a callback of the Server right before its first buffer and stopped before the next Sample starts, so the
+        LFOs of the Synth Modules start with their Sample and the Notes are delayed from the start of their Sample.
+        pyo holds delays as 32 bit float, which would round the long delays of Notes scheduled from the start of the
+        timeline differently. Every slice is bit-identical to the Sample rendered on its own.
+
+        Args:
+            items: List of (duration, all_notes, synth_module) - Length in seconds, Notes and Synth Module of every
+                   Sample, as passed to render_pcm
+        """
+        if not items:
+            return []
+        if self.server is None:
+            raise Exception("The RenderSession has to be opened before rendering a batch of '{0}' Samples.".format(
+                len(items)))
+        buffer_size = self.server.getBufferSize()
+        first_buffers = []
+        number_of_buffers = 0
+        for duration, _, _ in items:
+            first_buffers.append(number_of_buffers)
+            # The Server rounds the duration of every render up to whole buffers
+            number_of_buffers += int(np.ceil(duration * self.samplingRate / buffer_size))
+
+        self.batchSamples = deque((first_buffer, all_notes, synth_module)
+                                  for first_buffer, (_, all_notes, synth_module) in zip(first_buffers, items))
+        self.bufferIndex = 0
+        self.server.setCallback(self.__start_batch_sample)
+        try:
+            pcm, sampling_rate = self.render_pcm(number_of_buffers * buffer_size / self.samplingRate, [], None)
+        finally:
+            self.batchSamples.clear()
+        if len(pcm) < number_of_buffers * buffer_size:
+            raise Exception("pyo rendered '{0}' instead of '{1}' frames for a batch of '{2}' Samples.".format(
+                len(pcm), number_of_buffers * buffer_size, len(items)))
+
+        first_buffers.append(number_of_buffers)
+        return [(pcm[first_buffer * buffer_size:next_buffer * buffer_size], sampling_rate)
+                for first_buffer, next_buffer in zip(first_buffers, first_buffers[1:])]
+
+    def __start_batch_sample(self):
+        """
+        Called by the Server before every buffer. Creates the pyo Objects of the next Sample of a batch when its first
+        buffer is reached and stops the ones of the Sample before, see render_pcm_batch
+        """
+        if self.batchSamples and self.batchSamples[0][0] == self.bufferIndex:
+            _, all_notes, synth_module = self.batchSamples.popleft()
+            for obj in self.batchObjects:
+                obj.stop()
+            self.batchObjects = self.__synthesize(all_notes, synth_module)
+        self.bufferIndex += 1
+
 
 class WavGenerator:
     """
     Class for generating WAV-File from a MIDI FIle.
     TODO: Implement Synthesizer as an Interface for multiple Synthesizers with different stiles
     """
-    def __init__(self, synth_module):
-        # Initialize the Server in offline mode.
-        self.server = Server(duplex=0, audio="offline")
-        # only show Errors
-        self.server.setVerbosity(1)
+    def __init__(self, synth_module, session=None, backend="pyo"):
+        """
+        Initializing WavGenerator - Object
+
+        Args:
+            synth_module: SynthModule Object - Defines the sound color of the synthesized Notes
+            session: RenderSession or NumpyRenderSession - Open Session used for rendering.
+                     If None a Session of the given backend is opened for every WAV-File
+            backend: str - Either "pyo" or "numpy". Only used if no session is given
+        """
+        if backend not in BACKENDS:
+            raise Exception("Unknown backend '{0}'. Possible backends: {1}".format(backend, BACKENDS))
         self.synth_module = synth_module
+        self.session = session
+        self.backend = backend
 
     def midi_to_wav(self, filename, midi_file_path):
         """
@@ -94,31 +488,57 @@ class WavGenerator:
         extractor = NoteExtractor()
         all_notes = extractor.get_notes(midi_file_path)
 
-        # Boot the Server.
-        self.server.boot()
-        # Set recording parameters.
-        self.server.recordOptions(dur=midi_file_path.length + .1,
-                                  filename=filename,
-                                  fileformat=0,
-                                  sampletype=0)
+        self.events_to_wav(filename, all_notes, midi_file_path.length)
 
-        pyo_objects = []
-        for midiNote in all_notes:
-            note_freq = midiToHz(midiNote.pitch)
-            dur = midiNote.duration
-            delay = midiNote.startTime
+    def events_to_wav(self, filename, note_events, length):
+        """
+        Synthesizes a WAV-File from Note Events that are already in memory
 
-            # synthesize object for every tone left and right channel
-            obj_l, obj_r = self.synth_module.synthesize_midi_note(note_freq, dur, delay)
+        Args:
+            filename: str - Filename of generated WAV-File
+            note_events: List of NoteEvent or Note Objects - Notes with pitch, startTime and duration in seconds
+            length: float - Length of the piece in seconds, the WAV-File gets 0.1 seconds longer
+        """
+        if self.session is not None:
+            self.session.render(filename, length + .1, note_events, self.synth_module)
+        else:
+            with open_render_session(self.backend) as session:
+                session.render(filename, length + .1, note_events, self.synth_module)
 
-            # add to List so it stays in memory
-            pyo_objects.append(obj_l)
-            pyo_objects.append(obj_r)
+    def events_to_pcm(self, note_events, length):
+        """
+        Synthesizes Note Events and returns the PCM with the shape (frames, channels) in the bit depth of the
+        RenderSession, see Util.AudioFile.to_pcm, and the sampling rate, the same audio as written by events_to_wav
 
-        # Start with rendering.
-        self.server.start()
-        # Cleanup for the next pass.
-        self.server.shutdown()
+        Args:
+            note_events: List of NoteEvent or Note Objects - Notes with pitch, startTime and duration in seconds
+            length: float - Length of the piece in seconds, the audio gets 0.1 seconds longer
+        """
+        if self.session is not None:
+            return self.session.render_pcm(length + .1, note_events, self.synth_module)
+        with open_render_session(self.backend) as session:
+            return session.render_pcm(length + .1, note_events, self.synth_module)
+
+
+def open_render_session(backend="pyo", voice_cache_size=2 ** 27, sampling_rate=44100, channels=2, bit_depth=16,
+                        audio_format="wav"):
+    """
+    Returns an open RenderSession for the given backend
+
+    Args:
+        backend: str - Either "pyo" or "numpy"
+        voice_cache_size: int - Maximum number of bytes of the VoiceCache of the "numpy" backend, 0 switches it off
+        sampling_rate: int - Sampling Rate of the rendered audio in Hz
+        channels: int - 2 for stereo or 1 for mono
+        bit_depth: int - Bits per sample of the rendered audio, 16, 24 or 32
+        audio_format: str - Either "wav" or "flac"
+    """
+    if backend == "pyo":
+        return RenderSession(sampling_rate, channels, bit_depth, audio_format).open()
+    if backend == "numpy":
+        return NumpyRenderSession(sampling_rate, voice_cache_size=voice_cache_size, channels=channels,
+                                  bit_depth=bit_depth, audio_format=audio_format).open()
+    raise Exception("Unknown backend '{0}'. Possible backends: {1}".format(backend, BACKENDS))
 
 
 class SynthModuleOne:
@@ -127,23 +547,45 @@ class SynthModuleOne:
     """
     # TODO: Should store Parameters for defining the sound color
     # TODO: Should be using Interfaces and more different sound colors
+    MUL = 0.3
+    CHANNEL_GAINS = (1.0, 1.0)
+
     def __str__(self):
         return "Synth Module One"
 
     @staticmethod
-    def synthesize_midi_note(note_freq, dur, delay):
+    def create_lfo():
+        """
+        Returns the pyo LFO which controls the feedback of the oscillators, see synthesize_midi_note
+        """
+        return Sine(.1).range(0, .18)
+
+    @staticmethod
+    def synthesize_midi_note(note_freq, dur, delay, channels=2, lfo=None):
         """
-        Synthesizes one MIDI Note with its own sound color
+        Synthesizes one MIDI Note with its own sound color, returns one pyo Object per channel
         Args:
             note_freq: int - Pitch of note in Hz
             dur: float - Duration of Note in seconds
             delay: float - start point of Note in sample. (total time till note is played)
+            channels: int - 2 for left and right channel or 1 for mono, which is the left channel alone
+            lfo: pyo Object - LFO shared with other Notes, see create_lfo. If None the Note gets its own one,
+                 which starts with it
         """
-        lfo = Sine(.1).range(0, .18)
-        obj_l = SineLoop(freq=note_freq, feedback=lfo, mul=0.3).out(chnl=0, dur=dur, delay=delay)
-        obj_r = SineLoop(freq=note_freq, feedback=lfo, mul=0.3).out(chnl=1, dur=dur, delay=delay)
+        if lfo is None:
+            lfo = SynthModuleOne.create_lfo()
+        return [SineLoop(freq=note_freq, feedback=lfo, mul=SynthModuleOne.MUL).out(chnl=channel, dur=dur, delay=delay)
+                for channel in range(channels)]
 
-        return obj_l, obj_r
+    @staticmethod
+    def feedback_lfo(times):
+        """
+        Returns the feedback of the oscillators for the NumPy backend, the same as Sine(.1).range(0, .18) in pyo
+
+        Args:
+            times: ndarray - Time in seconds from the start of the WAV-File
+        """
+        return .09 + .09 * np.sin(2 * np.pi * .1 * times)
 
 
 class SynthModuleTwo:
@@ -152,21 +594,54 @@ class SynthModuleTwo:
     """
     # TODO: Should store Parameters for defining the sound color
     # TODO: Should be using Interfaces and more different sound colors
+    MUL = 0.3
+    CHANNEL_GAINS = (1.0, 1.0)
+    # Strongest partials (frequency in Hz, amplitude, phase) of SuperSaw(.1).range(0, .18) measured in pyo. The
+    # NumPy backend approximates the LFO by them: the mean matches, but the partials leave out the rest of the
+    # spectrum of the detuned saws, so the feedback deviates from pyo by about .0045 RMS and at most .018 (the LFO
+    # moves by .0073 RMS around its mean of .09). tests/test_synth_modules.py checks this against a pyo render.
+    LFO_PARTIALS = [(1, .0021, 2.88), (2, .0021, 1.1), (3, .002, .5), (4, .0011, .31), (5, .0013, .18),
+                    (6, .0018, .18), (7, .0041, .11), (8, .0041, -3.0), (15, .0022, .04), (16, .0011, -3.03),
+                    (23, .001, .04)]
+
     def __str__(self):
         return "Synth Module Two"
 
     @staticmethod
-    def synthesize_midi_note(note_freq, dur, delay):
+    def create_lfo():
         """
-        Synthesizes one MIDI Note with its own sound color
+        Returns the pyo LFO which controls the feedback of the oscillators, see synthesize_midi_note
+        """
+        return SuperSaw(.1).range(0, .18)
+
+    @staticmethod
+    def synthesize_midi_note(note_freq, dur, delay, channels=2, lfo=None):
+        """
+        Synthesizes one MIDI Note with its own sound color, returns one pyo Object per channel
         Args:
             note_freq: int - Pitch of note in Hz
             dur: float - Duration of Note in seconds
             delay: float - start point of Note in sample. (total time till note is played)
+            channels: int - 2 for left and right channel or 1 for mono, which is the left channel alone
+            lfo: pyo Object - LFO shared with other Notes, see create_lfo. If None the Note gets its own one,
+                 which starts with it
         """
-        lfo = SuperSaw(.1).range(0, .18)
-        obj_l = SineLoop(freq=note_freq, feedback=lfo, mul=0.3).out(chnl=0, dur=dur, delay=delay)
-        obj_r = SineLoop(freq=note_freq, feedback=lfo, mul=0.3).out(chnl=1, dur=dur, delay=delay)
+        if lfo is None:
+            lfo = SynthModuleTwo.create_lfo()
+        return [SineLoop(freq=note_freq, feedback=lfo, mul=SynthModuleTwo.MUL).out(chnl=channel, dur=dur, delay=delay)
+                for channel in range(channels)]
 
-        return obj_l, obj_r
+    @staticmethod
+    def feedback_lfo(times):
+        """
+        Returns the feedback of the oscillators for the NumPy backend. Approximates SuperSaw(.1).range(0, .18) in pyo
+        by its mean and its strongest partials.
+
+        Args:
+            times: ndarray - Time in seconds from the start of the WAV-File
+        """
+        feedback = np.full(np.shape(times), .09)
+        for freq, amplitude, phase in SynthModuleTwo.LFO_PARTIALS:
+            feedback += amplitude * np.sin(2 * np.pi * freq * times + phase)
+        return feedback
 
@@ -0,0 +1,74 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import io
+import numpy as np
+
+# The labels cover the 88 keys of a piano, A0 to C8
+LOWEST_PITCH = 21
+NUMBER_OF_PITCHES = 88
+
+
+def frame_labels(pitches, start_times, end_times, number_of_frames, frame_rate=100, lowest_pitch=LOWEST_PITCH,
+                 number_of_pitches=NUMBER_OF_PITCHES):
+    """
+    Returns the frame-level labels of Notes as dict of bool arrays of shape (frames, pitches):
+    'piano_roll' is True in every frame a Note sounds in, 'onsets' in the first and 'offsets' in the last frame of
+    every Note. Frame i covers the time [i / frame_rate, (i + 1) / frame_rate). All Notes are labeled at once with
+    array indexing, the piano roll is the cumulative sum over the starts and ends of the Notes.
+
+    Args:
+        pitches: ndarray - MIDI Pitch of every Note
+        start_times: ndarray - Start of every Note in seconds
+        end_times: ndarray - End of every Note in seconds
+        number_of_frames: int - Number of frames of the labels
+        frame_rate: float - Frames per second
+        lowest_pitch: int - MIDI Pitch of the first column
+        number_of_pitches: int - Number of columns
+    """
+    pitches = np.asarray(pitches, dtype=np.int64) - lowest_pitch
+    start_frames = np.floor(np.asarray(start_times, dtype=np.float64) * frame_rate).astype(np.int64)
+    end_frames = np.ceil(np.asarray(end_times, dtype=np.float64) * frame_rate).astype(np.int64)
+    end_frames = np.maximum(end_frames, start_frames + 1)
+
+    # Notes outside of the pitch range or starting after the last frame are not labeled
+    inside = (pitches >= 0) & (pitches < number_of_pitches) & (start_frames < number_of_frames)
+    pitches, start_frames = pitches[inside], start_frames[inside]
+    end_frames = np.minimum(end_frames[inside], number_of_frames)
+
+    changes = np.zeros((number_of_frames + 1, number_of_pitches), dtype=np.int32)
+    np.add.at(changes, (start_frames, pitches), 1)
+    np.add.at(changes, (end_frames, pitches), -1)
+    piano_roll = np.cumsum(changes[:-1], axis=0) > 0
+
+    onsets = np.zeros((number_of_frames, number_of_pitches), dtype=bool)
+    onsets[start_frames, pitches] = True
+    offsets = np.zeros((number_of_frames, number_of_pitches), dtype=bool)
+    offsets[end_frames - 1, pitches] = True
+    return {"piano_roll": piano_roll, "onsets": onsets, "offsets": offsets}
+
+
+def labels_to_bytes(labels, frame_rate, lowest_pitch=LOWEST_PITCH):
+    """
+    Returns labels as content of a compressed npz-File, which also stores the frame rate and the lowest pitch
+
+    Args:
+        labels: dict - Label arrays as returned by frame_labels
+        frame_rate: float - Frames per second of the labels
+        lowest_pitch: int - MIDI Pitch of the first column of the labels
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, frame_rate=np.float64(frame_rate), lowest_pitch=np.int64(lowest_pitch), **labels)
+    return buffer.getvalue()
+
+
+def labels_from_bytes(content):
+    """
+    Returns the arrays of labels stored as content of a npz-File as dict
+
+    Args:
+        content: bytes - Content of the npz-File
+    """
+    with np.load(io.BytesIO(content)) as npz_file:
+        return {name: npz_file[name] for name in npz_file.files}
@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import os
+import struct
+import tempfile
+
+
+class MidiWriter:
+    """
+    Class for writing Standard MIDI Files (type 0) straight from (pitch, tick, duration) tuples, without building a
+    music21 Stream. The Note Events are encoded the same way music21 encodes them: Note-Off Messages before Note-On
+    Messages at the same tick, Note-Off as 0x80 with velocity 0 and the end of the track one quarter note after the
+    last Note.
+    """
+
+    def __init__(self, ticks_per_quarter=10080, velocity=90, channel=0):
+        """
+        Initializing MidiWriter - Object
+
+        Args:
+            ticks_per_quarter: int - Resolution of the MIDI-File, 10080 is the resolution music21 writes
+            velocity: int - Velocity of every Note-On Message
+            channel: int - MIDI Channel of every Note
+        """
+        self.ticksPerQuarter = ticks_per_quarter
+        self.velocity = velocity
+        self.channel = channel
+
+    @staticmethod
+    def __variable_length(value):
+        """
+        Returns the value as MIDI variable length quantity
+
+        Args:
+            value: int - Non negative value
+        """
+        encoded = [value & 0x7F]
+        value >>= 7
+        while value:
+            encoded.append((value & 0x7F) | 0x80)
+            value >>= 7
+        return bytes(reversed(encoded))
+
+    def encode_note_events(self, notes, end_tick=None):
+        """
+        Returns the encoded Note Events and the End of Track Event as bytes, every Event with its delta time
+
+        Args:
+            notes: List of (pitch, tick, duration) tuples - Notes with start tick and duration in ticks
+            end_tick: int - Tick of the End of Track Event. One quarter note after the last Note if None
+        """
+        events = []
+        for order, (pitch, tick, duration) in enumerate(notes):
+            events.append((tick, 1, order, bytes((0x90 | self.channel, pitch, self.velocity))))
+            events.append((tick + duration, 0, order, bytes((0x80 | self.channel, pitch, 0))))
+        events.sort(key=lambda event: event[:3])
+
+        encoded = bytearray()
+        last_tick = 0
+        for tick, _, _, message in events:
+            encoded += self.__variable_length(tick - last_tick)
+            encoded += message
+            last_tick = tick
+
+        if end_tick is None:
+            end_tick = last_tick + self.ticksPerQuarter
+        encoded += self.__variable_length(max(end_tick - last_tick, 0))
+        encoded += b'\xff\x2f\x00'
+        return bytes(encoded)
+
+    def encode(self, notes, tempo, end_tick=None):
+        """
+        Returns a complete MIDI-File of type 0 as bytes
+
+        Args:
+            notes: List of (pitch, tick, duration) tuples - Notes with start tick and duration in ticks
+            tempo: float - Tempo in beats per minute
+            end_tick: int - Tick of the End of Track Event. One quarter note after the last Note if None
+        """
+        microseconds_per_quarter = int(round(60000000 / float(tempo)))
+        track = bytearray()
+        # Tempo
+        track += b'\x00\xff\x51\x03' + microseconds_per_quarter.to_bytes(3, 'big')
+        # Time Signature 4/4
+        track += b'\x00\xff\x58\x04\x04\x02\x18\x08'
+        track += self.encode_note_events(notes, end_tick)
+
+        header = b'MThd' + struct.pack('>IHHH', 6, 0, 1, self.ticksPerQuarter)
+        return header + b'MTrk' + struct.pack('>I', len(track)) + bytes(track)
+
+    def write(self, midi_file_path, notes, tempo, end_tick=None):
+        """
+        Writes a MIDI-File of type 0
+
+        Args:
+            midi_file_path: str - Path where to save the MIDI-File
+            notes: List of (pitch, tick, duration) tuples - Notes with start tick and duration in ticks
+            tempo: float - Tempo in beats per minute
+            end_tick: int - Tick of the End of Track Event. One quarter note after the last Note if None
+        """
+        with open(midi_file_path, 'wb') as midi_file:
+            midi_file.write(self.encode(notes, tempo, end_tick))
+
+    def validate_against_music21(self, notes, tempo):
+        """
+        Builds the same Notes as music21 Stream, writes it with the music21 MIDI exporter and checks that every
+        Note Event and its timing is encoded to the same bytes as by this MidiWriter. Raises an Exception at the
+        first difference. Needs music21, which is only imported here, and mido.
+
+        Args:
+            notes: List of (pitch, tick, duration) tuples - Notes with start tick and duration in ticks
+            tempo: float - Tempo in beats per minute
+        """
+        from music21 import stream, tempo as music21_tempo, note, chord
+
+        if self.ticksPerQuarter != 10080 or self.velocity != 90 or self.channel != 0:
+            raise Exception("Only MidiWriters with the music21 defaults can be validated against music21.")
+
+        # Notes starting at the same tick are a Chord, all Notes have to be in sequence like a SampleGenerator makes
+        s = stream.Measure()
+        s.insert(0, music21_tempo.MetronomeMark(number=tempo))
+        starts = {}
+        for pitch, tick, duration in notes:
+            starts.setdefault((tick, duration), []).append(pitch)
+        for (tick, duration), pitches in starts.items():
+            if len(pitches) == 1:
+                element = note.Note(pitches[0])
+            else:
+                element = chord.Chord([note.Note(pitch) for pitch in pitches])
+            element.quarterLength = duration / self.ticksPerQuarter
+            s.insert(tick / self.ticksPerQuarter, element)
+
+        handle, path = tempfile.mkstemp(suffix=".mid")
+        os.close(handle)
+        try:
+            s.write('midi', fp=path)
+            reference_resolution, reference_events = self.read_note_events(path)
+            self.write(path, notes, tempo)
+            written_resolution, written_events = self.read_note_events(path)
+        finally:
+            os.remove(path)
+
+        for i, (expected, actual) in enumerate(zip(reference_events, written_events)):
+            if expected != actual:
+                raise Exception("Note Event {0} differs from music21. Expected: {1} Got: {2}".format(i, expected,
+                                                                                                 actual))
+        if len(reference_events) != len(written_events):
+            raise Exception("music21 wrote {0} Note Events, but the MidiWriter wrote {1}.".format(
+                len(reference_events), len(written_events)))
+        if reference_resolution != written_resolution:
+            raise Exception("Resolution differs from music21.")
+        return True
+
+    @staticmethod
+    def read_note_events(midi_file_path):
+        """
+        Returns the resolution of a MIDI-File and (absolute tick, bytes) of every Note-On and Note-Off Message of all
+        its tracks. Needs mido, which is only imported here.
+
+        Args:
+            midi_file_path: str - Path of the MIDI-File
+        """
+        import mido
+
+        midi_file = mido.MidiFile(midi_file_path)
+        events = []
+        for track in midi_file.tracks:
+            tick = 0
+            for msg in track:
+                tick += msg.time
+                if msg.type in ("note_on", "note_off"):
+                    events.append((tick, bytes(msg.bytes())))
+        return midi_file.ticks_per_beat, events
@@ -3,16 +3,22 @@ Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
 Licensed under the MIT License.
 """
 import mido
+from collections import namedtuple, deque
 
 DEBUG = False
 
+# Compact Note Information handed from the SampleGenerator to the WavGenerator without writing and reading a MIDI-File.
+# Has the same attribute names as Note, so both can be rendered.
+NoteEvent = namedtuple("NoteEvent", ["pitch", "velocity", "startTime", "duration"])
+
 
 class Note:
     """
     Helper Class for Extracting Notes from MidiFile
     """
+    __slots__ = ("pitch", "velocity", "channel", "startTime", "duration")
 
-    def __init__(self, pitch, velocity, channel):
+    def __init__(self, pitch, velocity, channel, start_time=-1):
         """
         Initializing Note - Object
 
@@ -20,11 +26,12 @@ class Note:
             pitch: str - Pitch from mido Midi Message
             velocity: str - Velocity from mido Midi Message
             channel: str - Channel from mido Midi Message
+            start_time: float - Start time of the Note in seconds
         """
         self.pitch = pitch
         self.velocity = velocity
         self.channel = channel
-        self.startTime = -1
+        self.startTime = start_time
         self.duration = -1
 
     def set_start_time(self, current_time):
@@ -52,6 +59,9 @@ class Note:
     def __eq__(self, other):
         return self.pitch == other.pitch and self.channel == other.channel
 
+    def __hash__(self):
+        return hash((self.pitch, self.channel))
+
     def __str__(self):
         return "Note - Pitch: {0}, Velocity: {1}, Duration: {2}, Channel: {3}, StartTime: {4}".format(self.pitch,
                                                                                                       self.velocity,
@@ -63,58 +73,71 @@ class Note:
 class NoteExtractor:
     """
     Helper Class for extracting all Midi Note specific Information for generating MIDI and WAV Files in a Midi File
+
+    Started Notes are kept per (pitch, channel), so pairing a MIDI-End Message with its MIDI-Start Message does not
+    depend on how many Notes are playing at the same time. If the same pitch is started more than once on a channel,
+    the earliest started Note is ended first.
     """
 
-    def __init__(self):
-        self.notPaired = []
-        self.paired = []
+    def __init__(self, strict=True):
+        """
+        Initializing NoteExtractor - Object
+
+        Args:
+            strict: bool - Raise an Exception for MIDI-End Messages without a started Note. External MIDI-Files often
+                           contain those, set it to False to skip them instead.
+        """
+        self.strict = strict
+        self.notPaired = {}
         self.currentTime = 0.0
 
+    def __reset(self):
+        """
+        Resets all Values used for calculation by the Note Extractor
+        """
+        self.currentTime = 0.0
+        self.notPaired = {}
+
     def __add_note_for_paring(self, msg):
         """
-        Adds Note Object to self.notPaired List for paring the Midi-Start Message with its correlating MIDI-End Message.
+        Adds Note Object to self.notPaired for paring the Midi-Start Message with its correlating MIDI-End Message.
 
         Args:
             msg - mido.Message Holds all Information about the MIDI-Event stored in this Message
         """
-        pitch = msg.note
-        velocity = msg.velocity
-        channel = msg.channel
-        note = Note(pitch, velocity, channel)
-        note.set_start_time(self.currentTime)
+        note = Note(msg.note, msg.velocity, msg.channel, self.currentTime)
+        if DEBUG:
+            print("Note Started at: " + str(self.currentTime))
 
-        self.notPaired.append(note)
+        started = self.notPaired.get((msg.note, msg.channel))
+        if started is None:
+            self.notPaired[(msg.note, msg.channel)] = deque([note])
+        else:
+            started.append(note)
 
     def __pair_note(self, msg):
         """
-        Pairs all Notes in self.notPaired and calculates the duration for the Midi-Note that is created by paring.
+        Pairs the MIDI-End Message with the earliest started Note of the same pitch and channel and calculates the
+        duration of the Note. Returns the paired Note or None if no Note was started and strict is False.
 
         Args:
             msg - mido.Message Holds all Information about the MIDI-Event stored in this Message
         """
-        pitch = msg.note
-        velocity = msg.velocity
-        channel = msg.channel
-        note = Note(pitch, velocity, channel)
-        if note in self.notPaired:
-            pair_note = self.notPaired[self.notPaired.index(note)]
-            pair_note.calc_duration(self.currentTime)
-            self.paired.append(pair_note)
-            self.notPaired.remove(pair_note)
-        else:
-            raise Exception("The note has not been found in not Paired List. " + str(note))
-
-    def __reset(self):
-        """
-        Resets all Values used for calculation by the Note Extractor
+        started = self.notPaired.get((msg.note, msg.channel))
+        if not started:
+            if self.strict:
+                raise Exception("The note has not been found in not Paired List. " +
+                                str(Note(msg.note, msg.velocity, msg.channel)))
+            return None
+
+        pair_note = started.popleft()
+        pair_note.calc_duration(self.currentTime)
+        return pair_note
+
+    def iter_notes(self, midi_file):
         """
-        self.currentTime = 0.0
-        self.notPaired = []
-        self.paired = []
-
-    def get_notes(self, midi_file):
-        """
-        Returns all Midi Information as Note - Object
+        Yields all Midi Information as Note - Object, lazily while the MIDI-File is read.
+        Notes are yielded as soon as they end, so they are ordered by their end time.
 
         Args:
             midi_file - mido.MidiFile
@@ -127,13 +150,15 @@ class NoteExtractor:
         self.__reset()
 
         for msg in midi_file:
-            delta_time = msg.time
-            self.currentTime += delta_time
+            self.currentTime += msg.time
             if not msg.is_meta:
-                if msg.type == "note_on":
+                if msg.type == "note_on" and msg.velocity > 0:
                     self.__add_note_for_paring(msg)
-                if msg.type == "note_off":
-                    self.__pair_note(msg)
+                elif msg.type == "note_off" or msg.type == "note_on":
+                    # note_on with velocity 0 ends a Note as well
+                    note = self.__pair_note(msg)
+                    if note is not None:
+                        yield note
             else:
                 if DEBUG:
                     print('Meta: {0}'.format(msg))
@@ -141,5 +166,13 @@ class NoteExtractor:
             print("Total Time Elapsed: " + str(self.currentTime))
             print("Time from file: " + str(midi_file.length))
 
-        sorted(self.paired, key=lambda note: note.startTime)
-        return self.paired
+    def get_notes(self, midi_file):
+        """
+        Returns all Midi Information as Note - Object, sorted by their start time
+
+        Args:
+            midi_file - mido.MidiFile
+        """
+        paired = list(self.iter_notes(midi_file))
+        paired.sort(key=lambda note: note.startTime)
+        return paired
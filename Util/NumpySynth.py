@@ -0,0 +1,358 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import bisect
+import numpy as np
+
+from Util.AudioFile import AudioWriter, check_audio_options, to_pcm
+from Util.VoiceCache import VoiceCache
+
+
+def midi_to_hz(pitch):
+    """
+    Returns the Frequency in Hz of a MIDI Pitch
+
+    Args:
+        pitch: int or ndarray - MIDI Pitch
+    """
+    return 440.0 * 2.0 ** ((np.asarray(pitch, dtype=np.float64) - 69.0) / 12.0)
+
+
+def to_pcm16(audio):
+    """
+    Returns float Samples as 16 bit PCM
+
+    Args:
+        audio: ndarray - Float Samples in the range [-1, 1]
+    """
+    return to_pcm(audio, 16)
+
+
+def write_wav(filename, audio, sampling_rate):
+    """
+    Writes a 16 bit PCM WAV-File
+
+    Args:
+        filename: str - Filename of generated WAV-File
+        audio: ndarray - Float Samples in the range [-1, 1] with the shape (frames, channels)
+        sampling_rate: int - Sampling Rate of the audio in Hz
+    """
+    write_pcm(filename, to_pcm16(audio), sampling_rate)
+
+
+def write_pcm(filename, pcm, sampling_rate, bit_depth=16, audio_format="wav"):
+    """
+    Writes PCM into a WAV- or FLAC-File
+
+    Args:
+        filename: str - Filename of generated File
+        pcm: ndarray - PCM with the shape (frames, channels) as returned by Util.AudioFile.to_pcm
+        sampling_rate: int - Sampling Rate of the audio in Hz
+        bit_depth: int - Bits per sample of the PCM and the File
+        audio_format: str - Either "wav" or "flac"
+    """
+    with AudioWriter(filename, sampling_rate, pcm.shape[1], bit_depth, audio_format) as audio_writer:
+        audio_writer.write(pcm)
+
+
+class NumpyRenderSession:
+    """
+    Class for rendering WAV-Files with NumPy instead of pyo. It has the same interface as the pyo RenderSession,
+    so it can be used wherever a RenderSession is expected.
+
+    The voices of the Synth Modules are pyo SineLoop Oscillators, whose feedback is modulated by an LFO. The feedback
+    makes every sample depend on the previous one, which can not be computed as an array operation. Therefore the
+    steady state waveform of the oscillator is computed once per pitch for a grid of feedback values and stored in
+    a wavetable. Every voice is then a vectorized lookup into this table with the phase and LFO value of each frame.
+
+    The position in the wavetable of every frame only depends on the pitch, as every voice starts at phase 0, and it
+    is most of the work of a voice. It is kept per pitch in a VoiceCache, a shorter voice of the same pitch uses the
+    beginning of it. The LFO depends on the start of the voice in the WAV-File and is applied for every voice.
+    """
+
+    def __init__(self, sampling_rate=44100, table_size=2048, feedback_levels=19, max_feedback=.18, control_rate=64,
+                 fade_time=.002, voice_cache_size=2 ** 27, block_size=2 ** 16, channels=2, bit_depth=16,
+                 audio_format="wav"):
+        """
+        Initializing NumpyRenderSession - Object
+
+        Args:
+            sampling_rate: int - Sampling Rate of the rendered WAV-Files in Hz
+            table_size: int - Number of phase steps of one wavetable
+            feedback_levels: int - Number of feedback values a wavetable is computed for
+            max_feedback: float - Highest feedback value in the wavetables, higher LFO values are clipped
+            control_rate: int - Number of frames after which the LFO is evaluated again
+            fade_time: float - Duration in seconds of the fade in and fade out of every voice to avoid clicks
+            voice_cache_size: int - Maximum number of bytes of the VoiceCache, 0 switches it off
+            block_size: int - Number of frames rendered at once when writing a WAV-File
+            channels: int - 2 for the stereo channels of the Synth Modules or 1 for their mono downmix
+            bit_depth: int - Bits per sample of the rendered Files and PCM, 16, 24 or 32
+            audio_format: str - Either "wav" or "flac", FLAC-Files need soundfile
+        """
+        check_audio_options(sampling_rate, channels, bit_depth, audio_format)
+        self.samplingRate = sampling_rate
+        self.tableSize = table_size
+        self.feedbackLevels = feedback_levels
+        self.maxFeedback = max_feedback
+        self.controlRate = control_rate
+        self.fadeTime = fade_time
+        self.blockSize = block_size
+        self.channels = channels
+        self.bitDepth = bit_depth
+        self.audioFormat = audio_format
+        self.tables = {}
+        self.voiceCache = VoiceCache(voice_cache_size) if voice_cache_size > 0 else None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Nothing has to be started for rendering with NumPy. Exists to have the same interface as RenderSession.
+        """
+        return self
+
+    def close(self):
+        """
+        Frees all cached wavetables and voices.
+        """
+        self.tables = {}
+        if self.voiceCache is not None:
+            self.voiceCache.clear()
+
+    def __build_tables(self, pitches):
+        """
+        Computes the wavetables of feedback sine oscillators for all given MIDI Pitches, each with the shape
+        (feedback_levels, table_size). The oscillators are run exactly like the pyo SineLoop, for all pitches and
+        feedback values at the same time, and the values after the transient are sorted by their phase. The
+        transient and the number of values only depend on the pitch itself, so a wavetable is the same no matter
+        which other pitches are computed with it.
+
+        Args:
+            pitches: List of int - MIDI Pitches without a wavetable
+        """
+        increments = midi_to_hz(pitches)[:, np.newaxis] / self.samplingRate
+        feedback = np.linspace(0, self.maxFeedback, self.feedbackLevels)[np.newaxis, :]
+        warm_ups = np.ceil(2 / increments[:, 0]).astype(int)
+        numbers_of_values = np.maximum(np.ceil(4 / increments[:, 0]).astype(int), self.tableSize)
+        steps = int((warm_ups + numbers_of_values).max())
+
+        phases = np.empty((steps, len(pitches)))
+        values = np.empty((steps, len(pitches), self.feedbackLevels))
+        last_value = np.zeros((len(pitches), self.feedbackLevels))
+        phase = np.zeros((len(pitches), 1))
+        for i in range(steps):
+            last_value = np.sin(2 * np.pi * (phase + feedback * last_value))
+            phases[i] = phase[:, 0]
+            values[i] = last_value
+            phase = (phase + increments) % 1.0
+
+        grid = np.arange(self.tableSize) / self.tableSize
+        for column, pitch in enumerate(pitches):
+            steady = slice(warm_ups[column], warm_ups[column] + numbers_of_values[column])
+            order = np.argsort(phases[steady, column], kind='stable')
+            table = np.empty((self.feedbackLevels, self.tableSize), dtype=np.float32)
+            for level in range(self.feedbackLevels):
+                table[level] = np.interp(grid, phases[steady, column][order], values[steady, column, level][order],
+                                         period=1.0)
+            self.tables[pitch] = table.ravel()
+
+    def __phase_indices(self, pitch, offset, frames):
+        """
+        Returns the position in the wavetable of pitch of the frames offset to offset + frames of a voice
+
+        Args:
+            pitch: int - MIDI Pitch of the voice
+            offset: int - First frame inside the voice
+            frames: int - Number of frames
+        """
+        if self.voiceCache is None:
+            return self.__compute_phase_indices(pitch, offset, offset + frames)
+        index = self.voiceCache.get(pitch, offset + frames)
+        if index is None:
+            # Computed from the start of the voice for whole seconds, so a slightly longer voice of the same pitch
+            # needs no new one
+            index = self.__compute_phase_indices(pitch, 0, -(-(offset + frames) // self.samplingRate) *
+                                                 self.samplingRate)
+            self.voiceCache.put(pitch, index)
+        return index[offset:offset + frames]
+
+    def __compute_phase_indices(self, pitch, first_frame, end_frame):
+        """
+        Computes the position in the wavetable of pitch of the frames first_frame to end_frame of a voice
+
+        Args:
+            pitch: int - MIDI Pitch of the voice
+            first_frame: int - First frame inside the voice
+            end_frame: int - Frame after the last one
+        """
+        increment = float(midi_to_hz(pitch)) / self.samplingRate
+        index = np.arange(first_frame, end_frame) * (increment * self.tableSize)
+        np.mod(index, self.tableSize, out=index)
+        return index.astype(np.int32)
+
+    def synthesize_voice(self, pitch, start, length, synth_module, offset=0, frames=None):
+        """
+        Returns one mono voice of a Synth Module as float32 ndarray, or the part of it from offset to offset + frames
+
+        Args:
+            pitch: int - MIDI Pitch of the voice
+            start: int - First frame of the voice in the rendered WAV-File, needed for the phase of the LFO
+            length: int - Number of frames of the voice
+            synth_module: SynthModule Object - Defines the LFO and the volume of the voice
+            offset: int - First frame inside the voice which is returned
+            frames: int - Number of frames which are returned, None returns the rest of the voice
+        """
+        if frames is None:
+            frames = length - offset
+        if pitch not in self.tables:
+            self.__build_tables([pitch])
+        table = self.tables[pitch]
+
+        # Feedback level of every frame, evaluated at control rate from the start of the voice
+        first_control = offset // self.controlRate
+        control_frames = start + self.controlRate * np.arange(first_control, -(-(offset + frames) // self.controlRate))
+        feedback = synth_module.feedback_lfo(control_frames / self.samplingRate)
+        level = np.clip(feedback, 0, self.maxFeedback) * ((self.feedbackLevels - 1) / self.maxFeedback)
+        level_index = np.minimum(level.astype(np.intp), self.feedbackLevels - 2)
+        part = slice(offset % self.controlRate, offset % self.controlRate + frames)
+        weight = np.repeat((level - level_index).astype(np.float32), self.controlRate)[part]
+        # Position in the wavetable of every frame, in the table of its feedback level
+        index = self.__phase_indices(pitch, offset, frames) + \
+            np.repeat(level_index * self.tableSize, self.controlRate)[part]
+
+        lower = table[index]
+        voice = table[index + self.tableSize]
+        voice -= lower
+        voice *= weight
+        voice += lower
+        voice *= synth_module.MUL
+
+        # Envelope, the parts of the fade in and fade out inside the returned frames
+        fade = min(int(self.fadeTime * self.samplingRate), length // 2)
+        if fade > 0:
+            ramp = np.linspace(0, 1, fade, endpoint=False, dtype=np.float32)
+            if offset < fade:
+                voice[:fade - offset] *= ramp[offset:offset + frames]
+            fade_out = length - fade
+            if offset + frames > fade_out:
+                voice[max(fade_out - offset, 0):] *= ramp[::-1][max(offset - fade_out, 0):offset + frames - fade_out]
+        return voice
+
+    def __note_frames(self, all_notes, number_of_frames):
+        """
+        Returns (pitch, first frame, end frame) of every Note which has frames inside the audio, in the order of the
+        Notes, which is the order they are mixed in
+
+        Args:
+            all_notes: List of Note Objects - Notes which are synthesized
+            number_of_frames: int - Length of the audio in frames
+        """
+        note_frames = []
+        for midi_note in all_notes:
+            start = int(round(midi_note.startTime * self.samplingRate))
+            end = min(int(round((midi_note.startTime + midi_note.duration) * self.samplingRate)), number_of_frames)
+            if end > start:
+                note_frames.append((midi_note.pitch, start, end))
+        return note_frames
+
+    def __channel_gains(self, synth_module):
+        """
+        Returns the gain of every rendered channel, for mono the mean of the channels of the Synth Module
+
+        Args:
+            synth_module: SynthModule Object - Defines the channel gains
+        """
+        channel_gains = np.asarray(synth_module.CHANNEL_GAINS, dtype=np.float32)
+        if self.channels == 1:
+            return channel_gains.mean(keepdims=True)
+        return channel_gains
+
+    def render_array(self, duration, all_notes, synth_module):
+        """
+        Renders all Notes and returns the mixed audio as float32 ndarray with the shape (frames, channels)
+
+        Args:
+            duration: float - Length of the audio in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color and the channel gains of the Notes
+        """
+        missing_pitches = sorted({midi_note.pitch for midi_note in all_notes} - set(self.tables))
+        if missing_pitches:
+            self.__build_tables(missing_pitches)
+
+        mono = np.zeros(int(round(duration * self.samplingRate)), dtype=np.float32)
+        for pitch, start, end in self.__note_frames(all_notes, len(mono)):
+            mono[start:end] += self.synthesize_voice(pitch, start, end - start, synth_module)
+
+        # Every voice of a Synth Module has the same stereo placement, so it is applied once to the mix
+        return mono[:, np.newaxis] * self.__channel_gains(synth_module)
+
+    def render_pcm(self, duration, all_notes, synth_module):
+        """
+        Renders all Notes and returns the PCM with the shape (frames, channels) in the bit depth of the Session, see
+        Util.AudioFile.to_pcm, and the sampling rate
+
+        Args:
+            duration: float - Length of the audio in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        return to_pcm(self.render_array(duration, all_notes, synth_module), self.bitDepth), self.samplingRate
+
+    def render_pcm_batch(self, items):
+        """
+        Renders several Samples and returns (PCM, sampling rate) of every one, the same as render_pcm returns for it.
+        Unlike pyo, NumPy has no fixed cost per render, so the Samples are rendered one after the other.
+
+        Args:
+            items: List of (duration, all_notes, synth_module) - Length in seconds, Notes and Synth Module of every
+                   Sample, as passed to render_pcm
+        """
+        return [self.render_pcm(duration, all_notes, synth_module) for duration, all_notes, synth_module in items]
+
+    def render(self, filename, duration, all_notes, synth_module):
+        """
+        Renders all Notes into a WAV- or FLAC-File. The audio is rendered in blocks of block_size frames, which are
+        written to the File as soon as they are mixed, and only the parts of the voices sounding inside a block are
+        synthesized. So the memory needed does not grow with the length of the File. The File holds the same audio
+        as render_array returns.
+
+        Args:
+            filename: str - Filename of generated WAV-File
+            duration: float - Length of the WAV-File in seconds
+            all_notes: List of Note Objects - Notes which are synthesized
+            synth_module: SynthModule Object - Defines the sound color of the Notes
+        """
+        missing_pitches = sorted({midi_note.pitch for midi_note in all_notes} - set(self.tables))
+        if missing_pitches:
+            self.__build_tables(missing_pitches)
+
+        number_of_frames = int(round(duration * self.samplingRate))
+        note_frames = self.__note_frames(all_notes, number_of_frames)
+        # Notes in the order they start, the sounding ones are kept in the order they are mixed in
+        starting_notes = sorted(range(len(note_frames)), key=lambda i: note_frames[i][1])
+        next_note = 0
+        sounding_notes = []
+        channel_gains = self.__channel_gains(synth_module)
+
+        with AudioWriter(filename, self.samplingRate, self.channels, self.bitDepth, self.audioFormat) as audio_writer:
+            for block_start in range(0, number_of_frames, self.blockSize):
+                block_end = min(block_start + self.blockSize, number_of_frames)
+                while next_note < len(starting_notes) and note_frames[starting_notes[next_note]][1] < block_end:
+                    bisect.insort(sounding_notes, starting_notes[next_note])
+                    next_note += 1
+
+                block = np.zeros(block_end - block_start, dtype=np.float32)
+                for i in sounding_notes:
+                    pitch, start, end = note_frames[i]
+                    first, last = max(start, block_start), min(end, block_end)
+                    block[first - block_start:last - block_start] += self.synthesize_voice(
+                        pitch, start, end - start, synth_module, first - start, last - first)
+                sounding_notes = [i for i in sounding_notes if note_frames[i][2] > block_end]
+
+                audio_writer.write(to_pcm(block[:, np.newaxis] * channel_gains, self.bitDepth))
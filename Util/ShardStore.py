@@ -0,0 +1,281 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import json
+import os
+import struct
+import numpy as np
+
+# Every record: header, 16 bit PCM (interleaved), MIDI-File bytes, UTF-8 JSON metadata, labels as npz-File (optional),
+# zero padding to ALIGNMENT
+RECORD_MAGIC = b'SMPL'
+# magic, Sample ID, PCM bytes, MIDI bytes, metadata bytes, labels bytes, sampling rate, channels, sample width in bytes
+RECORD_HEADER = struct.Struct('<4sQQIIIIHH')
+# Every finished shard ends with its index: (Sample ID, offset) as two int64 per record, followed by the trailer
+INDEX_MAGIC = b'SIDX'
+# magic, offset of the index, number of records
+TRAILER = struct.Struct('<4sQQ')
+# Records start at multiples of ALIGNMENT bytes, so the PCM of every record can be memory-mapped as int16
+ALIGNMENT = 16
+
+
+def shard_name(shard_index, prefix="shard"):
+    """
+    Returns the filename of a shard
+
+    Args:
+        shard_index: int - Running number of the shard
+        prefix: str - Start of the filename, which separates shards written into the same folder by different runs
+    """
+    return "{0}_{1:05d}.bin".format(prefix, shard_index)
+
+
+class ShardRecord:
+    """
+    Class holding the position and sizes of one record inside a shard, read from its header
+    """
+    __slots__ = ["sampleId", "offset", "pcmBytes", "midiBytes", "metadataBytes", "labelsBytes", "samplingRate",
+                 "channels", "sampleWidth"]
+
+    def __init__(self, offset, header):
+        """
+        Initializing ShardRecord - Object
+
+        Args:
+            offset: int - Position of the record in the shard
+            header: bytes - Header of the record
+        """
+        magic, self.sampleId, self.pcmBytes, self.midiBytes, self.metadataBytes, self.labelsBytes, \
+            self.samplingRate, self.channels, self.sampleWidth = RECORD_HEADER.unpack(header)
+        if magic != RECORD_MAGIC:
+            raise Exception("There is no record at the offset '{0}'.".format(offset))
+        self.offset = offset
+
+    @property
+    def pcm_offset(self):
+        return self.offset + RECORD_HEADER.size
+
+    @property
+    def midi_offset(self):
+        return self.pcm_offset + self.pcmBytes
+
+    @property
+    def metadata_offset(self):
+        return self.midi_offset + self.midiBytes
+
+    @property
+    def labels_offset(self):
+        return self.metadata_offset + self.metadataBytes
+
+    @property
+    def end(self):
+        return self.labels_offset + self.labelsBytes
+
+    @property
+    def frames(self):
+        return self.pcmBytes // (self.channels * self.sampleWidth)
+
+
+class ShardWriter:
+    """
+    Class for packing Samples into shard files instead of writing one WAV- and one MIDI-File per Sample. A new shard
+    is started as soon as the current one holds shard_size bytes. Closing a shard appends its index, so every record
+    can be found with one seek.
+    """
+
+    def __init__(self, folder_path, shard_size=2 ** 30, first_shard=0, prefix="shard"):
+        """
+        Initializing ShardWriter - Object
+
+        Args:
+            folder_path: str - Folder where to save the shards into
+            shard_size: int - Size in bytes after which a new shard is started
+            first_shard: int - Running number of the first shard, used to continue an existing set of shards
+            prefix: str - Start of the filenames of the shards
+        """
+        self.folderPath = folder_path
+        self.shardSize = shard_size
+        self.shardIndex = first_shard
+        self.prefix = prefix
+        self.shardFile = None
+        self.index = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def shard_name(self):
+        return shard_name(self.shardIndex, self.prefix)
+
+    def add(self, sample_id, pcm, sampling_rate, midi_bytes, metadata, labels_bytes=b''):
+        """
+        Appends one Sample to the current shard and returns the name of the shard and the offset of the record
+
+        Args:
+            sample_id: int - ID of the Sample
+            pcm: ndarray - 16 bit PCM with the shape (frames, channels)
+            sampling_rate: int - Sampling Rate of the PCM in Hz
+            midi_bytes: bytes - Content of the MIDI-File
+            metadata: dict - JSON serializable information of the Sample
+            labels_bytes: bytes - Frame-level labels of the Sample as npz-File, empty if it has none
+        """
+        if self.shardFile is not None and self.shardFile.tell() >= self.shardSize:
+            self.__finish_shard()
+            self.shardIndex += 1
+        if self.shardFile is None:
+            self.shardFile = open(os.path.join(self.folderPath, self.shard_name), 'wb')
+            self.index = []
+
+        pcm = np.ascontiguousarray(pcm, dtype='<i2')
+        metadata_bytes = json.dumps(metadata).encode('utf-8')
+        offset = self.shardFile.tell()
+        self.shardFile.write(RECORD_HEADER.pack(RECORD_MAGIC, sample_id, pcm.nbytes, len(midi_bytes),
+                                                len(metadata_bytes), len(labels_bytes),
+                                                sampling_rate, pcm.shape[1], 2))
+        self.shardFile.write(pcm.tobytes())
+        self.shardFile.write(midi_bytes)
+        self.shardFile.write(metadata_bytes)
+        self.shardFile.write(labels_bytes)
+        self.shardFile.write(b'\0' * (-self.shardFile.tell() % ALIGNMENT))
+        self.index.append((sample_id, offset))
+        return self.shard_name, offset
+
+    def flush(self):
+        """
+        Flushes the records of the current shard to disk
+        """
+        if self.shardFile is not None:
+            self.shardFile.flush()
+
+    def __finish_shard(self):
+        """
+        Appends the index and the trailer to the current shard and closes it
+        """
+        index_offset = self.shardFile.tell()
+        self.shardFile.write(np.asarray(self.index, dtype='<i8').reshape(-1, 2).tobytes())
+        self.shardFile.write(TRAILER.pack(INDEX_MAGIC, index_offset, len(self.index)))
+        self.shardFile.close()
+        self.shardFile = None
+
+    def close(self):
+        """
+        Finishes the current shard
+        """
+        if self.shardFile is not None:
+            self.__finish_shard()
+
+
+class ShardReader:
+    """
+    Class for reading the records of one shard. The index is read from the end of the shard. A shard whose writing
+    was interrupted has no index, then the records are found by walking over their headers.
+    """
+
+    def __init__(self, shard_path):
+        """
+        Initializing ShardReader - Object
+
+        Args:
+            shard_path: str - Path of the shard
+        """
+        self.shardPath = shard_path
+        self.shardFile = open(shard_path, 'rb')
+        self.offsets = self.__read_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.shardFile.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __read_index(self):
+        """
+        Returns a dict of the offset of every Sample ID in the shard
+        """
+        size = os.fstat(self.shardFile.fileno()).st_size
+        if size >= TRAILER.size:
+            self.shardFile.seek(size - TRAILER.size)
+            magic, index_offset, count = TRAILER.unpack(self.shardFile.read(TRAILER.size))
+            if magic == INDEX_MAGIC and index_offset + count * 16 + TRAILER.size == size:
+                self.shardFile.seek(index_offset)
+                index = np.frombuffer(self.shardFile.read(count * 16), dtype='<i8').reshape(-1, 2)
+                return dict(zip(index[:, 0].tolist(), index[:, 1].tolist()))
+
+        # Interrupted shard without index, only complete records are taken
+        offsets = {}
+        offset = 0
+        while offset + RECORD_HEADER.size <= size:
+            self.shardFile.seek(offset)
+            try:
+                record = ShardRecord(offset, self.shardFile.read(RECORD_HEADER.size))
+            except Exception:
+                break
+            if record.end > size:
+                break
+            offsets[record.sampleId] = offset
+            offset = record.end + (-record.end % ALIGNMENT)
+        return offsets
+
+    def record(self, offset):
+        """
+        Returns the ShardRecord at the given offset
+
+        Args:
+            offset: int - Position of the record in the shard
+        """
+        self.shardFile.seek(offset)
+        return ShardRecord(offset, self.shardFile.read(RECORD_HEADER.size))
+
+    def read(self, offset):
+        """
+        Reads the record at the given offset with one seek and returns (Sample ID, PCM with the shape
+        (frames, channels), sampling rate, MIDI bytes, metadata)
+
+        Args:
+            offset: int - Position of the record in the shard
+        """
+        self.shardFile.seek(offset)
+        header = self.shardFile.read(RECORD_HEADER.size)
+        record = ShardRecord(offset, header)
+        body = self.shardFile.read(record.end - record.pcm_offset)
+        pcm = np.frombuffer(body, dtype='<i2', count=record.pcmBytes // 2).reshape(-1, record.channels)
+        midi_bytes = body[record.pcmBytes:record.pcmBytes + record.midiBytes]
+        metadata_start = record.pcmBytes + record.midiBytes
+        metadata = json.loads(body[metadata_start:metadata_start + record.metadataBytes].decode('utf-8'))
+        return record.sampleId, pcm, record.samplingRate, midi_bytes, metadata
+
+    def read_labels(self, offset):
+        """
+        Returns the labels of the record at the given offset as content of a npz-File, empty if it has none
+
+        Args:
+            offset: int - Position of the record in the shard
+        """
+        record = self.record(offset)
+        self.shardFile.seek(record.labels_offset)
+        return self.shardFile.read(record.labelsBytes)
+
+    def read_id(self, sample_id):
+        """
+        Reads the record of a Sample ID, see read
+
+        Args:
+            sample_id: int - ID of the Sample
+        """
+        if sample_id not in self.offsets:
+            raise Exception("The Sample ID '{0}' is not in the shard '{1}'.".format(sample_id, self.shardPath))
+        return self.read(self.offsets[sample_id])
+
+    def __iter__(self):
+        for offset in sorted(self.offsets.values()):
+            yield self.read(offset)
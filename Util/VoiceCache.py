@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+from collections import OrderedDict
+
+
+class VoiceCache:
+    """
+    Class for keeping arrays computed for voices in memory up to a maximum number of bytes. When the limit is
+    exceeded the least recently used arrays are dropped. An array stored for a key serves every request of the same
+    key up to its length, so it only has to be computed again if a longer one is requested. NumpyRenderSession keeps
+    the wavetable positions of every pitch in it, not the finished voices: the LFO of a voice depends on where it
+    starts in the WAV-File, so a finished voice is rarely needed twice. Nothing is stored on disk.
+    """
+
+    def __init__(self, max_bytes=2 ** 27):
+        """
+        Initializing VoiceCache - Object
+
+        Args:
+            max_bytes: int - Maximum number of bytes of all stored arrays
+        """
+        self.maxBytes = max_bytes
+        self.entries = OrderedDict()
+        self.currentBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, frames):
+        """
+        Returns the first frames values of the array stored for key as read-only view, or None if there is no array
+        of at least this length
+
+        Args:
+            key: hashable - Key of the voice
+            frames: int - Number of values needed
+        """
+        array = self.entries.get(key)
+        if array is None or len(array) < frames:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return array[:frames]
+
+    def put(self, key, array):
+        """
+        Stores an array for key, replacing the one stored before, and drops the least recently used arrays until all
+        arrays fit into max_bytes again. An array larger than max_bytes is not stored.
+
+        Args:
+            key: hashable - Key of the voice
+            array: ndarray - Array of the voice, which must not be changed afterwards
+        """
+        if key in self.entries:
+            self.currentBytes -= self.entries.pop(key).nbytes
+        if array.nbytes > self.maxBytes:
+            return
+        array.flags.writeable = False
+        self.entries[key] = array
+        self.currentBytes += array.nbytes
+        while self.currentBytes > self.maxBytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.currentBytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Drops all stored arrays, the counters are kept
+        """
+        self.entries.clear()
+        self.currentBytes = 0
+
+    def stats(self):
+        """
+        Returns the counters and the memory usage of the cache as dict
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries),
+                "bytes": self.currentBytes,
+                "max_bytes": self.maxBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0}
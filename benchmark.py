@@ -0,0 +1,256 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from mido import MidiFile
+
+from Generators.DataBaseGenerator import DataBaseGenerator
+from Generators.SampleGenerator import SampleGenerator
+from Util.Helpers import open_render_session
+from Util.NoteExtractor import NoteExtractor
+from Util.NumpySynth import write_wav
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+PERCENTILES = [50, 90, 99]
+# (notes per sample, polyphonic) of the end-to-end runs of batch_generate
+END_TO_END_CONFIGS = [(5, False), (20, False), (20, True), (50, True)]
+# A stage is reported as regression if its throughput drops below this share of the baseline
+REGRESSION_THRESHOLD = 0.8
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process and its finished child processes in MB
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024.0
+
+
+def summarize(latencies, items):
+    """
+    Returns the throughput and the latency percentiles of a stage
+
+    Args:
+        latencies: List of float - Duration in seconds of every call of the stage
+        items: int - Number of Samples processed by all calls together
+    """
+    latencies = np.asarray(latencies)
+    total = float(latencies.sum())
+    summary = {"samples_per_second": items / total if total > 0 else float("inf"), "calls": len(latencies)}
+    for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        summary["p{0}_ms".format(percentile)] = float(value) * 1000.0
+    return summary
+
+
+def benchmark_stages(number_of_samples, number_of_notes, use_polyphonic, backend, seed, folder):
+    """
+    Runs every stage of the generation of one Sample on its own for a batch of Samples and returns the summary of
+    every stage. The numpy backend renders into memory, so rendering and writing the WAV-File are measured apart.
+    The pyo backend records straight to the WAV-File, so its render stage includes writing. With the numpy backend
+    the stage 'render_uncached' renders every Sample again without VoiceCache, which shows what the cache saves.
+
+    Args:
+        number_of_samples: int - Number of Samples run through every stage
+        number_of_notes: int - Number of Notes per Sample
+        use_polyphonic: bool - Switch for polyphonic Samples
+        backend: str - Either "pyo" or "numpy"
+        seed: int - Master Seed of the Samples
+        folder: str - Empty Directory for the written Files
+    """
+    generator = DataBaseGenerator(number_of_notes, use_synth_modules=True, seed=seed, backend=backend)
+    latencies = {name: [] for name in ["plan", "compose", "midi_write", "midi_parse", "note_extraction", "render",
+                                       "render_uncached", "wav_write"]}
+
+    plan = None
+    for _ in range(20):
+        start = time.perf_counter()
+        plan = generator.plan_batch(number_of_samples, use_polyphonic)
+        latencies["plan"].append(time.perf_counter() - start)
+
+    uncached_session = open_render_session(backend, voice_cache_size=0) if backend == "numpy" else None
+    with open_render_session(backend) as session:
+        for index in range(number_of_samples):
+            midi_file_path = os.path.join(folder, "{0}.mid".format(index))
+            wav_file_path = os.path.join(folder, "{0}.wav".format(index))
+
+            start = time.perf_counter()
+            sample = SampleGenerator(generator.possibleRoots, generator.possibleSigns, generator.possibleScales,
+                                     generator.possibleOctaves, generator.possiblePauseRatios,
+                                     generator.possibleChordRatios, generator.possibleTempos,
+                                     generator.possibleNoteLengths, generator.synth_modules, session,
+                                     generator.pitchTable, plan, index)
+            sample.compose(number_of_notes, use_polyphonic)
+            latencies["compose"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            sample.write_midi(midi_file_path)
+            latencies["midi_write"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            midi_file = MidiFile(midi_file_path)
+            latencies["midi_parse"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            NoteExtractor().get_notes(midi_file)
+            latencies["note_extraction"].append(time.perf_counter() - start)
+
+            synth_module = sample.wav_generator.synth_module
+            if backend == "numpy":
+                start = time.perf_counter()
+                audio = session.render_array(sample.length + .1, sample.note_events, synth_module)
+                latencies["render"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                uncached_session.render_array(sample.length + .1, sample.note_events, synth_module)
+                latencies["render_uncached"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                write_wav(wav_file_path, audio, session.samplingRate)
+                latencies["wav_write"].append(time.perf_counter() - start)
+            else:
+                start = time.perf_counter()
+                session.render(wav_file_path, sample.length + .1, sample.note_events, synth_module)
+                latencies["render"].append(time.perf_counter() - start)
+    if uncached_session is not None:
+        uncached_session.close()
+
+    stages = {}
+    for name, values in latencies.items():
+        if values:
+            items = number_of_samples * len(values) if name == "plan" else len(values)
+            stages[name] = summarize(values, items)
+    return stages
+
+
+def benchmark_end_to_end(number_of_samples, backend, seed, folder, workers):
+    """
+    Runs DataBaseGenerator.batch_generate for every configuration of END_TO_END_CONFIGS and returns the
+    throughput of every run
+
+    Args:
+        number_of_samples: int - Number of Samples of every run
+        backend: str - Either "pyo" or "numpy"
+        seed: int - Master Seed of the Samples
+        folder: str - Directory in which an empty Directory is created for every run
+        workers: int - Number of worker processes of batch_generate
+    """
+    runs = {}
+    for number_of_notes, use_polyphonic in END_TO_END_CONFIGS:
+        name = "notes={0},polyphonic={1}".format(number_of_notes, use_polyphonic)
+        destination = os.path.join(folder, name)
+        os.makedirs(destination)
+        generator = DataBaseGenerator(number_of_notes, use_synth_modules=True, seed=seed, backend=backend)
+        start = time.perf_counter()
+        generator.batch_generate(destination, number_of_samples, use_polyphonic=use_polyphonic, workers=workers)
+        duration = time.perf_counter() - start
+        runs[name] = {"samples_per_second": number_of_samples / duration, "seconds": duration,
+                      "peak_rss_mb": peak_rss_mb()}
+        shutil.rmtree(destination, ignore_errors=True)
+    return runs
+
+
+def compare(results, baseline):
+    """
+    Prints the throughput of every stage and end-to-end run relative to the baseline and returns the names of
+    all regressions
+
+    Args:
+        results: dict - Results of this run
+        baseline: dict - Results of the baseline run
+    """
+    regressions = []
+    for section in ["stages", "end_to_end"]:
+        for name, summary in results[section].items():
+            reference = baseline.get(section, {}).get(name)
+            if reference is None:
+                continue
+            ratio = summary["samples_per_second"] / reference["samples_per_second"]
+            print("{0:<40} {1:>10.1f} samples/s  {2:>6.2f}x baseline".format(section + "/" + name,
+                                                                             summary["samples_per_second"], ratio))
+            if ratio < REGRESSION_THRESHOLD:
+                regressions.append(section + "/" + name)
+    return regressions
+
+
+def print_results(results):
+    """
+    Prints the results of a run as table
+
+    Args:
+        results: dict - Results of a run
+    """
+    print("\n{0:<20} {1:>12} {2:>10} {3:>10} {4:>10}".format("Stage", "samples/s", "p50 ms", "p90 ms", "p99 ms"))
+    for name, summary in results["stages"].items():
+        print("{0:<20} {1:>12.1f} {2:>10.3f} {3:>10.3f} {4:>10.3f}".format(name, summary["samples_per_second"],
+                                                                         summary["p50_ms"], summary["p90_ms"],
+                                                                         summary["p99_ms"]))
+    print("\n{0:<30} {1:>12} {2:>14}".format("batch_generate", "samples/s", "peak RSS MB"))
+    for name, summary in results["end_to_end"].items():
+        print("{0:<30} {1:>12.1f} {2:>14.1f}".format(name, summary["samples_per_second"], summary["peak_rss_mb"]))
+    print("\nPeak RSS: {0:.1f} MB".format(results["peak_rss_mb"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every stage of the Sample generation and "
+                                                 "DataBaseGenerator.batch_generate. Runs headless.")
+    parser.add_argument("--samples", type=int, default=50, help="Samples per stage benchmark and end-to-end run")
+    parser.add_argument("--notes", type=int, default=20, help="Notes per Sample of the stage benchmark")
+    parser.add_argument("--monophonic", action="store_true", help="Monophonic Samples in the stage benchmark")
+    parser.add_argument("--backend", default="numpy", choices=["pyo", "numpy"], help="Synthesis backend")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the end-to-end runs")
+    parser.add_argument("--seed", type=int, default=1234, help="Master Seed of all Samples")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="Only benchmark the single stages")
+    parser.add_argument("--output", help="Path of a JSON-File the results are written to")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON-File the results are compared to")
+    parser.add_argument("--write-baseline", action="store_true", help="Store the results as new baseline")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        results = {
+            "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                            "machine": platform.machine(), "cpus": os.cpu_count()},
+            "config": {"samples": args.samples, "notes": args.notes, "polyphonic": not args.monophonic,
+                       "backend": args.backend, "workers": args.workers, "seed": args.seed},
+            "stages": benchmark_stages(args.samples, args.notes, not args.monophonic, args.backend, args.seed,
+                                       folder),
+            "end_to_end": {} if args.skip_end_to_end else benchmark_end_to_end(args.samples, args.backend,
+                                                                                args.seed, folder, args.workers)
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.write_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print("\nStored the results as baseline in '{0}'.".format(args.baseline))
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        print("\nCompared to the baseline in '{0}':".format(args.baseline))
+        regressions = compare(results, baseline)
+        if regressions:
+            print("\nRegressions (below {0:.0%} of the baseline): {1}".format(REGRESSION_THRESHOLD,
+                                                                            ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
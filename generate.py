@@ -0,0 +1,205 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import argparse
+import os
+
+from Generators.DataBaseGenerator import DataBaseGenerator, OUTPUT_FORMATS
+from Util.Helpers import BACKENDS
+from Util.AudioFile import AUDIO_FORMATS, BIT_DEPTHS
+from Util.DedupIndex import DEDUP_MODES
+from Util.FeatureStore import FEATURE_KINDS
+
+
+def parse_shard(value):
+    """
+    Returns the part index and the number of parts of a '--shard i/N' argument
+
+    Args:
+        value: str - Argument of the form 'i/N'
+    """
+    try:
+        part_index, number_of_parts = [int(number) for number in value.split("/")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{0}' is not of the form i/N.".format(value))
+    if not 0 <= part_index < number_of_parts:
+        raise argparse.ArgumentTypeError("The index of the shard '{0}' has to be between 0 and N - 1.".format(value))
+    return part_index, number_of_parts
+
+
+def parse_chord_sizes(value):
+    """
+    Returns the Chord size weights of a '--chord-sizes 2:1,3:1' argument as dict
+
+    Args:
+        value: str - Comma separated pairs of Chord size and weight
+    """
+    try:
+        return {int(size): float(weight) for size, weight in [pair.split(":") for pair in value.split(",")]}
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{0}' is not of the form size:weight,size:weight.".format(value))
+
+
+def parse_holdout(value):
+    """
+    Returns the column and the held-out values of a '--holdout Scale=Dorian,Lydian' argument
+
+    Args:
+        value: str - Column of the CSV-File and comma separated values
+    """
+    column, separator, values = value.partition("=")
+    if not separator or not values:
+        raise argparse.ArgumentTypeError("'{0}' is not of the form Column=value,value.".format(value))
+    values = values.split(",")
+    if column == "BPM":
+        try:
+            values = [int(tempo) for tempo in values]
+        except ValueError:
+            raise argparse.ArgumentTypeError("The held-out BPM '{0}' are no integers.".format(value))
+    return column, values
+
+
+def generate(args):
+    """
+    Generates the Data Set, or one part of it, as given by the arguments of the 'generate' command
+
+    Args:
+        args: argparse.Namespace - Parsed arguments
+    """
+    part_index, number_of_parts = args.shard
+    if number_of_parts > 1 and args.seed is None:
+        raise SystemExit("--seed is required with --shard, every part has to draw from the same Master Seed.")
+    if (args.single_pass or args.holdout) and args.test_samples is None:
+        raise SystemExit("--single-pass and --holdout need --test-samples.")
+    if args.dedup_against and args.dedup is None:
+        raise SystemExit("--dedup-against needs --dedup.")
+    if not os.path.isdir(args.destination):
+        os.makedirs(args.destination)
+    holdout = None
+    if args.holdout:
+        holdout = {}
+        for column, values in args.holdout:
+            holdout.setdefault(column, []).extend(values)
+
+    generator = DataBaseGenerator(number_of_notes_per_sample=args.notes, use_synth_modules=args.synth_modules,
+                                  seed=args.seed, backend=args.backend, output_format=args.output_format,
+                                  sampling_rate=args.sampling_rate, channels=args.channels, bit_depth=args.bit_depth,
+                                  audio_format=args.audio_format, chord_size_weights=args.chord_sizes,
+                                  dedup=args.dedup, dedup_capacity=args.dedup_capacity,
+                                  dedup_error_rate=args.dedup_error_rate, render_batch_size=args.render_batch,
+                                  features=args.features, fft_size=args.fft_size, hop_size=args.hop_size,
+                                  mel_bins=args.mel_bins)
+    if args.test_samples is not None:
+        generator.batch_generate_with_split(destination_directory=args.destination,
+                                            number_of_samples_train=args.samples,
+                                            number_of_samples_test=args.test_samples,
+                                            use_polyphonic=not args.monophonic,
+                                            workers=args.workers,
+                                            resume=args.resume,
+                                            writers=args.writers,
+                                            part_index=part_index,
+                                            number_of_parts=number_of_parts,
+                                            single_pass=args.single_pass,
+                                            holdout=holdout,
+                                            labels=args.labels,
+                                            metrics=args.metrics,
+                                            dedup_against=args.dedup_against)
+    else:
+        generator.batch_generate(destination_folder=args.destination,
+                                 number_of_samples=args.samples,
+                                 use_polyphonic=not args.monophonic,
+                                 workers=args.workers,
+                                 resume=args.resume,
+                                 labels=args.labels,
+                                 metrics=args.metrics,
+                                 writers=args.writers,
+                                 part_index=part_index,
+                                 number_of_parts=number_of_parts,
+                                 dedup_against=args.dedup_against)
+
+
+def merge(args):
+    """
+    Merges the CSV-Files of all parts of a Data Set as given by the arguments of the 'merge' command
+
+    Args:
+        args: argparse.Namespace - Parsed arguments
+    """
+    generator = DataBaseGenerator(use_synth_modules=args.synth_modules)
+    if args.split:
+        generator.merge_parts_with_split(args.destination, args.shards)
+    else:
+        generator.merge_parts(args.destination, args.shards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a Data Set of MIDI- and WAV-Files without asking for "
+                                                 "input. With --shard i/N only the i-th of N parts of the IDs is "
+                                                 "generated, so the Data Set can be generated on N machines and "
+                                                 "merged afterwards.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    generate_parser = commands.add_parser("generate", help="Generate a Data Set or one part of it")
+    generate_parser.add_argument("destination", help="Folder the Data Set is generated into")
+    generate_parser.add_argument("--samples", type=int, required=True,
+                                 help="Samples of the whole Data Set, of the train Data Set with --test-samples")
+    generate_parser.add_argument("--test-samples", type=int,
+                                 help="Generate a train and a test Data Set with this many test Samples")
+    generate_parser.add_argument("--single-pass", action="store_true",
+                                 help="Generate train and test Data Set in one pass without shared melodies")
+    generate_parser.add_argument("--holdout", type=parse_holdout, action="append",
+                                 help="Column=value,value of Samples only in the test Data Set, e.g. Scale=Dorian")
+    generate_parser.add_argument("--seed", type=int, help="Master Seed of all Samples, required with --shard")
+    generate_parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                                 help="Generate only the part i of N parts of the IDs, e.g. 0/4")
+    generate_parser.add_argument("--notes", type=int, default=20, help="Notes, Pauses and Chords per Sample")
+    generate_parser.add_argument("--chord-sizes", type=parse_chord_sizes,
+                                 help="Weights of the Chord sizes from 2 to 6, e.g. 2:1,3:1,4:.5 (default 2:1,3:1)")
+    generate_parser.add_argument("--monophonic", action="store_true", help="Generate monophonic Samples")
+    generate_parser.add_argument("--synth-modules", action="store_true", help="Use different Synth Modules")
+    generate_parser.add_argument("--backend", default="pyo", choices=BACKENDS, help="Synthesis backend")
+    generate_parser.add_argument("--output-format", default="files", choices=OUTPUT_FORMATS,
+                                 help="Single Files or shards")
+    generate_parser.add_argument("--sampling-rate", type=int, default=44100, help="Sampling Rate in Hz")
+    generate_parser.add_argument("--channels", type=int, default=2, choices=[1, 2], help="1 for a mono downmix")
+    generate_parser.add_argument("--bit-depth", type=int, default=16, choices=list(BIT_DEPTHS), help="Bits per sample")
+    generate_parser.add_argument("--audio-format", default="wav", choices=list(AUDIO_FORMATS),
+                                 help="Format of the audio Files, FLAC needs soundfile with the numpy backend")
+    generate_parser.add_argument("--dedup", choices=DEDUP_MODES,
+                                 help="Draw Samples which sound like another one again before they are rendered")
+    generate_parser.add_argument("--dedup-capacity", type=int, default=10 ** 7,
+                                 help="Samples the Bloom filter of --dedup bloom is sized for")
+    generate_parser.add_argument("--dedup-error-rate", type=float, default=0.001,
+                                 help="Error rate of the Bloom filter of --dedup bloom")
+    generate_parser.add_argument("--dedup-against", action="append",
+                                 help="Dedup index (<CSV name>_dedup.npz) of another Data Set not to repeat")
+    generate_parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    generate_parser.add_argument("--render-batch", type=int, default=1,
+                                 help="Samples pyo renders in one pass of its Server, the Samples stay the same")
+    generate_parser.add_argument("--writers", type=int, default=0, help="Writer threads of the pipeline")
+    generate_parser.add_argument("--features", choices=FEATURE_KINDS,
+                                 help="Write the log-mel or log-power spectrogram of every Sample into 'Features'")
+    generate_parser.add_argument("--fft-size", type=int, default=2048, help="Samples per frame of the spectrogram")
+    generate_parser.add_argument("--hop-size", type=int, default=512, help="Samples between two frames")
+    generate_parser.add_argument("--mel-bins", type=int, default=128, help="Mel bands of a log-mel spectrogram")
+    generate_parser.add_argument("--labels", action="store_true", help="Write frame-level labels")
+    generate_parser.add_argument("--metrics", action="store_true", help="Write metrics")
+    generate_parser.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    generate_parser.set_defaults(function=generate)
+
+    merge_parser = commands.add_parser("merge", help="Merge the CSV-Files of all parts of a Data Set")
+    merge_parser.add_argument("destination", help="Folder the parts were generated into")
+    merge_parser.add_argument("--shards", type=int, required=True, help="Number of parts N")
+    merge_parser.add_argument("--split", action="store_true", help="Merge the train and the test Data Set")
+    merge_parser.add_argument("--synth-modules", action="store_true",
+                              help="The parts were generated with different Synth Modules")
+    merge_parser.set_defaults(function=merge)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
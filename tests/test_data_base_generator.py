@@ -0,0 +1,85 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import json
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from Generators.DataBaseGenerator import DataBaseGenerator
+
+MASTER_SEED = 3
+NUMBER_OF_SAMPLES = 6
+# Root Note and filenames of the first Sample of the Master Seed, in the format written since the first Data Sets
+FIRST_SAMPLE = {"RootNote": "B#",
+                "MIDI-File": os.path.join("MIDI-Files", "MIDI_0_Scale(gypsyminor)_Root(b_sharp)_BPM(68).mid"),
+                "WAV-File": os.path.join("WAV-Files", "WAV_0_Scale(gypsyminor)_Root(b_sharp)_BPM(68).wav")}
+FILE_NAME_PATTERN = re.compile(r"^(MIDI|WAV)_(\d+)_Scale\((\w+)\)_Root\(([a-g](?:_sharp|_flat)?)\)_BPM\((\d+)\)"
+                               r"\.(mid|wav)$")
+
+
+def test_root_note_and_file_name_format(tmp_path):
+    generator = DataBaseGenerator(seed=MASTER_SEED, backend="numpy")
+    generator.batch_generate(str(tmp_path), NUMBER_OF_SAMPLES, use_polyphonic=False)
+    manifest = pd.read_csv(str(tmp_path / "DB_WAVs_and_MIDIs.csv"))
+
+    assert len(manifest) == NUMBER_OF_SAMPLES
+    for column, value in FIRST_SAMPLE.items():
+        assert manifest[column][0] == value
+
+    possible_root_notes = [root + sign for root in generator.possibleRoots for sign in generator.possibleSigns]
+    for current_id, row in manifest.iterrows():
+        # The Root Note has no octave, neither in the CSV-File nor in the filenames
+        assert row["RootNote"] in possible_root_notes
+        root_note = row["RootNote"].lower().replace("#", "_sharp").replace("-", "_flat")
+        for column in ["MIDI-File", "WAV-File"]:
+            match = FILE_NAME_PATTERN.match(os.path.basename(row[column]))
+            assert match is not None
+            assert int(match.group(2)) == current_id
+            assert match.group(4) == root_note
+            assert int(match.group(5)) == row["BPM"]
+            assert os.path.isfile(os.path.join(str(tmp_path), row[column]))
+
+
+def test_holdout_takes_root_notes_without_octave():
+    generator = DataBaseGenerator(seed=MASTER_SEED, backend="numpy")
+    plan, data_sets = generator.plan_split(8, 4, use_polyphonic=False, holdout={"RootNote": ["C#", "B#"]})
+    assert list(data_sets).count(1) == 4
+    root_notes = [generator.possibleRoots[root] + generator.possibleSigns[sign]
+                  for root, sign in zip(plan.rootIndices, plan.signIndices)]
+    for root_note, data_set in zip(root_notes, data_sets):
+        if data_set == 1:
+            assert root_note in ["C#", "B#"]
+        elif data_set == 0:
+            assert root_note not in ["C#", "B#"]
+
+
+@pytest.mark.parametrize("single_pass", [False, True], ids=["two_passes", "single_pass"])
+def test_split_passes_on_labels_and_metrics(tmp_path, single_pass):
+    generator = DataBaseGenerator(seed=MASTER_SEED, backend="numpy")
+    generator.batch_generate_with_split(str(tmp_path), 4, 2, False, single_pass=single_pass, labels=True,
+                                        metrics=True)
+    for folder_name, name_of_csv in [("Train", "train.csv"), ("Test", "test.csv")]:
+        manifest = pd.read_csv(str(tmp_path / folder_name / name_of_csv))
+        assert manifest["Label-File"].map(lambda path: os.path.isfile(str(tmp_path / folder_name / path))).all()
+    metrics_paths = [tmp_path / "split_metrics.json"] if single_pass else \
+        [tmp_path / "Train" / "train_metrics.json", tmp_path / "Test" / "test_metrics.json"]
+    assert all(path.is_file() for path in metrics_paths)
+
+
+def test_merge_deduplicated_split_parts(tmp_path):
+    # The test Data Set of every part is deduplicated against the train Data Set of the same part
+    for part_index in range(2):
+        generator = DataBaseGenerator(seed=MASTER_SEED, backend="numpy", dedup="exact")
+        generator.batch_generate_with_split(str(tmp_path), 4, 2, False, part_index=part_index, number_of_parts=2)
+    DataBaseGenerator(backend="numpy", dedup="exact").merge_parts_with_split(str(tmp_path), 2)
+
+    with open(str(tmp_path / "Test" / "test_settings.json")) as settings_file:
+        settings = json.load(settings_file)
+    assert settings["number_of_parts"] == 1
+    assert settings["dedup"]["against"] == [str(tmp_path / "Train" / "train_dedup.npz")]
+    assert (tmp_path / "Train" / "train_dedup.npz").is_file()
+    assert len(pd.read_csv(str(tmp_path / "Test" / "test.csv"))) == 2
@@ -0,0 +1,87 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import pytest
+
+from Generators.DataBaseGenerator import DataBaseGenerator
+from Generators.SampleGenerator import SampleGenerator
+from Util.Helpers import open_render_session
+from Util.MidiWriter import MidiWriter
+
+# music21 and mido are only needed for writing and reading the reference MIDI-Files
+pytest.importorskip("music21")
+pytest.importorskip("mido")
+
+MASTER_SEED = 7
+NUMBER_OF_SAMPLES = 8
+
+
+def baseline_stream(sample_gen, note_columns):
+    """
+    Returns the music21 Stream the SampleGenerator built before the MidiWriter from the planned Note Parameters:
+    Notes, Chords and Rests appended one after the other with the length of their Note Type
+
+    Args:
+        sample_gen: SampleGenerator - Sample whose Parameters are used
+        note_columns: tuple - Planned Note Parameters of the Sample, see GenerationPlan.note_columns
+    """
+    from music21 import stream, tempo, note, chord
+
+    possible_notes = sample_gen.scale.calc_notes(note.Note(sample_gen.rootNote))
+
+    def get_note_string(degree, octave):
+        return possible_notes[degree].name + str(sample_gen.possibleOctaves[octave])
+
+    s = stream.Measure()
+    s.append(tempo.MetronomeMark(number=sample_gen.tempo))
+    for is_note, is_chord, chord_size, degrees, octaves, length in zip(*note_columns):
+        note_length = sample_gen.possibleNoteLengths[length]
+        if is_note:
+            if is_chord:
+                notes = []
+                for degree, octave in zip(degrees, octaves):
+                    new_note = note.Note(get_note_string(degree, octave), type=note_length)
+                    if new_note not in notes:
+                        notes.append(new_note)
+                    if len(notes) == chord_size:
+                        break
+                s.append(chord.Chord(notes))
+            else:
+                s.append(note.Note(get_note_string(degrees[0], octaves[0]), type=note_length))
+        else:
+            s.append(note.Rest(type=note_length))
+    return s
+
+
+@pytest.mark.parametrize("use_polyphonic", [False, True], ids=["monophonic", "polyphonic"])
+def test_midi_writer_matches_music21(tmp_path, use_polyphonic):
+    generator = DataBaseGenerator(seed=MASTER_SEED, backend="numpy")
+    plan = generator.plan_batch(NUMBER_OF_SAMPLES, use_polyphonic)
+    if use_polyphonic:
+        assert plan.isChord.any()
+    with open_render_session("numpy") as session:
+        for index in range(len(plan)):
+            sample_gen = SampleGenerator(generator.possibleRoots, generator.possibleSigns, generator.possibleScales,
+                                         generator.possibleOctaves, generator.possiblePauseRatios,
+                                         generator.possibleChordRatios, generator.possibleTempos,
+                                         generator.possibleNoteLengths, generator.synth_modules, session,
+                                         generator.pitchTable, plan, index)
+            midi_file_path = str(tmp_path / "{0}.mid".format(index))
+            wav_file_path = str(tmp_path / "{0}.wav".format(index))
+            sample_gen.generate(generator.numberOfNotesPerSample, midi_file_path, wav_file_path, use_polyphonic)
+
+            reference_file_path = str(tmp_path / "{0}_music21.mid".format(index))
+            baseline_stream(sample_gen, plan.note_columns(index)).write('midi', fp=reference_file_path)
+
+            assert MidiWriter.read_note_events(midi_file_path) == MidiWriter.read_note_events(reference_file_path)
+
+
+def test_validate_against_music21():
+    notes = [(60, 0, 10080), (64, 10080, 5040), (67, 10080, 5040), (72, 25200, 40320)]
+    assert MidiWriter().validate_against_music21(notes, 120)
+
+
+def test_validate_against_music21_needs_music21_defaults():
+    with pytest.raises(Exception):
+        MidiWriter(ticks_per_quarter=480).validate_against_music21([(60, 0, 480)], 120)
@@ -0,0 +1,57 @@
+"""
+Copyright (c) 2020 Tobias Lint <tobias@lint.at>. All rights reserved.
+Licensed under the MIT License.
+"""
+import wave
+
+import numpy as np
+import pytest
+
+from Util.AudioFile import pcm_from_bytes
+from Util.Helpers import RenderSession, SynthModuleOne, SynthModuleTwo
+from Util.NoteExtractor import NoteEvent
+
+LFO_SECONDS = 4.0
+SAMPLING_RATE = 44100
+# Overlapping Notes, a gap and a Note sounding through several blocks of BLOCK_SIZE frames
+NOTES = [NoteEvent(60, 100, 0.0, .2), NoteEvent(67, 100, .05, .1), NoteEvent(64, 100, .5, .03),
+         NoteEvent(72, 100, .52, .4)]
+BLOCK_SIZE = 4096
+
+
+def test_feedback_lfo_matches_pyo(tmp_path):
+    pyo = pytest.importorskip("pyo")
+    path = str(tmp_path / "lfo.wav")
+    with RenderSession(sampling_rate=SAMPLING_RATE, channels=1) as session:
+        # 32 bit integer samples, so the LFO is read back without soundfile
+        session.server.recordOptions(dur=LFO_SECONDS, filename=path, fileformat=0, sampletype=2)
+        lfo = pyo.SuperSaw(.1).range(0, .18).out()
+        session.server.start()
+        lfo.stop()
+    with wave.open(path, 'rb') as wav_file:
+        rendered = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype='<i4') / 2.0 ** 31
+    approximated = SynthModuleTwo.feedback_lfo(np.arange(len(rendered)) / float(SAMPLING_RATE))
+
+    # The partials keep the mean and most of the movement of the LFO, see SynthModuleTwo.LFO_PARTIALS
+    error = rendered - approximated
+    assert abs(error.mean()) < 1e-3
+    assert np.sqrt(np.mean(error ** 2)) < .006 < rendered.std()
+    assert np.abs(error).max() < .025
+    assert np.corrcoef(rendered, approximated)[0, 1] > .75
+
+
+@pytest.mark.parametrize("synth_module", [SynthModuleOne(), SynthModuleTwo()], ids=str)
+def test_render_pcm_in_blocks_matches_render(tmp_path, synth_module):
+    pytest.importorskip("pyo")
+    path = str(tmp_path / "notes.wav")
+    with RenderSession(sampling_rate=SAMPLING_RATE, block_size=BLOCK_SIZE) as session:
+        pcm, sampling_rate = session.render_pcm(1.0, NOTES, synth_module)
+        session.render(path, 1.0, NOTES, synth_module)
+    with wave.open(path, 'rb') as wav_file:
+        rendered = pcm_from_bytes(wav_file.readframes(wav_file.getnframes())).reshape(-1, wav_file.getnchannels())
+
+    # The blocks, whose Notes share one LFO, hold the same audio as one recording with an LFO for every Note
+    assert sampling_rate == SAMPLING_RATE
+    assert len(pcm) > 10 * BLOCK_SIZE
+    assert np.abs(pcm).max() > 0
+    assert np.array_equal(pcm, rendered)